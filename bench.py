@@ -0,0 +1,381 @@
+"""
+Benchmark suite: encoding, BLE write path, LAN send path, discovery, fan-out
+and the scheduler's timer wheel.
+
+Everything runs against govee_sim.py (startup times come from
+bench_startup.py), so no hardware is needed and numbers are
+comparable between runs. Results are printed and can be saved as JSON and
+compared against an earlier run to catch regressions.
+
+Usage:
+    python bench.py                               # run everything
+    python bench.py --quick                       # fewer iterations
+    python bench.py --out bench.json              # save results
+    python bench.py --compare bench.json          # exit 1 if anything got >10% worse
+    python bench.py --only codec,lan              # subset (codec, ble, lan, discovery, fanout, schedule, startup)
+
+BLE cases need bleak importable (the simulator replaces the actual radio).
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import bench_codec
+from govee_sim import BleSimulator, LanSimulator
+
+REGRESSION_THRESHOLD = 0.10
+
+# Simulated link characteristics, roughly an H6008 on a BlueZ adapter
+SIM_CONNECT_DELAY = 0.05
+SIM_WRITE_LATENCY = 0.002
+SIM_ECHO_DELAY = 0.005
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name: str, value: float, unit: str, higher_is_better: bool):
+        self.metrics[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print(f"  {name:48s} {value:>14,.3f} {unit}")
+
+    def latency(self, name: str, samples: list[float]):
+        for p in (50, 95, 99):
+            self.add(f"{name}.p{p}", percentile(samples, p) * 1000, "ms", False)
+
+
+def bench_codec_suite(results: Results, quick: bool):
+    print("codec")
+    for name, fps in bench_codec.run(20_000 if quick else 200_000).items():
+        short = name.split(" (")[0].replace("codec.", "").replace(" ", "_")
+        results.add(f"codec.{short}", fps, "frames/s", True)
+
+    # Starting one scene out of a large compiled library: open, look up, first frame
+    import os
+    import tempfile
+    import govee_scenes
+    from govee_codec import encode_colors
+    frames = bytes(encode_colors(bench_codec.colors(300)))
+    scenes = [govee_scenes.CompiledScene(f"scene{i}", [j / 30 for j in range(300)], frames, 10.0, True)
+              for i in range(200 if quick else 1000)]
+    fd, path = tempfile.mkstemp(suffix=".gvs")
+    os.close(fd)
+    try:
+        govee_scenes.write_library(path, scenes)
+        samples = []
+        for i in range(50 if quick else 200):
+            start = time.perf_counter()
+            with govee_scenes.SceneLibrary(path) as library:
+                scene = library[f"scene{i % len(scenes)}"]
+                bytes(scene.frame(0))
+                scene.frames.release()
+            samples.append(time.perf_counter() - start)
+        results.add("codec.scene_start_p50", percentile(samples, 50) * 1e6, "us", False)
+    finally:
+        os.remove(path)
+
+
+async def bench_ble(results: Results, quick: bool):
+    import govee_ble
+    import govee_daemon
+    print("ble")
+    n = 20 if quick else 100
+    sim = BleSimulator(1, SIM_CONNECT_DELAY, SIM_WRITE_LATENCY, echo_delay=SIM_ECHO_DELAY)
+    address = sim.addresses[0]
+    with sim.patch(govee_ble, govee_daemon):
+        samples = []
+        for i in range(n):
+            start = time.perf_counter()
+            await govee_ble.send_command(govee_ble.cmd_color(i, 0, 0), address)
+            samples.append(time.perf_counter() - start)
+        results.latency("ble.send_command", samples)
+
+        session = govee_daemon.GoveeSession(address)
+        with contextlib.redirect_stdout(io.StringIO()):
+            session.start()
+            await session.wait_connected()
+        # Unacked writes are paced by the session's RateController, so a burst measures its pacing
+        for wait_ack, label in ((True, "acked"), (False, "unacked")):
+            samples = []
+            for i in range(n * 5):
+                start = time.perf_counter()
+                await session.write(govee_ble.cmd_color(i, 0, 0), wait_ack=wait_ack)
+                samples.append(time.perf_counter() - start)
+            results.latency(f"ble.session_write_{label}", samples)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await session.close()
+
+        from govee_ble import AckWriter
+        from govee_priority import PriorityScheduler
+        from govee_stream import rainbow, stream
+
+        # Alert latency while an ambient effect keeps the link busy
+        session = govee_daemon.GoveeSession(address)
+        with contextlib.redirect_stdout(io.StringIO()):
+            session.start()
+            await session.wait_connected()
+        scheduler = PriorityScheduler(session.write)
+        frames = rainbow(fps=60)
+        samples = []
+        for i in range(10 if quick else 40):
+            for _ in range(4):
+                scheduler.submit(govee_ble.cmd_color(*next(frames)), "ambient")
+                await asyncio.sleep(1 / 60)
+            start = time.perf_counter()
+            await scheduler.alert([govee_ble.cmd_color(255, 0, 0)])
+            samples.append(time.perf_counter() - start)
+        await scheduler.join()
+        results.latency("ble.alert_under_ambient", samples)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await session.close()
+
+        client = sim.client(address)
+        await client.connect()
+        acks = AckWriter(client)
+        await acks.start()
+        stats = await stream(rainbow(fps=60), acks.write, fps=60, duration=0.5 if quick else 2.0)
+        await client.disconnect()
+        results.add("ble.stream_60fps_sent", stats["fps"], "fps", True)
+        results.add("ble.stream_60fps_latency_p95", stats["latency_p95"] * 1000, "ms", False)
+
+    # Unacked writes against a light that silently drops frames above 40/s
+    from govee_rate import probe
+    limited = BleSimulator(1, SIM_CONNECT_DELAY, SIM_WRITE_LATENCY, echo_delay=SIM_ECHO_DELAY, max_write_rate=40)
+    client = limited.client(limited.addresses[0])
+    await client.connect()
+    acks = AckWriter(client)
+    await acks.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rate = await probe(acks, 3.0 if quick else 10.0)
+    await client.disconnect()
+    results.add("ble.adaptive_rate_40", rate.rate, "writes/s", True)
+    results.add("ble.adaptive_rate_loss", 100 * rate.lost / max(rate.sent, 1), "%", False)
+
+
+async def bench_lan(results: Results, quick: bool):
+    import govee_lan
+    print("lan")
+    n = 2_000 if quick else 20_000
+    sim = await LanSimulator(1).start()
+    ip = sim.ips[0]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for i in range(n // 10):
+                govee_lan.set_color(ip, "H6008", i & 0xFF, 0, 0)
+            elapsed = time.perf_counter() - start
+        results.add("lan.set_color_sync", n // 10 / elapsed, "cmds/s", True)
+
+        client = await govee_lan.GoveeLanClient.open("127.0.0.1")
+        try:
+            start = time.perf_counter()
+            for i in range(n):
+                await client.set_color(ip, i & 0xFF, 0, 0)
+            elapsed = time.perf_counter() - start
+            results.add("lan.client_set_color", n / elapsed, "cmds/s", True)
+
+            # Let the simulator drain the burst above before timing round trips
+            await client.status(ip)
+            samples = []
+            for _ in range(50 if quick else 200):
+                start = time.perf_counter()
+                await client.status(ip)
+                samples.append(time.perf_counter() - start)
+            results.latency("lan.client_status_rtt", samples)
+        finally:
+            client.close()
+    finally:
+        sim.close()
+
+
+async def bench_discovery(results: Results, quick: bool):
+    import govee_lan
+    print("discovery")
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        govee_lan.scan_devices(timeout=0.5)
+    results.add("discovery.lan_scan_devices_0.5s", time.perf_counter() - start, "s", False)
+
+    sim = await LanSimulator(50 if quick else 200, scan_jitter=0.05).start()
+    client = await govee_lan.GoveeLanClient.open("127.0.0.1")
+    try:
+        found = await client.scan(timeout=0.5, targets=[sim.scan_address])
+        results.add("discovery.lan_client_scan_found", len(found), "devices", True)
+    finally:
+        client.close()
+        sim.close()
+
+    try:
+        import govee_ble
+    except ImportError:
+        print("  (skipping BLE discovery: bleak not installed)")
+        return
+
+    class _NoRegistry:
+        def update_from_ble(self, *args, **kwargs):
+            pass
+
+        def save(self):
+            pass
+
+    sim = BleSimulator(20, adv_interval=1.0)
+    with sim.patch(govee_ble):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            await govee_ble.scan_govee(timeout=1.0, registry=_NoRegistry())
+        results.add("discovery.ble_scan_full_1s", time.perf_counter() - start, "s", False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            await govee_ble.scan_govee(timeout=1.0, registry=_NoRegistry(), target=sim.devices[sim.addresses[0]].name)
+        results.add("discovery.ble_scan_target", time.perf_counter() - start, "s", False)
+
+
+async def bench_fanout(results: Results, quick: bool):
+    import govee_ble
+    from govee_group import fan_out
+    from govee_pool import BlePool
+    print("fanout")
+    sizes = (1, 5, 20) if quick else (1, 5, 20, 50)
+    sim = BleSimulator(max(sizes), SIM_CONNECT_DELAY, SIM_WRITE_LATENCY, echo_delay=SIM_ECHO_DELAY)
+    packets = [govee_ble.cmd_color(0, 255, 0)]
+    with sim.patch(govee_ble):
+        for size in sizes:
+            start = time.perf_counter()
+            await fan_out(sim.addresses[:size], packets, concurrency=5)
+            results.add(f"fanout.connect_per_device_{size}", time.perf_counter() - start, "s", False)
+
+        pool = BlePool(max_connections=max(sizes), client_factory=sim.client)
+        await fan_out(sim.addresses, packets, concurrency=max(sizes), send=pool.send)
+        for size in sizes:
+            start = time.perf_counter()
+            await fan_out(sim.addresses[:size], packets, concurrency=max(sizes), send=pool.send)
+            results.add(f"fanout.pooled_{size}", time.perf_counter() - start, "s", False)
+        await pool.close()
+
+
+async def bench_schedule(results: Results, quick: bool):
+    import govee_schedule
+    print("schedule")
+    result = await govee_schedule.bench(10_000 if quick else 100_000)
+    results.add("schedule.wakeups", result["wakeups"], "wakeups", False)
+    results.add("schedule.lateness_p95", result["lateness_p95_ms"], "ms", False)
+    results.add("schedule.add_timer", result["schedule_us_per_timer"], "us", False)
+    results.add("schedule.cpu", result["cpu_seconds"] * 1000, "ms", False)
+
+
+def bench_startup_suite(results: Results, quick: bool):
+    import bench_startup
+    print("startup")
+    for name, (ms, _, _) in bench_startup.measure(repeat=2 if quick else 5).items():
+        short = name.replace(".py", "").replace(" ", "_").replace("(", "").replace(")", "")
+        results.add(f"startup.{short}", ms, "ms", False)
+
+
+SUITES = {
+    "codec": lambda r, q: bench_codec_suite(r, q),
+    "ble": bench_ble,
+    "lan": bench_lan,
+    "discovery": bench_discovery,
+    "fanout": bench_fanout,
+    "schedule": bench_schedule,
+    "startup": lambda r, q: bench_startup_suite(r, q),
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """Names of metrics that got worse than `threshold` relative to the baseline."""
+    regressions = []
+    for name, metric in current.items():
+        old = baseline.get(name)
+        if old is None or not old["value"]:
+            continue
+        change = (metric["value"] - old["value"]) / old["value"]
+        worse = -change if metric["higher_is_better"] else change
+        if worse > threshold:
+            regressions.append(f"{name}: {old['value']:,.3f} -> {metric['value']:,.3f} {metric['unit']} ({worse:+.0%} worse)")
+    return regressions
+
+
+async def run(only: list[str], quick: bool) -> Results:
+    results = Results()
+    for name in only:
+        suite = SUITES[name]
+        try:
+            outcome = suite(results, quick)
+            if asyncio.iscoroutine(outcome):
+                await outcome
+        except ImportError as e:
+            print(f"  (skipping {name}: {e})")
+    return results
+
+
+def main():
+    args = sys.argv[1:]
+    quick = "--quick" in args
+    if quick:
+        args.remove("--quick")
+    out = compare_path = None
+    only = list(SUITES)
+    while args:
+        flag = args.pop(0)
+        if flag == "--out" and args:
+            out = args.pop(0)
+        elif flag == "--compare" and args:
+            compare_path = args.pop(0)
+        elif flag == "--only" and args:
+            only = args.pop(0).split(",")
+        else:
+            print(__doc__)
+            return 2
+
+    results = asyncio.run(run(only, quick))
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "quick": quick,
+        "metrics": results.metrics,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {out}")
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results.metrics, baseline["metrics"])
+        print(f"\nCompared with {compare_path} ({baseline.get('commit') or 'unknown commit'}):")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            return 1
+        print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Micro-benchmark: frames/second for the old per-script frame builders vs govee_codec.
+
+Usage:
+    python bench_codec.py            # default 200k frames per case
+    python bench_codec.py 50000
+
+No BLE hardware or bleak needed.
+"""
+
+import sys
+import time
+
+import govee_codec as codec
+
+
+def legacy_build_packet(cmd: int, payload: list[int]) -> bytearray:
+    """The bytearray builder that used to live in govee_ble.py / fix_green.py / test_red.py."""
+    packet = bytearray(20)
+    packet[0] = 0x33
+    packet[1] = cmd
+    for i, b in enumerate(payload):
+        packet[2 + i] = b
+    xor = 0
+    for b in packet[:-1]:
+        xor ^= b
+    packet[-1] = xor
+    return packet
+
+
+def legacy_build_frame(cmd, payload):
+    """The bytes-concatenation builder that used to live in set_color.py / debug_ble.py etc."""
+    frame = bytes([0x33, cmd & 0xFF]) + bytes(payload)
+    frame += bytes([0] * (19 - len(frame)))
+    checksum = 0
+    for b in frame:
+        checksum ^= b
+    frame += bytes([checksum & 0xFF])
+    return frame
+
+
+def colors(n: int):
+    return [(i & 0xFF, (i >> 8) & 0xFF, (i * 7) & 0xFF) for i in range(n)]
+
+
+def bench_legacy_build_packet(cs):
+    for r, g, b in cs:
+        legacy_build_packet(0x05, [0x02, r, g, b])
+
+
+def bench_legacy_build_frame(cs):
+    for r, g, b in cs:
+        legacy_build_frame(0x05, [0x02, r, g, b])
+
+
+def bench_encode(cs):
+    encode = codec.encode
+    for r, g, b in cs:
+        encode(0x05, (0x02, r, g, b))
+
+
+def bench_build_packet(cs):
+    from govee_ble import build_packet
+    for r, g, b in cs:
+        build_packet(0x05, [0x02, r, g, b])
+
+
+def bench_encode_into(cs):
+    buf = bytearray(codec.FRAME_LEN)
+    encode_into = codec.encode_into
+    for r, g, b in cs:
+        encode_into(buf, 0x05, (0x02, r, g, b))
+
+
+def bench_encode_color_into(cs):
+    buf = codec.new_color_buffer()
+    encode_color_into = codec.encode_color_into
+    for r, g, b in cs:
+        encode_color_into(buf, r, g, b)
+
+
+def bench_encode_colors(cs):
+    codec.encode_colors(cs)
+
+
+CASES = [
+    ("legacy build_packet", bench_legacy_build_packet),
+    ("legacy build_frame", bench_legacy_build_frame),
+    ("codec.encode", bench_encode),
+    ("govee_ble.build_packet", bench_build_packet),
+    ("codec.encode_into (reused buffer)", bench_encode_into),
+    ("codec.encode_color_into", bench_encode_color_into),
+    ("codec.encode_colors (batch)", bench_encode_colors),
+]
+
+
+def check_equivalent(cs):
+    """All builders must produce identical bytes before their speed means anything."""
+    batch = codec.encode_colors(cs)
+    buf = codec.new_color_buffer()
+    for i, (r, g, b) in enumerate(cs):
+        expected = bytes(legacy_build_packet(0x05, [0x02, r, g, b]))
+        assert legacy_build_frame(0x05, [0x02, r, g, b]) == expected
+        assert codec.encode(0x05, (0x02, r, g, b)) == expected
+        assert bytes(codec.encode_into(bytearray(codec.FRAME_LEN), 0x05, [0x02, r, g, b])) == expected
+        assert bytes(codec.encode_color_into(buf, r, g, b)) == expected
+        assert batch[i * codec.FRAME_LEN:(i + 1) * codec.FRAME_LEN] == expected
+        assert codec.decode(expected) == (0x33, 0x05, expected[2:19])
+
+
+def run(n: int = 200_000, repeat: int = 3):
+    """Time every case (best of `repeat`); returns {name: frames_per_second}."""
+    cs = colors(n)
+    check_equivalent(cs[:1000])
+    results = {}
+    for name, fn in CASES:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(cs)
+            best = min(best, time.perf_counter() - start)
+        results[name] = n / best
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 200_000
+    results = run(n)
+    baseline = results["legacy build_packet"]
+    print(f"{n} color frames per case\n")
+    for name, fps in results.items():
+        print(f"  {name:36s} {fps:>14,.0f} frames/s  ({fps / baseline:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
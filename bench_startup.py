@@ -0,0 +1,108 @@
+"""
+Startup benchmark: how long each entry point takes before it does anything.
+
+Runs each one in a fresh interpreter, measuring wall time (best of a few
+runs) and, with `python -X importtime`, which imports the time went to.
+Every case has a budget; anything over it is reported and the exit code
+is 1, so a heavy import slipping back onto a one-shot path gets noticed.
+
+Usage:
+    python bench_startup.py               # table of cases vs. budgets
+    python bench_startup.py --imports 10  # also list the 10 slowest imports per case
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# (name, argv after the interpreter, budget in ms). Usage-only invocations
+# exit before touching a device, so they measure pure startup.
+CASES = [
+    ("python (baseline)", ["-c", "pass"], 60),
+    ("govee_ctl.py usage", ["govee_ctl.py"], 80),
+    ("govee.py usage", ["govee.py"], 80),
+    ("govee_ble.py usage", ["govee_ble.py"], 250),
+    ("import govee_codec", ["-c", "import govee_codec"], 80),
+    ("import govee_lan", ["-c", "import govee_lan"], 250),
+    ("import govee_ble", ["-c", "import govee_ble"], 250),
+    ("import govee_daemon", ["-c", "import govee_daemon"], 250),
+]
+REPEAT = 5
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wall_time(argv: list[str], repeat: int = REPEAT) -> float:
+    """Best-of-`repeat` seconds to run the interpreter with argv."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(argv: list[str]) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) for every import argv makes, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=HERE,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    return rows
+
+
+def _packages(argv: list[str]) -> list[str]:
+    names = []
+    for _, _, module in import_times(argv):
+        name = module.strip().split(".")[0]
+        if name not in names:
+            names.append(name)
+    return names
+
+
+_site_packages = None
+
+
+def heavy_modules(argv: list[str]) -> list[str]:
+    """Third-party packages argv pulls in (bleak, numpy, ...), not counting
+    whatever the interpreter's site setup loads on its own."""
+    global _site_packages
+    if _site_packages is None:
+        _site_packages = set(_packages(["-c", "pass"]))
+    stdlib = set(getattr(sys, "stdlib_module_names", ()))
+    return [name for name in _packages(argv)
+            if name not in stdlib and name not in _site_packages and not name.startswith(("_", "govee", "bench"))]
+
+
+def measure(repeat: int = REPEAT) -> dict:
+    """{case name: (milliseconds, budget ms, third-party imports)}"""
+    return {name: (wall_time(argv, repeat) * 1000, budget, heavy_modules(argv)) for name, argv, budget in CASES}
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    top = int(args[args.index("--imports") + 1]) if "--imports" in args else 0
+    over = []
+    print(f"{'case':24s} {'ms':>8s} {'budget':>7s}  third-party imports")
+    for name, argv, budget in CASES:
+        ms = wall_time(argv) * 1000
+        flag = "" if ms <= budget else "  OVER BUDGET"
+        print(f"{name:24s} {ms:>8.1f} {budget:>7d}  {', '.join(heavy_modules(argv)) or '-'}{flag}")
+        if ms > budget:
+            over.append(name)
+        if top:
+            for self_us, cumulative_us, module in sorted(import_times(argv), reverse=True)[:top]:
+                print(f"    {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms total  {module.strip()}")
+    if over:
+        print(f"\nOver budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,21 +4,11 @@ Try different channel orderings to find the correct one for green.
 """
 import asyncio
 from bleak import BleakClient
+from govee_ble import build_packet
 
 DEVICE_ADDRESS = "98:17:3C:21:E3:3F"
 WRITE_UUID = "00010203-0405-0607-0809-0a0b0c0d2b11"
 
-def build_packet(cmd: int, payload: list[int]) -> bytearray:
-    packet = bytearray(20)
-    packet[0] = 0x33
-    packet[1] = cmd
-    for i, b in enumerate(payload):
-        packet[2 + i] = b
-    xor = 0
-    for b in packet[:-1]:
-        xor ^= b
-    packet[-1] = xor
-    return packet
 
 async def main():
     async with BleakClient(DEVICE_ADDRESS, timeout=15.0) as client:
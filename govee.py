@@ -0,0 +1,103 @@
+"""
+One command line for both transports, tuned to start fast
+Only what the chosen path needs gets imported: with a daemon running, a
+command is handed to it over its Unix socket using nothing but the standard
+library; --lan loads the UDP client without bleak; the BLE path loads bleak
+only once it actually connects.
+
+Usage:
+    python govee.py color red                       # daemon if running, else BLE
+    python govee.py brightness 50
+    python govee.py --lan 192.168.1.40 color red    # LAN, no bleak import
+    python govee.py --ble 98:17:3C:21:E3:3F on      # straight to BLE, skipping the daemon
+    python govee.py scan                            # BLE scan
+
+Commands are the same as govee_ble.py's (on, off, brightness, temp, color).
+"""
+
+import sys
+
+
+def pop_option(args: list[str], name: str):
+    """Remove `--name value` from args and return the value (or None)."""
+    if name in args:
+        i = args.index(name)
+        value = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+        return value
+    return None
+
+
+def run_daemon(args: list[str]):
+    """Hand the command to a running daemon; None if there isn't one."""
+    import govee_ctl
+    try:
+        reply = govee_ctl.request(" ".join(args))
+    except OSError:
+        return None
+    if reply != "ok":
+        print(f"Daemon: {reply or 'no reply'}")
+    return reply == "ok"
+
+
+def run_lan(ip: str, args: list[str]) -> bool:
+    import asyncio
+    from govee_ble import parse_command
+    from govee_lan import GoveeLanClient, packet_to_message
+
+    pkt, description = parse_command(args)
+    msg = packet_to_message(pkt)
+    if msg is None:
+        print(f"{args[0]} has no LAN equivalent")
+        return False
+    print(description)
+
+    async def send():
+        client = await GoveeLanClient.open()
+        try:
+            client.send(ip, msg)
+        finally:
+            client.close()
+
+    asyncio.run(send())
+    return True
+
+
+def run_ble(address: str, args: list[str]) -> bool:
+    import asyncio
+    import govee_ble
+
+    if args[0].lower() == "scan":
+        asyncio.run(govee_ble.scan_govee(target=args[1] if len(args) >= 2 else None))
+        return True
+    pkt, description = govee_ble.parse_command(args)
+    print(description)
+    return asyncio.run(govee_ble.send_command(pkt, address or govee_ble.DEVICE_ADDRESS))
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    lan_ip = pop_option(args, "--lan")
+    ble_address = pop_option(args, "--ble")
+    if not args:
+        print(__doc__)
+        return 2
+
+    try:
+        if lan_ip:
+            ok = run_lan(lan_ip, args)
+        else:
+            ok = None
+            if ble_address is None and args[0].lower() != "scan":
+                ok = run_daemon(args)
+            if ok is None:
+                ok = run_ble(ble_address, args)
+    except ValueError as e:
+        print(e)
+        return 2
+    print("Done." if ok else "Failed to send command.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Audio-reactive lighting: PCM in, colors out.
+
+Audio is read a hop at a time (one hop per light frame, e.g. 1/30 s), each
+window is Hann-weighted and run through an FFT with NumPy, and the energy
+in a few frequency bands (bass / mid / treble by default) is turned into a
+color by mixing one palette color per band. Each band is normalized against
+its own slowly decaying peak, so the lights follow the music whether it is
+quiet or loud, and falls back with a short release instead of flickering.
+With --brightness the overall loudness (all bands together, normalized the
+same way) drives the light's brightness instead: colors go out at full scale
+and a brightness command follows the music in BRIGHTNESS_STEP steps, sent
+only when the step changes. Frames go out through govee_stream, which drops
+frames the link can't take (over BLE at the rate the light's echoes show it
+keeps up with), so audio-to-light latency stays at about one hop plus half a
+window plus one write.
+
+Usage:
+    python govee_audio.py song.wav                       # BLE, in time with the file
+    python govee_audio.py song.wav --lan 192.168.1.40 --palette fire
+    python govee_audio.py song.wav --brightness          # loudness drives brightness
+    python govee_audio.py song.wav --sim                 # against the simulator
+    python govee_audio.py song.wav --bench               # analysis speed only, no light
+    arecord -f S16_LE -r 44100 -c 1 | python govee_audio.py - --rate 44100
+
+Raw PCM on stdin is signed 16-bit little-endian (--channels for stereo).
+Palettes: rgb, fire, ocean.
+
+Requires: pip install numpy (and bleak for BLE)
+"""
+
+import asyncio
+import sys
+import time
+import wave
+
+import numpy as np
+
+DEFAULT_FPS = 30
+DEFAULT_WINDOW = 2048
+PEAK_DECAY = 0.999        # per frame; a loud passage stops dominating after ~a minute at 30 fps
+RELEASE = 0.85            # per frame; how quickly a band falls back after a hit
+NOISE_FLOOR = 1e-4        # peaks never drop below this, so silence stays dark
+BRIGHTNESS_MIN = 10       # percent at silence, so the light never looks switched off
+BRIGHTNESS_STEP = 10      # percent; finer changes aren't worth a write
+
+BANDS = (("bass", 20, 250), ("mid", 250, 2000), ("treble", 2000, 8000))
+PALETTES = {
+    "rgb": ((255, 0, 0), (0, 255, 0), (0, 0, 255)),
+    "fire": ((255, 30, 0), (255, 120, 0), (255, 220, 120)),
+    "ocean": ((0, 30, 255), (0, 190, 200), (170, 255, 255)),
+}
+
+
+class AudioAnalyzer:
+    """Streaming band-energy analyzer: feed() samples, get one RGB row per hop.
+
+    With `brightness`, rows are RGB at full scale plus a brightness percent
+    that follows the overall loudness.
+    """
+
+    def __init__(self, rate: int, fps: float = DEFAULT_FPS, window: int = DEFAULT_WINDOW,
+                 bands=BANDS, palette=PALETTES["rgb"], brightness: bool = False):
+        self.rate = rate
+        self.brightness = brightness
+        self.hop = max(1, int(round(rate / fps)))
+        self.window = max(window, self.hop)
+        self.hann = np.hanning(self.window).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.window, 1.0 / rate)
+        self.edges = np.array([np.searchsorted(freqs, (lo, hi)) for _, lo, hi in bands])
+        self.palette = np.asarray(palette, dtype=np.float32)          # (bands, 3)
+        self.peaks = np.full(len(bands), NOISE_FLOOR, dtype=np.float32)
+        self.levels = np.zeros(len(bands), dtype=np.float32)
+        self.loudness_peak = NOISE_FLOOR
+        self.loudness = 0.0
+        # Leading silence so the first frame ends on the first hop
+        self._buffer = np.zeros(self.window - self.hop, dtype=np.float32)
+
+    @property
+    def fps(self) -> float:
+        return self.rate / self.hop
+
+    @property
+    def latency(self) -> float:
+        """Seconds between a sound and the frame it shows up in: a hop to fill plus half a window."""
+        return (self.hop + self.window / 2) / self.rate
+
+    def band_energies(self, samples: np.ndarray) -> np.ndarray:
+        """Append mono float samples; returns (frames, bands) energies for every completed hop."""
+        buf = np.concatenate((self._buffer, samples.astype(np.float32, copy=False)))
+        n = (len(buf) - self.window) // self.hop + 1 if len(buf) >= self.window else 0
+        self._buffer = buf[n * self.hop:]
+        if n == 0:
+            return np.empty((0, len(self.edges)), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(buf, self.window)[::self.hop][:n]
+        power = np.abs(np.fft.rfft(frames * self.hann, axis=1)) ** 2
+        cumulative = np.concatenate((np.zeros((n, 1)), np.cumsum(power, axis=1)), axis=1)
+        energies = cumulative[:, self.edges[:, 1]] - cumulative[:, self.edges[:, 0]]
+        return np.sqrt(energies / self.window).astype(np.float32)
+
+    def feed(self, samples: np.ndarray) -> np.ndarray:
+        """Append mono float samples; returns (frames, 3) uint8 colors, or
+        (frames, 4) with the brightness percent last."""
+        energies = self.band_energies(samples)
+        levels = np.empty_like(energies)
+        peaks, current = self.peaks, self.levels
+        for i, row in enumerate(energies):
+            # Adaptive gain per band, then instant attack / exponential release
+            peaks = np.maximum(np.maximum(peaks * PEAK_DECAY, row), NOISE_FLOOR)
+            current = np.maximum(row / peaks, current * RELEASE)
+            levels[i] = current
+        self.peaks, self.levels = peaks, current
+        rgb = levels @ self.palette
+        if not self.brightness:
+            return np.clip(rgb, 0, 255).astype(np.uint8)
+        rgb *= 255 / np.maximum(rgb.max(axis=1, keepdims=True), 1e-6)
+        steps = np.round(self.loudness_levels(energies) * (100 - BRIGHTNESS_MIN) / BRIGHTNESS_STEP)
+        percent = BRIGHTNESS_MIN + steps * BRIGHTNESS_STEP
+        return np.clip(np.column_stack((rgb, percent)), 0, 255).astype(np.uint8)
+
+    def loudness_levels(self, energies: np.ndarray) -> np.ndarray:
+        """0..1 overall level per frame, with the same gain and release as the bands."""
+        totals = np.sqrt((energies ** 2).sum(axis=1))
+        loudness = np.empty_like(totals)
+        peak, current = self.loudness_peak, self.loudness
+        for i, total in enumerate(totals):
+            peak = max(peak * PEAK_DECAY, total, NOISE_FLOOR)
+            current = max(total / peak, current * RELEASE)
+            loudness[i] = current
+        self.loudness_peak, self.loudness = peak, current
+        return np.minimum(loudness, 1.0)
+
+
+def to_mono(raw: bytes, channels: int, sample_width: int = 2) -> np.ndarray:
+    """Interleaved little-endian PCM -> mono float32 in [-1, 1)."""
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def wav_blocks(path: str, hop_frames: int):
+    """(rate, generator of mono sample blocks) for a WAV file, `hop_frames` at a time."""
+    wav = wave.open(path, "rb")
+    rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+
+    def blocks():
+        with wav:
+            while True:
+                raw = wav.readframes(hop_frames)
+                if not raw:
+                    return
+                yield to_mono(raw, channels, width)
+
+    return rate, blocks()
+
+
+def pcm_blocks(stream, hop_frames: int, channels: int = 1):
+    """Mono sample blocks from raw signed 16-bit little-endian PCM."""
+    size = hop_frames * channels * 2
+    while True:
+        raw = stream.read(size)
+        if not raw:
+            return
+        yield to_mono(raw, channels)
+
+
+def colors(analyzer: AudioAnalyzer, blocks):
+    """One (r, g, b), or (r, g, b, brightness) with brightness on, per hop of audio."""
+    for block in blocks:
+        for row in analyzer.feed(block):
+            yield tuple(int(v) for v in row)
+
+
+async def in_thread(iterator):
+    """Async iterator over a blocking one (e.g. reading a pipe), so the sender keeps running."""
+    loop = asyncio.get_running_loop()
+    done = object()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def bench(analyzer: AudioAnalyzer, blocks) -> dict:
+    """Analyze everything as fast as possible; speed is audio seconds per wall second."""
+    start = time.perf_counter()
+    frames = sum(len(analyzer.feed(block)) for block in blocks)
+    elapsed = time.perf_counter() - start
+    audio = frames * analyzer.hop / analyzer.rate
+    return {"frames": frames, "audio_seconds": audio, "elapsed": elapsed, "speed": audio / elapsed if elapsed else 0.0}
+
+
+async def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    from govee_ble import AckWriter, pop_option, resolve_address
+    from govee_stream import lan_sender, paced_sender, stream
+    fps = float(pop_option(args, "--fps", DEFAULT_FPS))
+    palette = PALETTES[pop_option(args, "--palette", "rgb")]
+    lan_ip = pop_option(args, "--lan")
+    rate = int(pop_option(args, "--rate", 44100))
+    channels = int(pop_option(args, "--channels", 1))
+    brightness = "--brightness" in args
+    source = args[0]
+
+    if source == "-":
+        analyzer = AudioAnalyzer(rate, fps, palette=palette, brightness=brightness)
+        blocks = pcm_blocks(sys.stdin.buffer, analyzer.hop, channels)
+    else:
+        with wave.open(source, "rb") as wav:
+            rate = wav.getframerate()
+        analyzer = AudioAnalyzer(rate, fps, palette=palette, brightness=brightness)
+        _, blocks = wav_blocks(source, analyzer.hop)
+
+    if "--bench" in args:
+        result = bench(analyzer, blocks)
+        print(f"Analyzed {result['audio_seconds']:.1f}s of audio ({result['frames']} frames) "
+              f"in {result['elapsed'] * 1000:.0f} ms: {result['speed']:.0f}x real time")
+        return
+
+    print(f"{analyzer.fps:.1f} fps, {analyzer.window}-sample window, analysis latency {analyzer.latency * 1000:.0f} ms")
+    feed = colors(analyzer, blocks)
+    if source == "-":
+        feed = in_thread(feed)    # stdin arrives in real time already; read it off the event loop
+    pace = analyzer.fps
+
+    if lan_ip:
+        from govee_lan import GoveeLanClient
+        client = await GoveeLanClient.open()
+        try:
+            stats = await stream(feed, lan_sender(client, lan_ip), pace)
+        finally:
+            client.close()
+    else:
+        if "--sim" in args:
+            from govee_sim import BleSimulator
+            sim = BleSimulator(1, connect_delay=0.05, write_latency=0.005, echo_delay=0.01)
+            ble = sim.client(sim.addresses[0])
+        else:
+            import govee_ble
+            govee_ble._load_bleak()
+            ble = govee_ble.BleakClient(resolve_address(), timeout=10.0)
+        await ble.connect()
+        try:
+            acks = AckWriter(ble)
+            await acks.start()
+            stats = await stream(feed, paced_sender(acks), pace)
+        finally:
+            await ble.disconnect()
+    print(f"Sent {stats['sent']}/{stats['pushed']} frames ({stats['fps']:.1f} fps), {stats['dropped']} dropped, "
+          f"write latency p95 {stats['latency_p95'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,14 +8,35 @@ Usage:
     python govee_ble.py color 255 0 0        # RGB red
     python govee_ble.py color 0 255 0        # RGB green
     python govee_ble.py brightness 50        # 0-100
+    python govee_ble.py temp 4000            # color temperature in K
     python govee_ble.py scan                 # Find Govee devices
+    python govee_ble.py scan ihoment_H6008_E33F   # Stop as soon as this one shows up
+    python govee_ble.py color red --group livingroom            # every light in a group
+    python govee_ble.py off --group livingroom --concurrency 3  # at most 3 connections at once
+    python govee_ble.py on --device ihoment_H6199_1A2B           # another light, by name, MAC or IP
+
+Commands go through govee_daemon.py when it is running, which skips the
+BLE connect entirely. Lights are looked up in the device registry
+(govee_registry.py), so a name works as well as a MAC.
 
 Requires: pip install bleak
 """
 
 import asyncio
+import os
+import re
 import sys
-from bleak import BleakClient, BleakScanner
+import time
+from collections import defaultdict, deque
+from typing import NamedTuple
+
+from govee_codec import encode, to_color_layout
+from govee_metrics import METRICS
+from govee_trace import IN, OUT, TRACE
+
+# bleak is imported on first BLE use (_load_bleak), so printing usage, parsing
+# a command or handing it to a running daemon doesn't pay for it.
+BleakClient = BleakScanner = None
 
 # Your Govee H6008
 DEVICE_ADDRESS = "98:17:3C:21:E3:3F"
@@ -25,19 +46,13 @@ DEVICE_NAME = "ihoment_H6008_E33F"
 WRITE_UUID = "00010203-0405-0607-0809-0a0b0c0d2b11"
 NOTIFY_UUID = "00010203-0405-0607-0809-0a0b0c0d2b10"
 
+# How long to wait for the device to echo a command before moving on anyway
+ACK_TIMEOUT = 1.0
 
-def build_packet(cmd: int, payload: list[int]) -> bytearray:
+
+def build_packet(cmd: int, payload: list[int], head: int = 0x33) -> bytearray:
     """Build a 20-byte Govee BLE command packet with XOR checksum."""
-    packet = bytearray(20)
-    packet[0] = 0x33
-    packet[1] = cmd
-    for i, b in enumerate(payload):
-        packet[2 + i] = b
-    xor = 0
-    for b in packet[:-1]:
-        xor ^= b
-    packet[-1] = xor
-    return packet
+    return bytearray(encode(cmd, payload, head))
 
 
 def cmd_power_on():
@@ -56,10 +71,175 @@ def cmd_color_temp(kelvin: int):
     """Set color temperature. Range varies by device, typically 2000-9000K."""
     return build_packet(0x05, [0x02, 0xFF, 0xFF, 0xFF, 0x01, (kelvin >> 8) & 0xFF, kelvin & 0xFF])
 
+def cmd_keep_alive():
+    """Keep-alive the Govee app sends every couple of seconds on an idle link."""
+    return build_packet(0x01, [], head=0xAA)
+
+
+class AckWriter:
+    """Writes packets and waits for the device's notification echo instead of sleeping.
+
+    The light answers each command on NOTIFY_UUID with a frame that starts with
+    the same header and command byte (33 05 ... for a color), so a write is
+    matched to the oldest pending waiter for that (header, cmd) pair. If no echo
+    arrives within the timeout the write is treated as delivered anyway, which
+    is the same thing the fixed sleeps assumed. `echoed` records whether the
+    light has echoed anything yet, so callers can tell a light that never
+    echoes from one that stopped.
+
+    Color frames are converted to `layout`, by default the one govee_probe.py
+    cached for the device's model when the writer was created, so every BLE
+    path sends colors the way the light takes them. Pass DEFAULT_COLOR_LAYOUT
+    to send frames untouched, or wrap single frames in govee_codec.RawFrame.
+    """
+
+    def __init__(self, client, timeout: float = ACK_TIMEOUT, layout: str = None):
+        self.client = client
+        self.timeout = timeout
+        self.subscribed = False
+        self.echoed = False
+        self.listeners = []          # called with every notification, e.g. DeviceState.apply_notification
+        self._waiters = defaultdict(deque)
+        device = self.device = getattr(client, "address", "")
+        self.layout = layout or (color_layout(device) if device else None)
+        self._write_seconds = METRICS.histogram("govee_write_seconds", device=device, transport="ble")
+        self._ack_seconds = METRICS.histogram("govee_ack_seconds", device=device, transport="ble")
+        self._ack_timeouts = METRICS.counter("govee_ack_timeouts_total", device=device, transport="ble")
+
+    async def start(self):
+        """Subscribe to notifications. Without them every write just waits out the timeout."""
+        try:
+            await self.client.start_notify(NOTIFY_UUID, self._on_notify)
+            self.subscribed = True
+        except Exception as e:
+            print(f"Could not subscribe to notify: {e}")
+        return self.subscribed
+
+    def _on_notify(self, sender, data: bytearray):
+        TRACE.record(IN, "ble", self.device, data)
+        for listener in self.listeners:
+            listener(data)
+        if len(data) < 2:
+            return
+        waiters = self._waiters.get((data[0], data[1]))
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.done():
+                self.echoed = True
+                fut.set_result(bytes(data))
+                return
+
+    def to_layout(self, packet: bytes) -> bytes:
+        """The packet as this device takes it: color frames in its layout."""
+        return to_color_layout(packet, self.layout) if self.layout else packet
+
+    async def write(self, packet: bytes, wait: bool = True):
+        """Write a packet and return the device's echo, or None on timeout / no wait."""
+        packet = self.to_layout(packet)
+        TRACE.record(OUT, "ble", self.device, packet)
+        if not wait:
+            with self._write_seconds.time():
+                await self.client.write_gatt_char(WRITE_UUID, packet, response=False)
+            return None
+        key = (packet[0], packet[1])
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[key].append(fut)
+        try:
+            start = time.perf_counter()
+            await self.client.write_gatt_char(WRITE_UUID, packet, response=False)
+            self._write_seconds.observe(time.perf_counter() - start)
+            echo = await asyncio.wait_for(fut, self.timeout)
+            self._ack_seconds.observe(time.perf_counter() - start)
+            return echo
+        except asyncio.TimeoutError:
+            self._ack_timeouts.inc()
+            return None
+        finally:
+            if not fut.done():
+                fut.cancel()
+            waiters = self._waiters[key]
+            if fut in waiters:
+                waiters.remove(fut)
+
+
+def _load_bleak():
+    global BleakClient, BleakScanner
+    if BleakClient is None or BleakScanner is None:
+        import bleak
+        BleakClient = BleakClient or bleak.BleakClient
+        BleakScanner = BleakScanner or bleak.BleakScanner
+
+
+_layouts = {}                # address -> color layout, looked up in _layout_registry
+_layout_registry = None      # (DeviceRegistry, its file's mtime when read)
+
+
+def forget_layouts():
+    """Drop the cached layouts so the next lookup reads the registry again."""
+    global _layout_registry
+    _layout_registry = None
+    _layouts.clear()
+
+
+def _mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def color_layout(address: str):
+    """Color layout govee_probe.py cached for this device's model, or None for
+    the default. The registry is read once per process and again once its
+    file has changed, so a new probe result reaches the next AckWriter; an
+    AckWriter that already exists keeps the layout it was created with."""
+    global _layout_registry
+    if _layout_registry is not None and _mtime(_layout_registry[0].path) != _layout_registry[1]:
+        forget_layouts()
+    if address not in _layouts:
+        if _layout_registry is None:
+            from govee_registry import DeviceRegistry, REGISTRY_PATH
+            mtime = _mtime(REGISTRY_PATH)
+            _layout_registry = (DeviceRegistry(REGISTRY_PATH), mtime)
+        _layouts[address] = _layout_registry[0].layout_for(address)
+    return _layouts[address]
+
+
+def resolve_address(key: str = None) -> str:
+    """BLE address for a MAC, name or IP (DEVICE_ADDRESS if none), looked up
+    in the registry; a key the registry doesn't know is used as given."""
+    from govee_registry import DeviceRegistry
+    key = key or DEVICE_ADDRESS
+    registry = DeviceRegistry()
+    record = registry.resolve(key, "ble") or registry.find(key)
+    return record.get("address", key) if record else key
+
+
+async def send_sequence(packets: list[bytes], address: str = DEVICE_ADDRESS):
+    """Connect once and send several packets, each paced by the device's ack."""
+    _load_bleak()
+    start = time.perf_counter()
+    async with BleakClient(address, timeout=10.0) as client:
+        METRICS.histogram("govee_connect_seconds", device=address, transport="ble").observe(time.perf_counter() - start)
+        if not client.is_connected:
+            print("Failed to connect.")
+            return False
+        acks = AckWriter(client)
+        await acks.start()
+        for packet in packets:
+            await acks.write(packet)
+        return True
+
 
 async def send_command(packet: bytearray, address: str = DEVICE_ADDRESS):
     """Connect to the Govee device and send a single command."""
+    _load_bleak()
+    layout = color_layout(address)
+    if layout:
+        packet = to_color_layout(packet, layout)
+    start = time.perf_counter()
     async with BleakClient(address, timeout=10.0) as client:
+        METRICS.histogram("govee_connect_seconds", device=address, transport="ble").observe(time.perf_counter() - start)
         if not client.is_connected:
             print("Failed to connect.")
             return False
@@ -67,18 +247,115 @@ async def send_command(packet: bytearray, address: str = DEVICE_ADDRESS):
         return True
 
 
-async def scan_govee():
-    """Scan for nearby Govee BLE devices."""
-    print("Scanning for Govee BLE devices (10 seconds)...")
-    devices = await BleakScanner.discover(timeout=10.0, return_adv=True)
+GOVEE_NAME_HINTS = ["govee", "ihoment", "h6", "h7"]
+_MODEL_RE = re.compile(r"(H[67]\d{3})", re.IGNORECASE)
+
+
+class Advertisement(NamedTuple):
+    """What one Govee advertisement tells us without connecting."""
+    address: str
+    name: str
+    model: str
+    rssi: int
+    manufacturer_id: int
+    manufacturer_data: bytes
+
+
+def parse_advertisement(device, adv_data):
+    """Advertisement record for a Govee device, or None for anything else.
+
+    The model comes from the advertised name (ihoment_H6008_E33F). The
+    manufacturer data is kept as raw bytes: unlike the H5xxx sensors, the
+    lights' payload layout isn't documented and none of the captures here
+    show which bytes carry the model or power state, so nothing is read
+    from it. `govee_ble.py scan` prints it and the registry keeps it, to
+    collect captures to work that out from.
+    """
+    name = device.name or adv_data.local_name or ""
+    if not any(x in name.lower() for x in GOVEE_NAME_HINTS):
+        return None
+    match = _MODEL_RE.search(name)
+    manufacturer_id, manufacturer_data = next(iter(adv_data.manufacturer_data.items()), (None, b""))
+    return Advertisement(
+        address=device.address,
+        name=name,
+        model=match.group(1).upper() if match else None,
+        rssi=adv_data.rssi,
+        manufacturer_id=manufacturer_id,
+        manufacturer_data=bytes(manufacturer_data),
+    )
+
+
+async def scan_stream(timeout: float = 10.0, target: str = None, limit: int = None):
+    """Yield Govee devices as their advertisements arrive.
+
+    Stops after `timeout` seconds, as soon as `target` (an address or name) has
+    been seen, or after `limit` devices - whichever comes first. Wrap in
+    contextlib.aclosing() if you break out of the loop early, so the scanner
+    is stopped straight away.
+    """
+    queue = asyncio.Queue()
+    seen = set()
+
+    def on_detect(device, adv_data):
+        if device.address in seen:
+            return
+        ad = parse_advertisement(device, adv_data)
+        if ad is not None:
+            seen.add(device.address)
+            queue.put_nowait(ad)
+
+    _load_bleak()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    count = 0
+    scanner = BleakScanner(detection_callback=on_detect)
+    await scanner.start()
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                ad = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            if target is not None and target.lower() not in (ad.address.lower(), ad.name.lower()):
+                continue
+            yield ad
+            count += 1
+            if target is not None or (limit is not None and count >= limit):
+                return
+    finally:
+        await scanner.stop()
+
+
+async def scan_govee(timeout: float = 10.0, registry=None, target: str = None, limit: int = None):
+    """Scan for nearby Govee BLE devices and record them in the device registry.
+
+    With `target` or `limit` the scan ends as soon as enough devices have
+    advertised instead of always waiting out the timeout.
+    """
+    from govee_registry import DeviceRegistry
+    registry = registry if registry is not None else DeviceRegistry()
+    if target:
+        print(f"Looking for {target} (up to {timeout:.0f} seconds)...")
+    else:
+        print(f"Scanning for Govee BLE devices ({timeout:.0f} seconds)...")
     found = []
-    for address, (device, adv_data) in devices.items():
-        name = device.name or adv_data.local_name or ""
-        if any(x in name.lower() for x in ["govee", "ihoment", "h6", "h7"]):
-            found.append((name, device.address, adv_data.rssi))
-            print(f"  Found: {name} | {device.address} | RSSI: {adv_data.rssi}")
+    start = time.perf_counter()
+    async for ad in scan_stream(timeout, target, limit):
+        found.append((ad.name, ad.address, ad.rssi))
+        record = registry.update_from_ble(ad.address, ad.name, ad.rssi, model=ad.model, save=False)
+        if ad.manufacturer_id is not None:
+            record["manufacturer"] = f"{ad.manufacturer_id:04x}:{ad.manufacturer_data.hex()}"
+        print(f"  Found: {ad.name} | {ad.address} | RSSI: {ad.rssi}" + (f" | {ad.model}" if ad.model else "")
+              + (f" | mfr {record['manufacturer']}" if ad.manufacturer_id is not None else ""))
+    METRICS.histogram("govee_scan_seconds", transport="ble").observe(time.perf_counter() - start)
     if not found:
         print("  No Govee devices found nearby.")
+    else:
+        registry.save()
     return found
 
 
@@ -96,44 +373,93 @@ NAMED_COLORS = {
 }
 
 
+def parse_command(args: list[str]):
+    """Turn CLI-style args (e.g. ["color", "red"]) into (packet, description).
+
+    Raises ValueError with a usage message if the args don't form a command.
+    """
+    action = args[0].lower()
+    if action == "on":
+        return cmd_power_on(), "Turning ON..."
+    if action == "off":
+        return cmd_power_off(), "Turning OFF..."
+    if action == "brightness" and len(args) >= 2:
+        val = int(args[1])
+        return cmd_brightness(val), f"Setting brightness to {val}%..."
+    if action == "temp" and len(args) >= 2:
+        kelvin = int(args[1])
+        return cmd_color_temp(kelvin), f"Setting color temperature to {kelvin}K..."
+    if action == "color" and len(args) >= 2:
+        if args[1].lower() in NAMED_COLORS:
+            r, g, b = NAMED_COLORS[args[1].lower()]
+        elif len(args) >= 4:
+            r, g, b = int(args[1]), int(args[2]), int(args[3])
+        else:
+            raise ValueError(
+                "Usage: govee_ble.py color <r> <g> <b>  OR  govee_ble.py color <name>\n"
+                f"Named colors: {', '.join(NAMED_COLORS.keys())}"
+            )
+        return cmd_color(r, g, b), f"Setting color to ({r}, {g}, {b})..."
+    raise ValueError(f"Unknown command: {action}\n{__doc__}")
+
+
+def pop_option(args: list[str], name: str, default=None):
+    """Remove `--name value` from args and return the value."""
+    if name in args:
+        i = args.index(name)
+        if i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        del args[i]
+    return default
+
+
+def parse_duration(text: str) -> float:
+    """Seconds from "90", "90s", "30m" or "2h"."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
 async def main():
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    group = pop_option(args, "--group")
+    concurrency = pop_option(args, "--concurrency")
+    device = pop_option(args, "--device")
+
+    if not args or (concurrency is not None and not (concurrency.isdigit() and int(concurrency) > 0)):
         print(__doc__)
         return
+    concurrency = int(concurrency) if concurrency is not None else None
 
-    action = sys.argv[1].lower()
+    action = args[0].lower()
 
     if action == "scan":
-        await scan_govee()
+        await scan_govee(target=args[1] if len(args) >= 2 else None)
         return
 
-    if action == "on":
-        pkt = cmd_power_on()
-        print("Turning ON...")
-    elif action == "off":
-        pkt = cmd_power_off()
-        print("Turning OFF...")
-    elif action == "brightness" and len(sys.argv) >= 3:
-        val = int(sys.argv[2])
-        pkt = cmd_brightness(val)
-        print(f"Setting brightness to {val}%...")
-    elif action == "color" and len(sys.argv) >= 3:
-        if sys.argv[2].lower() in NAMED_COLORS:
-            r, g, b = NAMED_COLORS[sys.argv[2].lower()]
-        elif len(sys.argv) >= 5:
-            r, g, b = int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
-        else:
-            print("Usage: govee_ble.py color <r> <g> <b>  OR  govee_ble.py color <name>")
-            print(f"Named colors: {', '.join(NAMED_COLORS.keys())}")
-            return
-        pkt = cmd_color(r, g, b)
-        print(f"Setting color to ({r}, {g}, {b})...")
-    else:
-        print(f"Unknown command: {action}")
-        print(__doc__)
+    try:
+        pkt, description = parse_command(args)
+    except ValueError as e:
+        print(e)
+        return
+    print(description)
+
+    if group:
+        from govee_group import MAX_CONCURRENT, send_to_group
+        try:
+            await send_to_group(group, [pkt], concurrency or MAX_CONCURRENT)
+        except KeyError as e:
+            print(e.args[0])
         return
 
-    ok = await send_command(pkt)
+    # A running govee_daemon.py already holds the connection; use it if it's up.
+    from govee_daemon import send_via_daemon
+    ok = await send_via_daemon(args) if device is None else None
+    if ok is None:
+        ok = await send_command(pkt, resolve_address(device))
     if ok:
         print("Done.")
     else:
@@ -0,0 +1,217 @@
+"""
+Govee BLE frame codec
+One place that knows the 20-byte frame layout:
+
+    [head] [cmd] [payload ... zero padded to 17 bytes] [xor of the first 19 bytes]
+
+head is 0x33 for commands and 0xAA for keep-alive / status frames.
+
+The encoders write into a buffer you hand them, so a stream of frames can
+reuse one preallocated bytearray (or a slice of a bigger one) instead of
+allocating per frame. The checksum is folded from head ^ cmd over just the
+payload bytes as they go in, rather than in a second pass over the whole
+padded frame.
+
+No dependencies - safe to import from anything.
+"""
+
+from functools import reduce
+from operator import xor
+from typing import NamedTuple
+
+FRAME_LEN = 20
+PAYLOAD_LEN = FRAME_LEN - 3
+HEAD_CMD = 0x33
+HEAD_KEEP_ALIVE = 0xAA
+
+CMD_POWER = 0x01
+CMD_BRIGHTNESS = 0x04
+CMD_COLOR = 0x05
+MODE_MANUAL = 0x02
+
+_PADS = [bytes(PAYLOAD_LEN - n) for n in range(PAYLOAD_LEN + 1)]    # zero padding after an n-byte payload
+_BYTE = [bytes((i,)) for i in range(256)]
+
+# Color command layouts seen across H6xxx models: (cmd, bytes before R G B,
+# bytes after). Which one a model takes is found by govee_probe.py and cached
+# per model in the registry; everything is built as "05/02" and converted.
+COLOR_LAYOUTS = {
+    "05/02": (CMD_COLOR, (MODE_MANUAL,), ()),        # manual mode (H6001, H6008)
+    "05/01": (CMD_COLOR, (0x01,), ()),
+    "05/04": (CMD_COLOR, (0x04,), ()),
+    "05/15": (CMD_COLOR, (0x15, 0x01), (0, 0, 0, 0, 0, 0xFF, 0x7F)),   # segmented models, all segments
+    "0b/02": (0x0B, (0x02,), ()),
+    "a1/02": (0xA1, (0x02,), ()),
+}
+DEFAULT_COLOR_LAYOUT = "05/02"
+
+# Color frames only differ in bytes 3..5 (R, G, B) and the checksum, so the fast path
+# starts from this template and patches those four bytes.
+_COLOR_TEMPLATE = bytes([HEAD_CMD, CMD_COLOR, MODE_MANUAL]) + bytes(FRAME_LEN - 3)
+_COLOR_BASE_XOR = HEAD_CMD ^ CMD_COLOR ^ MODE_MANUAL
+
+
+class RawFrame(bytes):
+    """A frame to send exactly as written, e.g. a scene's "raw" step: color
+    layout conversion (to_color_layout) leaves it alone."""
+
+
+class Frame(NamedTuple):
+    head: int
+    cmd: int
+    payload: bytes
+
+
+def checksum(frame) -> int:
+    """XOR of the first 19 bytes of a frame."""
+    return reduce(xor, frame[:FRAME_LEN - 1], 0)
+
+
+def encode_into(buf, cmd: int, payload=(), head: int = HEAD_CMD, offset: int = 0):
+    """Encode one frame into buf[offset:offset + 20] and return buf.
+
+    buf can be a bytearray or a writable memoryview; payload any sequence of
+    byte values. The header, payload and padding go in with one slice
+    assignment.
+    """
+    n = len(payload)
+    if n > PAYLOAD_LEN:
+        raise ValueError(f"payload is {n} bytes, max {PAYLOAD_LEN}")
+    cmd &= 0xFF
+    check = head ^ cmd
+    for value in payload:
+        check ^= value
+    end = offset + FRAME_LEN - 1
+    buf[offset:end] = bytes((head, cmd, *payload)) + _PADS[n]
+    buf[end] = check
+    return buf
+
+
+def encode(cmd: int, payload=(), head: int = HEAD_CMD) -> bytes:
+    """Encode one frame into a new bytes object."""
+    n = len(payload)
+    if n > PAYLOAD_LEN:
+        raise ValueError(f"payload is {n} bytes, max {PAYLOAD_LEN}")
+    cmd &= 0xFF
+    check = head ^ cmd
+    for value in payload:
+        check ^= value
+    return bytes((head, cmd, *payload)) + _PADS[n] + _BYTE[check]
+
+
+def encode_color_into(buf, r: int, g: int, b: int, offset: int = 0):
+    """Fast path for manual-mode color frames (33 05 02 R G B ...).
+
+    Assumes buf[offset:offset + 20] already holds a color frame (see
+    new_color_buffer), so only the RGB bytes and checksum are rewritten.
+    """
+    r &= 0xFF
+    g &= 0xFF
+    b &= 0xFF
+    buf[offset + 3] = r
+    buf[offset + 4] = g
+    buf[offset + 5] = b
+    buf[offset + FRAME_LEN - 1] = _COLOR_BASE_XOR ^ r ^ g ^ b
+    return buf
+
+
+def new_color_buffer(count: int = 1) -> bytearray:
+    """Buffer of `count` black color frames, ready for encode_color_into."""
+    buf = bytearray(_COLOR_TEMPLATE * count)
+    buf[FRAME_LEN - 1::FRAME_LEN] = bytes([_COLOR_BASE_XOR]) * count
+    return buf
+
+
+def encode_batch(frames, out: bytearray = None) -> bytearray:
+    """Encode (cmd, payload) pairs back to back into one contiguous buffer."""
+    frames = list(frames)
+    if out is None:
+        out = bytearray(FRAME_LEN * len(frames))
+    elif len(out) < FRAME_LEN * len(frames):
+        raise ValueError("output buffer too small")
+    for i, (cmd, payload) in enumerate(frames):
+        encode_into(out, cmd, payload, offset=i * FRAME_LEN)
+    return out
+
+
+def encode_colors(colors, out: bytearray = None) -> bytearray:
+    """Encode many (r, g, b) color frames into one contiguous buffer.
+
+    The RGB columns and checksums are written with extended-slice assignment,
+    so the per-frame work stays in C.
+    """
+    colors = list(colors)
+    count = len(colors)
+    if out is None:
+        out = bytearray(_COLOR_TEMPLATE * count)
+    elif len(out) < FRAME_LEN * count:
+        raise ValueError("output buffer too small")
+    else:
+        out[:FRAME_LEN * count] = _COLOR_TEMPLATE * count
+    if not count:
+        return out
+    end = FRAME_LEN * count
+    rs = bytes(c[0] & 0xFF for c in colors)
+    gs = bytes(c[1] & 0xFF for c in colors)
+    bs = bytes(c[2] & 0xFF for c in colors)
+    out[3:end:FRAME_LEN] = rs
+    out[4:end:FRAME_LEN] = gs
+    out[5:end:FRAME_LEN] = bs
+    sums = (int.from_bytes(rs, "big") ^ int.from_bytes(gs, "big") ^ int.from_bytes(bs, "big")
+            ^ int.from_bytes(bytes([_COLOR_BASE_XOR]) * count, "big"))
+    out[FRAME_LEN - 1:end:FRAME_LEN] = sums.to_bytes(count, "big")
+    return out
+
+
+def iter_frames(buf):
+    """Yield each 20-byte frame of a batch buffer as a memoryview (no copies)."""
+    view = memoryview(buf)
+    for offset in range(0, len(view) - FRAME_LEN + 1, FRAME_LEN):
+        yield view[offset:offset + FRAME_LEN]
+
+
+def is_valid(frame) -> bool:
+    return len(frame) == FRAME_LEN and checksum(frame) == frame[FRAME_LEN - 1]
+
+
+def decode(frame) -> Frame:
+    """Validate and split a frame (e.g. a NOTIFY_UUID notification).
+
+    Raises ValueError on a wrong length or bad checksum. The payload keeps its
+    zero padding, since some replies carry meaningful trailing zeros.
+    """
+    if len(frame) != FRAME_LEN:
+        raise ValueError(f"frame is {len(frame)} bytes, expected {FRAME_LEN}")
+    expected = checksum(frame)
+    if expected != frame[FRAME_LEN - 1]:
+        raise ValueError(f"bad checksum 0x{frame[FRAME_LEN - 1]:02x}, expected 0x{expected:02x}")
+    return Frame(frame[0], frame[1], bytes(frame[2:FRAME_LEN - 1]))
+
+
+def encode_color_layout(layout: str, r: int, g: int, b: int) -> bytes:
+    """Color frame in one of COLOR_LAYOUTS."""
+    cmd, before, after = COLOR_LAYOUTS[layout]
+    return encode(cmd, (*before, r & 0xFF, g & 0xFF, b & 0xFF, *after))
+
+
+def match_color_layout(frame):
+    """(layout, (r, g, b)) for a color frame in any of COLOR_LAYOUTS, else None."""
+    if len(frame) != FRAME_LEN or frame[0] != HEAD_CMD:
+        return None
+    for name, (cmd, before, _) in COLOR_LAYOUTS.items():
+        n = len(before)
+        if frame[1] == cmd and tuple(frame[2:2 + n]) == before:
+            return name, (frame[2 + n], frame[3 + n], frame[4 + n])
+    return None
+
+
+def to_color_layout(packet, layout: str):
+    """Re-encode a manual-mode color frame (what cmd_color builds) in `layout`;
+    anything else, including color temperature frames and RawFrames, is
+    returned as is."""
+    if layout == DEFAULT_COLOR_LAYOUT or isinstance(packet, RawFrame):
+        return packet
+    if (len(packet) != FRAME_LEN or packet[0] != HEAD_CMD or packet[1] != CMD_COLOR
+            or packet[2] != MODE_MANUAL or packet[6] == 0x01):
+        return packet
+    return encode_color_layout(layout, packet[3], packet[4], packet[5])
@@ -0,0 +1,65 @@
+"""
+Minimal client for a running govee_daemon.py
+Imports nothing but the standard library and never touches Bluetooth, so a
+command from another process or a shell script costs one round trip to the
+daemon's Unix socket instead of a bleak import and a BLE connect.
+
+Usage:
+    python govee_ctl.py color red
+    python govee_ctl.py brightness 50
+    python govee_ctl.py stats
+
+Prints the daemon's reply; exits 0 on "ok", 1 on an error reply and 2 if no
+daemon is running. Set GOVEE_SOCKET if the daemon uses a different socket.
+"""
+
+import os
+import socket
+import sys
+
+DAEMON_SOCKET = os.environ.get("GOVEE_SOCKET", "/tmp/govee.sock")
+DAEMON_ADDRESS = ("127.0.0.1", 4040)
+TIMEOUT = 15.0     # the daemon may be waiting out a reconnect
+
+
+def connect() -> socket.socket:
+    """Connect to the daemon's Unix socket, or its TCP port if there isn't one."""
+    if hasattr(socket, "AF_UNIX") and os.path.exists(DAEMON_SOCKET):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(DAEMON_SOCKET)
+            return sock
+        except OSError:
+            sock.close()
+    return socket.create_connection(DAEMON_ADDRESS, timeout=TIMEOUT)
+
+
+def request(line: str) -> str:
+    """Send one command line and return the reply line."""
+    with connect() as sock:
+        sock.settimeout(TIMEOUT)
+        sock.sendall(line.encode() + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return reply.decode().strip()
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 2
+    try:
+        reply = request(" ".join(sys.argv[1:]))
+    except OSError as e:
+        print(f"No daemon running ({e})")
+        return 2
+    print(reply)
+    return 0 if reply.startswith("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,468 @@
+"""
+Govee BLE session daemon
+Holds one BLE connection open to the light and accepts commands from local
+clients, so a color change costs a single GATT write instead of a full
+connect + service discovery.
+
+Usage:
+    python govee_daemon.py                          # serve the default device
+    python govee_daemon.py 98:17:3C:21:E3:3F        # serve another device (MAC or registry name)
+    python govee_daemon.py send color red           # send through a running daemon
+    python govee_daemon.py --skip-unchanged         # drop writes that wouldn't change the light
+    python govee_daemon.py --http 8040              # also answer HTTP on 127.0.0.1:8040
+
+Clients connect to the Unix socket /tmp/govee.sock (GOVEE_SOCKET, or
+--socket) or to 127.0.0.1:4040 and send one command per line, using the
+same syntax as govee_ble.py (on, off, brightness 50, color red, temp 4000).
+Each line is answered with "ok" or "err <reason>". "stats" answers with the
+write counters, e.g. "ok sent=12 elided=5 pending=0 skipped=3", and "state"
+with what the light is believed to be showing. "trace [name]" dumps the
+recent frames to ~/.govee_traces/<name> for govee_trace.py to show or
+replay (a plain file name only, never a path), and
+"scene <name>" plays a compiled scene (govee_scenes.py) as ambient frames
+until "scene stop" or the next scene. govee_ctl.py is a client that imports
+nothing but the standard library, and from a shell
+
+    echo "color red" | nc -U /tmp/govee.sock
+    curl -X POST http://127.0.0.1:8040/color/red
+
+work just as well. With --http, GET /metrics returns connect / write / ack
+latency histograms and failure counters in Prometheus text format (see
+govee_metrics.py).
+
+None of the listeners ask for credentials, so they only ever bind to
+127.0.0.1. Commands over HTTP must be POSTs (GET is only for /metrics,
+/stats and /state), and requests whose Host isn't localhost or whose Origin
+is another site are refused, so a web page in a local browser can't drive
+the light, directly or through DNS rebinding.
+
+Commands from all clients share one PriorityScheduler (govee_priority.py):
+a burst of color changes only puts the last one on the wire, and a command
+can be prefixed with its class - "alert color red --hold 5" jumps ahead of
+everything, suspends the rest for 5 seconds and then restores what was
+showing; "ambient ..." is for effect frames that anything else may preempt.
+
+Requires: pip install bleak
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import unquote, urlsplit
+
+from govee_ble import DEVICE_ADDRESS, AckWriter, cmd_keep_alive, parse_command, pop_option, resolve_address
+from govee_metrics import METRICS
+from govee_priority import DEFAULT_PRIORITY, PRIORITIES, PriorityScheduler
+from govee_rate import RateController
+from govee_state import STATUS_QUERIES, DeviceState
+from govee_trace import TRACE, trace_path
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 4040
+DAEMON_SOCKET = os.environ.get("GOVEE_SOCKET", "/tmp/govee.sock")
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+HTTP_READ_ONLY = ("/metrics", "/stats", "/state")     # the only paths a GET may ask for
+
+KEEP_ALIVE_INTERVAL = 2.0   # seconds of write silence before a keep-alive
+RECONNECT_MIN = 1.0         # first reconnect delay, doubled on each failure
+RECONNECT_MAX = 30.0
+WRITE_TIMEOUT = 10.0        # how long a command waits for the link to come back
+
+BleakClient = None          # imported when the session first connects; `send` never needs it
+
+
+class GoveeSession:
+    """One long-lived BLE connection with keep-alive and reconnect-with-backoff."""
+
+    def __init__(self, address: str = DEVICE_ADDRESS, keep_alive: float = KEEP_ALIVE_INTERVAL,
+                 skip_unchanged: bool = False):
+        self.address = address
+        self.keep_alive = keep_alive
+        self.skip_unchanged = skip_unchanged
+        self.state = DeviceState()
+        self.client = None
+        self.acks = None
+        self.rate = None           # paces writes that don't wait for their echo
+        self._connected = asyncio.Event()
+        self._dropped = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._last_write = 0.0
+        self._closing = False
+        self._task = None
+        self.queue = PriorityScheduler(self.write, device=address)
+        self.scene = None          # task playing a govee_scenes scene, if any
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.is_connected
+
+    def start(self):
+        """Start the connect/keep-alive loop in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        self._closing = True
+        self._dropped.set()
+        stop_scene(self)
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def wait_connected(self, timeout: float = WRITE_TIMEOUT) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def write(self, packet: bytes, timeout: float = WRITE_TIMEOUT, wait_ack: bool = True) -> bool:
+        """Write one packet over the open connection, waiting for a reconnect if needed.
+
+        With wait_ack the call returns once the device has echoed the command
+        (or the ack timeout passed), so back-to-back commands stay in order;
+        without, it returns once the learned write rate (govee_rate.py) lets
+        the packet go out, so a burst isn't silently dropped by the light.
+        With skip_unchanged, a command that wouldn't change the known state of
+        the light is reported as sent without touching the link.
+        """
+        if self.skip_unchanged and not self.state.would_change(packet):
+            self.state.skipped += 1
+            return True
+        if not self._connected.is_set() and not await self.wait_connected(timeout):
+            return False
+        async with self._write_lock:
+            try:
+                if wait_ack:
+                    await self.acks.write(packet)
+                else:
+                    await self.rate.write(packet)
+            except Exception as e:
+                print(f"Write failed: {e}")
+                self._dropped.set()
+                return False
+            self._last_write = time.monotonic()
+        self.state.apply_packet(packet)
+        return True
+
+    def _on_disconnect(self, client):
+        self._dropped.set()
+
+    async def _run(self):
+        global BleakClient
+        if BleakClient is None:
+            from bleak import BleakClient
+        delay = RECONNECT_MIN
+        connects = METRICS.histogram("govee_connect_seconds", device=self.address, transport="ble")
+        failures = METRICS.counter("govee_connect_failures_total", device=self.address, transport="ble")
+        reconnects = METRICS.counter("govee_reconnects_total", device=self.address, transport="ble")
+        was_connected = False
+        while not self._closing:
+            self._dropped.clear()
+            client = BleakClient(self.address, timeout=10.0, disconnected_callback=self._on_disconnect)
+            try:
+                start = time.perf_counter()
+                await client.connect()
+            except Exception as e:
+                failures.inc()
+                print(f"Connect to {self.address} failed: {e}")
+            else:
+                connects.observe(time.perf_counter() - start)
+                if was_connected:
+                    reconnects.inc()
+                was_connected = True
+                print(f"Connected to {self.address}")
+                self.client = client
+                try:
+                    await self._setup(client)
+                except Exception as e:
+                    # The link can drop between connect and the first writes; back off and retry
+                    failures.inc()
+                    print(f"Setting up {self.address} failed: {e}")
+                else:
+                    delay = RECONNECT_MIN
+                    await self._keep_alive_loop()
+                self._connected.clear()
+                self.client = None
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+                if not self._closing:
+                    print(f"Lost connection to {self.address}")
+
+            if self._closing:
+                break
+            print(f"Reconnecting in {delay:.0f}s...")
+            try:
+                await asyncio.wait_for(self._wait_closing(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    async def _setup(self, client):
+        """Subscribe to notifications, ask for the light's state and open the session for writes."""
+        self.acks = AckWriter(client)
+        self.acks.listeners.append(self.state.apply_notification)
+        await self.acks.start()
+        self.rate = RateController(self.acks)
+        # Ask for power/brightness/color so skip_unchanged has something to go on
+        for query in STATUS_QUERIES:
+            await self.acks.write(query, wait=False)
+        self._last_write = time.monotonic()
+        self._connected.set()
+
+    async def _wait_closing(self):
+        while not self._closing:
+            self._dropped.clear()
+            await self._dropped.wait()
+
+    async def _keep_alive_loop(self):
+        """Sleep until the link drops, writing a keep-alive whenever it goes quiet."""
+        while not self._closing and self.is_connected:
+            idle_for = time.monotonic() - self._last_write
+            try:
+                await asyncio.wait_for(self._dropped.wait(), max(0.0, self.keep_alive - idle_for))
+                return
+            except asyncio.TimeoutError:
+                pass
+            if time.monotonic() - self._last_write >= self.keep_alive:
+                if not await self.write(cmd_keep_alive(), timeout=0, wait_ack=False):
+                    return
+
+
+async def execute(session: GoveeSession, args: list[str]) -> str:
+    """Run one command line against the session and return the reply line."""
+    if args[0].lower() == "stats":
+        stats = dict(session.queue.stats(), skipped=session.state.skipped)
+        if session.rate is not None:
+            stats["write_rate"] = round(session.rate.rate, 1)
+        return "ok " + " ".join(f"{k}={v}" for k, v in stats.items())
+    if args[0].lower() == "trace":
+        try:
+            path = trace_path(*args[1:2])
+            return f"ok {path} records={TRACE.dump(path)}"
+        except (OSError, ValueError) as e:
+            return f"err {e}"
+    if args[0].lower() == "state":
+        state = session.state.as_dict()
+        return "ok " + " ".join(f"{k}={str(v).replace(' ', '')}" for k, v in state.items())
+    priority = args.pop(0).lower() if args[0].lower() in PRIORITIES and len(args) > 1 else DEFAULT_PRIORITY
+    if args[0].lower() == "scene":
+        return start_scene(session, args[1:], priority if priority != DEFAULT_PRIORITY else "ambient")
+    hold = pop_option(args, "--hold")
+    try:
+        pkt, _ = parse_command(args)
+        hold = float(hold) if hold else 0.0
+    except ValueError as e:
+        return "err " + str(e).splitlines()[0]
+    if priority == "alert":
+        ok = await session.queue.alert([pkt], hold=hold)
+    else:
+        ok = await session.queue.submit(pkt, priority)
+    return "ok" if ok else "err device not connected"
+
+
+def stop_scene(session: GoveeSession):
+    if session.scene is not None:
+        session.scene.cancel()
+        session.scene = None
+
+
+def start_scene(session: GoveeSession, args: list[str], priority: str) -> str:
+    """Play a compiled scene (govee_scenes.py) in the background, replacing
+    any scene already playing; "scene stop" just stops."""
+    stop_scene(session)
+    if not args or args[0] == "stop":
+        return "ok"
+    from govee_scenes import SceneLibrary, play
+    try:
+        library = SceneLibrary()
+    except (OSError, ValueError) as e:
+        return f"err {e}"
+    if args[0] not in library:
+        library.close()
+        return f"err unknown scene: {args[0]}"
+    scene = library[args[0]]
+
+    async def run():
+        try:
+            await play(scene, lambda packet: session.queue.submit(packet, priority), loops=0)
+        finally:
+            scene.frames.release()
+            library.close()
+
+    session.scene = asyncio.create_task(run())
+    return f"ok {scene.info.name} frames={scene.info.count}"
+
+
+def render_metrics(session: GoveeSession) -> str:
+    """Prometheus text for the shared METRICS plus this session's queue counters."""
+    labels = {"device": session.address, "transport": "ble"}
+    METRICS.counter("govee_writes_elided_total", **labels).value = session.queue.elided
+    METRICS.counter("govee_writes_skipped_total", **labels).value = session.state.skipped
+    return METRICS.render()
+
+
+async def handle_client(session: GoveeSession, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve one local client: a command per line, "ok"/"err ..." per reply."""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            args = line.decode(errors="replace").split()
+            if not args:
+                continue
+            if args[-1].startswith("HTTP/"):
+                break     # a browser pointed at the line port; its body must not run as commands
+            writer.write((await execute(session, args)).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def is_local_request(headers: dict) -> bool:
+    """Whether an HTTP request names this machine as its Host and, if it
+    comes from a web page, the page is served from this machine too."""
+    host = headers.get("host")
+    if host is not None and urlsplit("//" + host).hostname not in LOCAL_HOSTS:
+        return False
+    origin = headers.get("origin")
+    return origin is None or urlsplit(origin).hostname in LOCAL_HOSTS
+
+
+async def handle_http(session: GoveeSession, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve one HTTP request. The command is the path and/or the body:
+    POST /color/red, POST /brightness/50, or POST / with body "color 255 0 0"."""
+
+    async def respond(status: str, payload: bytes, content_type: str = "application/json"):
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+
+    try:
+        request = (await reader.readline()).decode(errors="replace").split()
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode(errors="replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            await respond("400 Bad Request", json.dumps({"ok": False, "reply": "bad Content-Length"}).encode())
+            return
+        body = (await reader.readexactly(length)).decode(errors="replace") if length else ""
+        method = request[0].upper() if request else ""
+        path = request[1].split("?")[0] if len(request) >= 2 else "/"
+        if not is_local_request(headers):
+            await respond("403 Forbidden", json.dumps({"ok": False, "reply": "not a local request"}).encode())
+            return
+        if method != "POST" and not (method == "GET" and path in HTTP_READ_ONLY):
+            await respond("405 Method Not Allowed", json.dumps({"ok": False, "reply": "commands need POST"}).encode())
+            return
+        if path == "/metrics":
+            await respond("200 OK", render_metrics(session).encode(), "text/plain; version=0.0.4")
+            return
+        args = [unquote(part) for part in path.split("/") if part] + body.split()
+        reply = await execute(session, args) if args else "err no command"
+        ok = reply.startswith("ok")
+        payload = json.dumps({"ok": ok, "reply": reply.partition(" ")[2]}).encode()
+        await respond("200 OK" if ok else "400 Bad Request", payload)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(address: str = DEVICE_ADDRESS, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                skip_unchanged: bool = False, socket_path: str = DAEMON_SOCKET, http_port: int = None):
+    session = GoveeSession(address, skip_unchanged=skip_unchanged)
+    session.start()
+    # Keep the registry current for the clients that resolve devices through it
+    from govee_registry import DeviceRegistry
+    refresh = DeviceRegistry().start_background_refresh()
+    servers = [await asyncio.start_server(lambda r, w: handle_client(session, r, w), host, port)]
+    print(f"Serving {address} on {host}:{port}")
+    if socket_path and hasattr(asyncio, "start_unix_server"):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)   # left over from a daemon that didn't shut down cleanly
+        servers.append(await asyncio.start_unix_server(lambda r, w: handle_client(session, r, w), socket_path))
+        os.chmod(socket_path, 0o600)
+        print(f"Serving {address} on {socket_path}")
+    if http_port:
+        servers.append(await asyncio.start_server(lambda r, w: handle_http(session, r, w), host, http_port))
+        print(f"Serving {address} on http://{host}:{http_port}/")
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        refresh.cancel()
+        for server in servers:
+            server.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        await session.close()
+
+
+async def send_via_daemon(args: list[str], host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                          socket_path: str = DAEMON_SOCKET):
+    """Send one command through a running daemon, over its Unix socket if there is one.
+
+    Returns True/False for the daemon's answer, or None if no daemon is listening.
+    """
+    try:
+        if socket_path and os.path.exists(socket_path):
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return None
+    try:
+        writer.write(" ".join(args).encode() + b"\n")
+        await writer.drain()
+        reply = (await reader.readline()).decode().strip()
+    finally:
+        writer.close()
+    if reply != "ok":
+        print(f"Daemon: {reply or 'no reply'}")
+    return reply == "ok"
+
+
+async def main():
+    if len(sys.argv) >= 2 and sys.argv[1].lower() == "send":
+        if len(sys.argv) < 3:
+            print(__doc__)
+            return
+        ok = await send_via_daemon(sys.argv[2:])
+        if ok is None:
+            print(f"No daemon listening on {DAEMON_SOCKET} or {DAEMON_HOST}:{DAEMON_PORT}")
+        print("Done." if ok else "Failed to send command.")
+        return
+
+    args = sys.argv[1:]
+    skip_unchanged = "--skip-unchanged" in args
+    if skip_unchanged:
+        args.remove("--skip-unchanged")
+    http_port = pop_option(args, "--http")
+    socket_path = pop_option(args, "--socket", DAEMON_SOCKET)
+    address = resolve_address(args[0] if args else None)
+    await serve(address, skip_unchanged=skip_unchanged, socket_path=socket_path,
+                http_port=int(http_port) if http_port else None)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
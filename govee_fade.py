@@ -0,0 +1,231 @@
+"""
+Smooth transitions between colors / brightness / color temperature.
+
+The whole fade is computed up front with NumPy: eased values for every
+frame, quantized to what the light can show, consecutive duplicates dropped
+per channel (a slow fade repeats the same byte values a lot), and encoded
+into 20-byte frames in one shot. Playback then just walks the table and
+sends, skipping ahead if the link falls behind so the fade still ends on
+time. Over BLE the writes are paced by a govee_rate RateController, so the
+light isn't sent frames faster than its echoes show it applies them.
+
+Usage:
+    python govee_fade.py red blue 2                   # 2 second fade over BLE
+    python govee_fade.py 255 0 0 0 0 255 5 --easing linear
+    python govee_fade.py warm white 3 --lan 192.168.1.40
+
+Requires: pip install numpy (and bleak for BLE playback)
+"""
+
+import asyncio
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from govee_codec import CMD_BRIGHTNESS, CMD_COLOR, FRAME_LEN, HEAD_CMD, MODE_MANUAL
+
+DEFAULT_FPS = 30
+
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) ** 2,
+    "ease_in_out": lambda t: t * t * (3 - 2 * t),
+    "sine": lambda t: 0.5 - 0.5 * np.cos(np.pi * t),
+}
+
+
+class Transition(NamedTuple):
+    times: np.ndarray     # float64 seconds from the start, one per frame, ascending
+    frames: np.ndarray    # uint8 (n, 20) encoded packets
+
+
+def encode_frames(cmd: int, payloads: np.ndarray) -> np.ndarray:
+    """Vectorized encoder: one 20-byte frame per row of `payloads` (uint8, n x k)."""
+    n, k = payloads.shape
+    frames = np.zeros((n, FRAME_LEN), dtype=np.uint8)
+    frames[:, 0] = HEAD_CMD
+    frames[:, 1] = cmd
+    frames[:, 2:2 + k] = payloads
+    frames[:, FRAME_LEN - 1] = np.bitwise_xor.reduce(frames[:, :FRAME_LEN - 1], axis=1)
+    return frames
+
+
+def _changed(values: np.ndarray) -> np.ndarray:
+    """Mask of rows that differ from the row before (the first row always counts)."""
+    mask = np.ones(len(values), dtype=bool)
+    if values.ndim == 1:
+        mask[1:] = values[1:] != values[:-1]
+    else:
+        mask[1:] = np.any(values[1:] != values[:-1], axis=1)
+    return mask
+
+
+def plan(
+    start_rgb=None,
+    end_rgb=None,
+    duration: float = 1.0,
+    easing: str = "ease_in_out",
+    fps: float = DEFAULT_FPS,
+    start_brightness: int = None,
+    end_brightness: int = None,
+    start_kelvin: int = None,
+    end_kelvin: int = None,
+) -> Transition:
+    """Precompute every frame of a fade.
+
+    Any of the three channels can be faded: RGB, brightness (0-100, as in
+    cmd_brightness) and color temperature in Kelvin (as in cmd_color_temp,
+    which replaces the RGB frames). Leave a channel's start/end as None to
+    leave it alone.
+    """
+    ease = EASINGS[easing]
+    steps = max(2, int(round(duration * fps)) + 1)
+    t = np.linspace(0.0, 1.0, steps)
+    e = ease(t)
+    times = t * duration
+    parts = []
+
+    if start_kelvin is not None and end_kelvin is not None:
+        kelvin = np.rint(start_kelvin + (end_kelvin - start_kelvin) * e).astype(np.int64)
+        keep = _changed(kelvin)
+        k = kelvin[keep]
+        payloads = np.empty((len(k), 7), dtype=np.uint8)
+        payloads[:, :4] = [MODE_MANUAL, 0xFF, 0xFF, 0xFF]
+        payloads[:, 4] = 0x01
+        payloads[:, 5] = (k >> 8) & 0xFF
+        payloads[:, 6] = k & 0xFF
+        parts.append((times[keep], encode_frames(CMD_COLOR, payloads)))
+    elif start_rgb is not None and end_rgb is not None:
+        a = np.asarray(start_rgb, dtype=np.float64)
+        b = np.asarray(end_rgb, dtype=np.float64)
+        rgb = np.clip(np.rint(a + (b - a) * e[:, None]), 0, 255).astype(np.uint8)
+        keep = _changed(rgb)
+        payloads = np.empty((int(keep.sum()), 4), dtype=np.uint8)
+        payloads[:, 0] = MODE_MANUAL
+        payloads[:, 1:] = rgb[keep]
+        parts.append((times[keep], encode_frames(CMD_COLOR, payloads)))
+
+    if start_brightness is not None and end_brightness is not None:
+        level = np.clip(np.rint(start_brightness + (end_brightness - start_brightness) * e), 0, 100).astype(np.uint8)
+        keep = _changed(level)
+        parts.append((times[keep], encode_frames(CMD_BRIGHTNESS, level[keep][:, None])))
+
+    if not parts:
+        raise ValueError("nothing to fade: give start and end for at least one channel")
+    all_times = np.concatenate([p[0] for p in parts])
+    all_frames = np.concatenate([p[1] for p in parts])
+    order = np.argsort(all_times, kind="stable")
+    return Transition(all_times[order], all_frames[order])
+
+
+async def play(transition: Transition, send, realtime: bool = True) -> dict:
+    """Send a precomputed transition through `send(packet)` (an async callable).
+
+    With realtime, frames go out on their timestamps; if the link can't keep
+    up, frames that are already overdue are skipped and only the newest due
+    frame of each command type is sent, so the fade finishes on time at
+    whatever rate the link sustains. Without realtime every frame is sent
+    back to back. Returns counts of sent/skipped frames.
+    """
+    times, frames = transition
+    total = len(times)
+    sent = skipped = 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    i = 0
+    while i < total:
+        if not realtime:
+            await send(frames[i].tobytes())
+            sent += 1
+            i += 1
+            continue
+        now = loop.time() - start
+        if times[i] > now:
+            await asyncio.sleep(times[i] - now)
+            now = loop.time() - start
+        j = max(i + 1, int(np.searchsorted(times, now, side="right")))
+        due = frames[i:j]
+        # Newest due frame per command byte, in their original order
+        last = {}
+        for k, cmd in enumerate(due[:, 1]):
+            last[cmd] = k
+        for k in sorted(last.values()):
+            await send(due[k].tobytes())
+        sent += len(last)
+        skipped += len(due) - len(last)
+        i = j
+    return {"frames": total, "sent": sent, "skipped": skipped, "elapsed": loop.time() - start}
+
+
+def lan_sender(client, ip: str):
+    """Adapt a govee_lan.GoveeLanClient into a send(packet) for play()."""
+    from govee_lan import packet_to_message
+
+    async def send(packet: bytes):
+        msg = packet_to_message(packet)
+        if msg is not None:
+            client.send(ip, msg)
+        await asyncio.sleep(0)
+
+    return send
+
+
+def parse_color(args: list[str]):
+    """Pop one color (a NAMED_COLORS name or three ints) off the front of args."""
+    from govee_ble import NAMED_COLORS
+    if args[0].lower() in NAMED_COLORS:
+        return NAMED_COLORS[args.pop(0).lower()]
+    rgb = tuple(int(x) for x in args[:3])
+    del args[:3]
+    return rgb
+
+
+async def main():
+    args = sys.argv[1:]
+    if len(args) < 3:
+        print(__doc__)
+        return
+    from govee_ble import pop_option
+    easing = pop_option(args, "--easing", "ease_in_out")
+    fps = pop_option(args, "--fps", DEFAULT_FPS)
+    lan_ip = pop_option(args, "--lan")
+    try:
+        fps = float(fps)
+        if fps <= 0:
+            raise ValueError(fps)
+        start_rgb = parse_color(args)
+        end_rgb = parse_color(args)
+        duration = float(args[0]) if args else 1.0
+        if easing not in EASINGS or len(start_rgb) != 3 or len(end_rgb) != 3:
+            raise ValueError(easing)
+    except (ValueError, IndexError):
+        print(__doc__)
+        return
+
+    t0 = time.perf_counter()
+    transition = plan(start_rgb, end_rgb, duration, easing, fps)
+    print(f"Planned {len(transition.times)} frames in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    if lan_ip:
+        from govee_lan import GoveeLanClient
+        client = await GoveeLanClient.open()
+        try:
+            stats = await play(transition, lan_sender(client, lan_ip))
+        finally:
+            client.close()
+    else:
+        from bleak import BleakClient
+        from govee_ble import AckWriter, resolve_address
+        from govee_stream import paced_sender
+        async with BleakClient(resolve_address(), timeout=10.0) as ble:
+            acks = AckWriter(ble)
+            await acks.start()
+            stats = await play(transition, paced_sender(acks))
+    print(f"Sent {stats['sent']}/{stats['frames']} frames ({stats['skipped']} skipped) in {stats['elapsed']:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Multi-device fan-out
+Sends the same packets (or per-device packets) to many lights at once, with
+at most `concurrency` BLE connections open at a time. Adapters only have a
+handful of connection slots, so the cap should match yours; a 20-light scene
+then takes roughly 20 / concurrency connect times instead of 20.
+
+Used by govee_ble.py for --group:
+    python govee_ble.py color red --group livingroom
+    python govee_ble.py off --group livingroom --concurrency 3
+
+Groups are defined in the device registry (see govee_registry.py).
+"""
+
+import asyncio
+import time
+from typing import NamedTuple
+
+MAX_CONCURRENT = 5   # typical BlueZ adapter; many manage 7, some only 3
+
+
+class DeviceResult(NamedTuple):
+    address: str
+    ok: bool
+    latency: float     # seconds from getting a slot to the last write
+    error: str = None
+
+
+async def fan_out(addresses: list[str], packets, concurrency: int = MAX_CONCURRENT, send=None) -> list[DeviceResult]:
+    """Send packets to every address concurrently, `concurrency` at a time.
+
+    `packets` is either one list of packets for all devices or a dict of
+    {address: [packets]}. `send(address, packets)` defaults to
+    govee_ble.send_sequence (connect once, ack-paced writes) and must return
+    a truthy value on success. Failures are reported per device, never raised.
+    """
+    if send is None:
+        from govee_ble import send_sequence
+        send = lambda address, pkts: send_sequence(pkts, address)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(address: str) -> DeviceResult:
+        pkts = packets[address] if isinstance(packets, dict) else packets
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = bool(await send(address, pkts))
+                error = None if ok else "failed to connect"
+            except Exception as e:
+                ok, error = False, str(e) or type(e).__name__
+            return DeviceResult(address, ok, time.perf_counter() - start, error)
+
+    return await asyncio.gather(*(one(address) for address in addresses))
+
+
+def print_report(results: list[DeviceResult], elapsed: float = None):
+    for r in sorted(results, key=lambda r: r.latency):
+        status = "ok" if r.ok else f"FAILED ({r.error})"
+        print(f"  {r.address} | {r.latency * 1000:7.0f} ms | {status}")
+    failed = sum(not r.ok for r in results)
+    summary = f"{len(results) - failed}/{len(results)} devices ok"
+    if elapsed is not None:
+        summary += f" in {elapsed:.2f}s"
+    print(summary)
+
+
+async def send_to_group(group: str, packets, concurrency: int = MAX_CONCURRENT, registry=None, pool=None) -> list[DeviceResult]:
+    """Resolve a registry group and fan the packets out to it.
+
+    Pass a govee_pool.BlePool to reuse its warm connections instead of
+    connecting to every device from scratch.
+    """
+    from govee_registry import DeviceRegistry
+    registry = registry if registry is not None else DeviceRegistry()
+    addresses = registry.group_addresses(group)
+    start = time.perf_counter()
+    results = await fan_out(addresses, packets, concurrency, send=pool.send if pool is not None else None)
+    print_report(results, time.perf_counter() - start)
+    return results
@@ -1,13 +1,25 @@
 """
 Govee LAN API controller - more reliable than BLE for color control.
 Govee devices on the same LAN respond to UDP multicast commands.
+
+The plain functions (scan_devices, set_color, ...) open a socket per call and
+are fine for one-shot scripts. GoveeLanClient keeps one bound socket per
+interface on the reply port and exposes the same commands as coroutines, for
+callers that send many commands from one event loop.
 """
+import asyncio
 import socket
 import json
 import time
 
+from govee_codec import CMD_BRIGHTNESS, CMD_COLOR, CMD_POWER, HEAD_CMD, MODE_MANUAL
+from govee_metrics import METRICS
+from govee_state import StateCache
+from govee_trace import IN, OUT, TRACE
+
 GOVEE_MULTICAST = "239.255.255.250"
 GOVEE_PORT = 4001
+GOVEE_REPLY_PORT = 4002
 GOVEE_CMD_PORT = 4003
 
 def scan_devices(timeout=5):
@@ -76,39 +88,232 @@ def set_brightness(ip, brightness):
     sock.close()
     print(f"Sent brightness {brightness} to {ip}")
 
-if __name__ == "__main__":
-    print("Scanning for Govee devices on LAN...")
-    devices = scan_devices(timeout=5)
+def encode_message(cmd: str, data: dict) -> bytes:
+    """Encode a LAN API message the way the devices expect it."""
+    return json.dumps({"msg": {"cmd": cmd, "data": data}}, separators=(",", ":")).encode()
 
-    if not devices:
-        print("No devices found on LAN. Trying direct broadcast...")
-        # Try broadcast on common subnets
+
+# Messages sent at high rates are pre-encoded or formatted from a bytes
+# template rather than going through json.dumps every time.
+MSG_SCAN = encode_message("scan", {"account_topic": "reserve"})
+MSG_ON = encode_message("turn", {"value": 1})
+MSG_OFF = encode_message("turn", {"value": 0})
+MSG_STATUS = encode_message("devStatus", {})
+_MSG_BRIGHTNESS = b'{"msg":{"cmd":"brightness","data":{"value":%d}}}'
+_MSG_COLOR = b'{"msg":{"cmd":"colorwc","data":{"color":{"r":%d,"g":%d,"b":%d},"colorTemInKelvin":%d}}}'
+
+
+def msg_brightness(brightness: int) -> bytes:
+    return _MSG_BRIGHTNESS % max(0, min(100, brightness))
+
+
+def msg_color(r: int, g: int, b: int, kelvin: int = 0) -> bytes:
+    return _MSG_COLOR % (r & 0xFF, g & 0xFF, b & 0xFF, kelvin)
+
+
+def packet_to_message(packet: bytes):
+    """LAN equivalent of a BLE command packet (power, brightness, color), or
+    None for commands the LAN API has no counterpart for."""
+    if packet[0] != HEAD_CMD:
+        return None
+    if packet[1] == CMD_POWER:
+        return MSG_ON if packet[2] else MSG_OFF
+    if packet[1] == CMD_BRIGHTNESS:
+        return msg_brightness(packet[2])
+    if packet[1] == CMD_COLOR and packet[2] == MODE_MANUAL:
+        kelvin = (packet[7] << 8 | packet[8]) if packet[6] == 0x01 else 0
+        return msg_color(packet[3], packet[4], packet[5], kelvin)
+    return None
+
+
+class _LanProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        print(f"LAN socket error: {exc}")
+
+
+class GoveeLanClient:
+    """Asyncio LAN client: one bound UDP socket for commands and replies.
+
+    The socket is bound to the Govee reply port on `interface`, so scan and
+    devStatus answers arrive on the same socket the commands go out of and are
+    handled as they come in. Commands are fire-and-forget datagrams queued on
+    the shared transport; there is no per-call socket setup.
+
+        client = await GoveeLanClient.open()
+        await client.set_color("192.168.1.40", 0, 255, 0)
+    """
+
+    _by_interface = {}
+
+    def __init__(self, interface: str = "0.0.0.0"):
+        self.interface = interface
+        self.transport = None
+        self._scans = []
+        self._status_waiters = {}
+        self.states = StateCache()     # ip -> DeviceState, fed by devStatus replies
+        self._sent = {}                # ip -> messages counter, looked up once per device
+
+    @classmethod
+    async def open(cls, interface: str = "0.0.0.0") -> "GoveeLanClient":
+        """Return the shared client for an interface, binding it on first use."""
+        client = cls._by_interface.get(interface)
+        if client is None or client.transport is None:
+            client = cls(interface)
+            await client.start()
+            cls._by_interface[interface] = client
+        return client
+
+    async def start(self):
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.settimeout(5)
-        msg = json.dumps({"msg": {"cmd": "scan", "data": {"account_topic": "reserve"}}})
-        sock.sendto(msg.encode(), ("255.255.255.255", GOVEE_PORT))
+        # Room for a burst of scan replies from a lot of devices at once
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        if self.interface != "0.0.0.0":
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+        sock.bind((self.interface, GOVEE_REPLY_PORT))
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: _LanProtocol(self), sock=sock)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self._by_interface.get(self.interface) is self:
+            del self._by_interface[self.interface]
+
+    def _on_datagram(self, data: bytes, addr):
+        TRACE.record(IN, "lan", addr[0], data)
+        try:
+            msg = json.loads(data)["msg"]
+        except (ValueError, KeyError, TypeError):
+            return
+        cmd = msg.get("cmd")
+        if cmd == "scan":
+            for found in self._scans:
+                found.setdefault(addr[0], msg.get("data", {}))
+        elif cmd == "devStatus":
+            self.states[addr[0]].apply_lan_status(msg.get("data", {}))
+            fut = self._status_waiters.pop(addr[0], None)
+            if fut is not None and not fut.done():
+                fut.set_result(msg.get("data", {}))
+
+    def send(self, ip: str, message: bytes, port: int = GOVEE_CMD_PORT):
+        """Queue one pre-encoded message on the shared socket."""
+        self.transport.sendto(message, (ip, port))
+        TRACE.record(OUT, "lan", ip, message)
+        counter = self._sent.get(ip)
+        if counter is None:
+            counter = self._sent[ip] = METRICS.counter("govee_lan_messages_total", device=ip, transport="lan")
+        counter.value += 1
+
+    async def scan(self, timeout: float = 2.0, broadcast: bool = True, targets=None) -> dict:
+        """Send a scan and collect {ip: device data} for `timeout` seconds.
+
+        The multicast and the 255.255.255.255 broadcast go out together rather
+        than one after the other. `targets` replaces both with explicit
+        (host, port) pairs, e.g. a govee_sim.LanSimulator's scan_address.
+        """
+        if targets is None:
+            targets = [(GOVEE_MULTICAST, GOVEE_PORT)]
+            if broadcast:
+                targets.append(("255.255.255.255", GOVEE_PORT))
+        found = {}
+        self._scans.append(found)
+        start = time.perf_counter()
+        try:
+            for host, port in targets:
+                self.send(host, MSG_SCAN, port)
+            await asyncio.sleep(timeout)
+        finally:
+            self._scans.remove(found)
+        METRICS.histogram("govee_scan_seconds", transport="lan").observe(time.perf_counter() - start)
+        return found
+
+    async def turn_on(self, ip: str):
+        self.send(ip, MSG_ON)
+
+    async def turn_off(self, ip: str):
+        self.send(ip, MSG_OFF)
+
+    async def set_brightness(self, ip: str, brightness: int):
+        self.send(ip, msg_brightness(brightness))
+
+    async def set_color(self, ip: str, r: int, g: int, b: int, kelvin: int = 0):
+        self.send(ip, msg_color(r, g, b, kelvin))
+
+    async def status(self, ip: str, timeout: float = 1.0):
+        """Ask a device for devStatus; returns its data dict or None on timeout."""
+        fut = self._status_waiters.get(ip)
+        if fut is None or fut.done():
+            fut = asyncio.get_running_loop().create_future()
+            self._status_waiters[ip] = fut
+        self.send(ip, MSG_STATUS)
         try:
-            while True:
-                data, addr = sock.recvfrom(4096)
-                device = json.loads(data.decode())
-                devices.append((device, addr))
-                print(f"Found device: {json.dumps(device, indent=2)} from {addr}")
-        except socket.timeout:
-            pass
-        sock.close()
-
-    if devices:
-        device_data, addr = devices[0]
-        ip = addr[0]
-        print(f"\nUsing device at {ip}")
-
-        turn_on(ip)
-        time.sleep(0.5)
-        set_brightness(ip, 100)
-        time.sleep(0.5)
-        set_color(ip, "H6008", 0, 255, 0)  # Pure green
-        print("Done! Light should be green.")
-    else:
-        print("\nNo Govee devices found on LAN.")
-        print("The H6008 may not support LAN API, falling back to BLE approach.")
+            start = time.perf_counter()
+            data = await asyncio.wait_for(asyncio.shield(fut), timeout)
+            METRICS.histogram("govee_lan_status_seconds", device=ip, transport="lan").observe(time.perf_counter() - start)
+            return data
+        except asyncio.TimeoutError:
+            METRICS.counter("govee_lan_status_timeouts_total", device=ip, transport="lan").inc()
+            if self._status_waiters.get(ip) is fut:
+                del self._status_waiters[ip]
+            return None
+
+async def find_device(client: GoveeLanClient, registry=None, timeout: float = 5.0):
+    """IP of a LAN device: the cached one if it still answers devStatus, else a rescan."""
+    from govee_registry import DeviceRegistry
+    registry = registry if registry is not None else DeviceRegistry()
+
+    record = registry.resolve(transport="lan")
+    if record is not None:
+        if await client.status(record["ip"]) is not None:
+            print(f"Using cached device {record.get('model') or ''} at {record['ip']}")
+            registry.update(record["mac"], "lan")
+            return record["ip"]
+        print(f"Cached device at {record['ip']} did not answer, rescanning...")
+        registry.invalidate(record["mac"], "lan")
+
+    print("Scanning for Govee devices on LAN (multicast + broadcast)...")
+    devices = await client.scan(timeout=timeout)
+    for ip, device in devices.items():
+        print(f"Found device: {json.dumps(device, indent=2)} from {ip}")
+        registry.update_from_lan(ip, device, save=False)
+    if not devices:
+        return None
+    registry.save()
+    return next(iter(devices))
+
+
+async def main():
+    client = await GoveeLanClient.open()
+    try:
+        ip = await find_device(client)
+
+        if ip:
+            print(f"\nUsing device at {ip}")
+
+            await client.turn_on(ip)
+            await asyncio.sleep(0.5)
+            await client.set_brightness(ip, 100)
+            await asyncio.sleep(0.5)
+            await client.set_color(ip, 0, 255, 0)  # Pure green
+            print("Done! Light should be green.")
+        else:
+            print("\nNo Govee devices found on LAN.")
+            print("The H6008 may not support LAN API, falling back to BLE approach.")
+            from govee_ble import cmd_brightness, cmd_color, cmd_power_on, send_sequence
+            await send_sequence([cmd_power_on(), cmd_brightness(100), cmd_color(0, 255, 0)])
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,191 @@
+"""
+Latency histograms and counters, exported in Prometheus text format.
+
+The long-running pieces (daemon, pool, LAN client, router) record into the
+shared METRICS instance: connect and discovery times, GATT write and
+notification-ack latency, LAN status round trips, and counters for
+failures, retries, ack timeouts and elided/skipped writes, labelled by
+device and transport. A running daemon serves them at /metrics on its HTTP
+port (python govee_daemon.py --http 8040).
+
+Recording is a bisect and two additions, and hot paths look their metric up
+once and keep the handle, so it costs next to nothing per write:
+
+    writes = METRICS.histogram("govee_write_seconds", device=address, transport="ble")
+    with writes.time():
+        await client.write_gatt_char(...)
+    METRICS.counter("govee_ack_timeouts_total", device=address).inc()
+
+Each histogram also keeps its most recent samples for p50/p95/p99
+(summary()), which Prometheus gets as a separate <name>_recent summary.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Seconds; BLE connects land in the upper buckets, LAN round trips in the lower
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_SAMPLES = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "Histogram"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """Cumulative bucket counts (for Prometheus) plus a window of recent samples."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "recent")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)    # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def time(self) -> _Timer:
+        """Context manager that observes how long its block took."""
+        return _Timer(self)
+
+    def quantiles(self) -> dict:
+        return {q: quantile(self.recent, q) for q in QUANTILES}
+
+
+def _label_text(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Named, labelled counters and histograms."""
+
+    def __init__(self):
+        self.counters = {}      # (name, labels) -> Counter
+        self.histograms = {}    # (name, labels) -> Histogram
+        self.help = {}
+
+    def counter(self, name: str, **labels) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = Counter()
+        return counter
+
+    def histogram(self, name: str, buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        return histogram
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def summary(self) -> dict:
+        """{"name{labels}": value or {"count", "p50", "p95", "p99"}} for printing."""
+        out = {}
+        for (name, labels), counter in sorted(self.counters.items()):
+            out[name + _label_text(labels)] = counter.value
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            q = histogram.quantiles()
+            out[name + _label_text(labels)] = {
+                "count": histogram.count,
+                "p50": q[0.5], "p95": q[0.95], "p99": q[0.99],
+            }
+        return out
+
+    def render(self) -> str:
+        """Everything in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        by_name = {}
+        for (name, labels), counter in sorted(self.counters.items()):
+            by_name.setdefault(name, []).append((labels, counter))
+        for name, series in by_name.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, counter in series:
+                lines.append(f"{name}{_label_text(labels)} {counter.value}")
+
+        by_name = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name, series in by_name.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    le = _label_text(labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = _label_text(labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{le} {h.count}")
+                lines.append(f"{name}_sum{_label_text(labels)} {h.sum}")
+                lines.append(f"{name}_count{_label_text(labels)} {h.count}")
+            lines.append(f"# TYPE {name}_recent summary")
+            for labels, h in series:
+                for q, value in h.quantiles().items():
+                    tag = _label_text(labels, f'quantile="{q}"')
+                    lines.append(f"{name}_recent{tag} {value}")
+                lines.append(f"{name}_recent_sum{_label_text(labels)} {sum(h.recent)}")
+                lines.append(f"{name}_recent_count{_label_text(labels)} {len(h.recent)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe("govee_connect_seconds", "Time to establish a BLE connection.")
+METRICS.describe("govee_write_seconds", "Time for one GATT write call.")
+METRICS.describe("govee_ack_seconds", "Time from write to the device's notification echo.")
+METRICS.describe("govee_lan_status_seconds", "devStatus round trip over LAN.")
+METRICS.describe("govee_scan_seconds", "Duration of a discovery scan.")
+METRICS.describe("govee_connect_failures_total", "BLE connects that failed.")
+METRICS.describe("govee_reconnects_total", "Times a lost BLE session was re-established.")
+METRICS.describe("govee_ack_timeouts_total", "Writes whose echo didn't arrive within the ack timeout.")
+METRICS.describe("govee_lan_messages_total", "Messages sent over LAN.")
+METRICS.describe("govee_lan_status_timeouts_total", "devStatus requests that got no answer.")
+METRICS.describe("govee_writes_elided_total", "Queued writes replaced by a newer one before being sent.")
+METRICS.describe("govee_writes_skipped_total", "Writes dropped because they wouldn't change the light.")
+METRICS.describe("govee_failovers_total", "Commands that had to move to another transport.")
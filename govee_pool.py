@@ -0,0 +1,199 @@
+"""
+BLE connection pool with LRU eviction
+Keeps up to `max_connections` lights connected (an adapter only has a handful
+of connection slots) and disconnects the least recently used one when a new
+device needs a slot. Hot devices stay connected and get single-write
+latency; cold ones pay one connect and then stay warm until evicted.
+
+    pool = BlePool(max_connections=5)
+    await pool.send("98:17:3C:21:E3:3F", [cmd_color(0, 255, 0)])
+    pool.prewarm(["AA:BB:CC:DD:EE:FF"])     # connect ahead of a scheduled command
+    print(pool.stats())
+
+pool.send has the same signature govee_group.fan_out expects for `send`.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from govee_ble import AckWriter
+from govee_group import MAX_CONCURRENT
+from govee_metrics import METRICS
+
+
+def _bleak_client(address: str, timeout: float):
+    from bleak import BleakClient
+    return BleakClient(address, timeout=timeout)
+
+
+class _Connection:
+    def __init__(self, address: str, client, acks: AckWriter):
+        self.address = address
+        self.client = client
+        self.acks = acks
+        self.users = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client.is_connected
+
+
+class BlePool:
+    """LRU pool of connected BLE clients, at most `max_connections` at a time.
+
+    Connections in use are never evicted; if every slot is busy, a new device
+    waits for one to be released.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONCURRENT, connect_timeout: float = 10.0, client_factory=None):
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.client_factory = client_factory or _bleak_client
+        self._conns = OrderedDict()       # address -> _Connection, least recent first
+        self._connecting = {}             # address -> Task, so concurrent misses share one connect
+        self._reserved = 0                # slots taken by connects still in progress
+        self._slot_freed = asyncio.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.failures = 0
+        self.connect_times = []
+
+    def stats(self) -> dict:
+        times = self.connect_times
+        total = self.hits + self.misses
+        return {
+            "connected": len(self._conns),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "connect_failures": self.failures,
+            "connects": len(times),
+            "connect_avg_s": sum(times) / len(times) if times else 0.0,
+            "connect_max_s": max(times) if times else 0.0,
+        }
+
+    def __contains__(self, address: str) -> bool:
+        conn = self._conns.get(address)
+        return conn is not None and conn.is_connected
+
+    async def _make_room(self):
+        """Reserve a slot, disconnecting the least recently used idle connection if needed.
+
+        Waits for a release if every connected device is busy.
+        """
+        while len(self._conns) + self._reserved >= self.max_connections:
+            victim = next((c for c in self._conns.values() if c.users == 0), None)
+            if victim is None:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+                continue
+            del self._conns[victim.address]
+            self.evictions += 1
+            try:
+                await victim.client.disconnect()
+            except Exception:
+                pass
+        self._reserved += 1
+
+    async def _connect(self, address: str) -> _Connection:
+        """Connect and return the connection already held once (by the caller that started it)."""
+        await self._make_room()
+        try:
+            start = time.perf_counter()
+            client = self.client_factory(address, self.connect_timeout)
+            try:
+                await client.connect()
+            except Exception:
+                self.failures += 1
+                METRICS.counter("govee_connect_failures_total", device=address, transport="ble").inc()
+                raise
+            self.connect_times.append(time.perf_counter() - start)
+            METRICS.histogram("govee_connect_seconds", device=address, transport="ble").observe(self.connect_times[-1])
+            acks = AckWriter(client)
+            await acks.start()
+            conn = _Connection(address, client, acks)
+            conn.users = 1
+            self._conns[address] = conn
+            return conn
+        finally:
+            self._reserved -= 1
+
+    def _connect_done(self, address: str, task: asyncio.Task):
+        if self._connecting.get(address) is task:
+            del self._connecting[address]
+        self._slot_freed.set()
+
+    async def acquire(self, address: str, count: bool = True) -> _Connection:
+        """Return a connected, held connection for `address`; pair with release()."""
+        conn = self._conns.get(address)
+        if conn is not None and conn.is_connected:
+            if count:
+                self.hits += 1
+            self._conns.move_to_end(address)
+            conn.users += 1
+            return conn
+        if conn is not None:
+            del self._conns[address]     # dropped since last use
+        if count:
+            self.misses += 1
+        task = self._connecting.get(address)
+        if task is not None:
+            conn = await asyncio.shield(task)
+            conn.users += 1
+            return conn
+        task = asyncio.ensure_future(self._connect(address))
+        self._connecting[address] = task
+        task.add_done_callback(lambda t: self._connect_done(address, t))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The connect carries on without us; drop the hold it will hand back.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception() or self.release(t.result()))
+            raise
+
+    def release(self, conn: _Connection):
+        conn.users -= 1
+        self._slot_freed.set()
+
+    async def send(self, address: str, packets, wait_ack: bool = True) -> bool:
+        """Write packets to one device over its pooled connection."""
+        conn = await self.acquire(address)
+        try:
+            async with conn.lock:
+                for packet in packets:
+                    await conn.acks.write(packet, wait=wait_ack)
+            return True
+        finally:
+            self.release(conn)
+
+    def prewarm(self, addresses: list[str]) -> list[asyncio.Task]:
+        """Connect devices that are about to receive commands, in the background.
+
+        Only as many as fit in the pool are warmed; connect errors are left for
+        the real command to report.
+        """
+        tasks = []
+        for address in list(addresses)[:self.max_connections]:
+            if address in self or address in self._connecting:
+                continue
+            task = asyncio.ensure_future(self._prewarm_one(address))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            tasks.append(task)
+        return tasks
+
+    async def _prewarm_one(self, address: str):
+        self.release(await self.acquire(address, count=False))
+
+    async def close(self):
+        for task in list(self._connecting.values()):
+            task.cancel()
+        conns, self._conns = list(self._conns.values()), OrderedDict()
+        for conn in conns:
+            try:
+                await conn.client.disconnect()
+            except Exception:
+                pass
@@ -0,0 +1,151 @@
+"""
+Priority scheduling for one light: alerts preempt interactive commands,
+which preempt ambient effects.
+
+There is one BLE link per light and every write takes a round trip, so a
+status signal queued behind animation frames would arrive late. The
+scheduler keeps a govee_queue.CommandQueue per priority class and always
+writes from the most urgent one; within a class, superseded color and
+brightness commands are coalesced by that queue, so a suspended ambient
+stream waits as a single pending frame rather than a backlog.
+
+An alert can also hold the light for a while: lower classes are suspended
+until it is released, and then whatever they had been showing before the
+alert is restored.
+
+    scheduler = PriorityScheduler(session.write)
+    scheduler.submit(frame, "ambient")                        # effect frames
+    await scheduler.submit(cmd_color(255, 255, 255))          # "interactive" by default
+    await scheduler.alert([cmd_color(255, 0, 0)], hold=5.0)   # red for 5 s, then back
+
+The daemon uses it for every command; prefix a command with its class
+("alert color red --hold 5", "ambient color 20 0 40").
+"""
+
+import asyncio
+import time
+
+from govee_metrics import METRICS, quantile
+from govee_queue import CommandQueue
+
+PRIORITIES = ("alert", "interactive", "ambient")     # most urgent first
+DEFAULT_PRIORITY = "interactive"
+RESTORED_KINDS = ("power", "brightness", "color")
+
+
+class PriorityScheduler:
+    """Per-device write scheduler with priority classes, preemption and restore.
+
+    `send(packet)` is the async write (e.g. GoveeSession.write) and should
+    return True on success. Has CommandQueue's submit/stats/join, so it can
+    stand in for one.
+    """
+
+    def __init__(self, send, device: str = ""):
+        self.send = send
+        self.sent = 0
+        self.preemptions = 0
+        self._queues = {p: CommandQueue() for p in PRIORITIES}   # coalescing only; written from _drain
+        self._holds = []                                  # ranks of active preemptions
+        self._shown = {}                                  # kind -> (packet, priority) last written
+        self._waits = {p: METRICS.histogram("govee_queue_wait_seconds", device=device, priority=p) for p in PRIORITIES}
+        self._worker = None
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def elided(self) -> int:
+        return sum(q.elided for q in self._queues.values())
+
+    def submit(self, packet: bytes, priority: str = DEFAULT_PRIORITY) -> asyncio.Future:
+        """Queue a packet in a class; resolves to the result of the write that carried it."""
+        fut = asyncio.get_running_loop().create_future()
+        self._queues[priority].add(packet, fut)
+        self._kick()
+        return fut
+
+    def _kick(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+
+    def _next(self):
+        """(priority, entry) to write next, or None if everything sendable is done."""
+        limit = min(self._holds, default=len(PRIORITIES) - 1)
+        for rank, priority in enumerate(PRIORITIES):
+            if rank > limit:
+                return None
+            entry = self._queues[priority].pop()
+            if entry is not None:
+                return priority, entry
+        return None
+
+    async def _drain(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            priority, entry = item
+            self._waits[priority].observe(time.perf_counter() - entry.submitted)
+            try:
+                ok = await self.send(entry.packet)
+            except Exception as e:
+                print(f"Scheduled write failed: {e}")
+                ok = False
+            self.sent += 1
+            if ok and entry.kind in RESTORED_KINDS:
+                self._shown[entry.kind] = (entry.packet, priority)
+            entry.resolve(ok)
+
+    def hold(self, priority: str = "alert") -> dict:
+        """Suspend every class less urgent than `priority` until release();
+        returns what was showing, for release() to restore."""
+        self._holds.append(PRIORITIES.index(priority))
+        self.preemptions += 1
+        return dict(self._shown)
+
+    def release(self, priority: str = "alert", snapshot: dict = None):
+        """End a hold(); with a snapshot, put back what the suspended classes
+        had been showing (unless they have something newer queued)."""
+        self._holds.remove(PRIORITIES.index(priority))
+        rank = PRIORITIES.index(priority)
+        for kind in RESTORED_KINDS if snapshot else ():
+            if kind not in snapshot:
+                continue
+            packet, origin = snapshot[kind]
+            if PRIORITIES.index(origin) <= rank or self._shown.get(kind, (None,))[0] == packet:
+                continue
+            if self._queues[origin].pending(kind):
+                continue
+            self.submit(packet, origin)
+        self._kick()
+
+    async def alert(self, packets, hold: float = 0.0, priority: str = "alert", restore: bool = True) -> bool:
+        """Send packets ahead of everything else.
+
+        With `hold`, less urgent classes stay suspended for that many seconds
+        after the packets are written and are then restored (in the
+        background; this returns once the alert itself is showing).
+        """
+        snapshot = self.hold(priority)
+        try:
+            results = await asyncio.gather(*(self.submit(p, priority) for p in packets))
+        except BaseException:
+            self.release(priority, snapshot if restore else None)
+            raise
+        if hold > 0:
+            asyncio.get_running_loop().call_later(hold, self.release, priority, snapshot if restore else None)
+        else:
+            self.release(priority)
+        return all(results)
+
+    def stats(self) -> dict:
+        stats = {"sent": self.sent, "elided": self.elided, "pending": len(self), "preemptions": self.preemptions}
+        for priority, histogram in self._waits.items():
+            stats[f"{priority}_wait_p95_ms"] = round(quantile(histogram.recent, 0.95) * 1000, 2)
+        return stats
+
+    async def join(self):
+        """Wait until everything sendable queued so far has been written."""
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
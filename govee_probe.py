@@ -0,0 +1,231 @@
+"""
+Find out which color command layout a light takes, without watching it.
+
+test_red.py, force_green.py and yellow_mode1.py send the candidate layouts
+(cmd 0x05 with mode 0x01 / 0x02 / 0x04 / 0x15, cmd 0x0B, cmd 0xA1) one
+after another with long sleeps while someone watches the bulb. The probe
+lets the light answer instead: for each layout in govee_codec.COLOR_LAYOUTS
+it writes a color different from what the light shows, notes whether the
+command was echoed on NOTIFY_UUID, then asks for the current color (an 0xAA
+status query) and classifies the layout:
+
+    applied      the light now reports the probe color
+    echoed       acknowledged, but the color didn't change
+    no reply     no echo - the model doesn't know the command
+    unverified   echoed, but the light doesn't answer status queries
+
+Lights are probed concurrently, one per model unless --all, and the first
+applied layout is cached per model in the registry (per MAC when the model
+is unknown). govee_ble.AckWriter, which every BLE path writes through,
+converts each color command to the cached layout from then on: other
+processes pick the new layout up when they next connect (a connection that
+is already open keeps the layout it started with), and scene frames with
+raw steps are always sent as written. Afterwards each light gets its
+previous power, brightness and color back.
+
+Usage:
+    python govee_probe.py                               # the default light
+    python govee_probe.py 98:17:3C:21:E3:3F ihoment_H6199_1A2B
+    python govee_probe.py --group livingroom --all      # every member, not one per model
+    python govee_probe.py --force                       # re-probe models that already have a layout
+    python govee_probe.py --sim                         # simulated models with different layouts
+
+Requires: pip install bleak
+"""
+
+import asyncio
+import sys
+import time
+from typing import NamedTuple
+
+from govee_ble import AckWriter, cmd_brightness, cmd_power_off, cmd_power_on, forget_layouts
+from govee_codec import COLOR_LAYOUTS, DEFAULT_COLOR_LAYOUT, encode_color_layout
+from govee_registry import normalize_mac
+from govee_state import QUERY_COLOR, STATUS_QUERIES, DeviceState
+
+ECHO_TIMEOUT = 0.5       # a known command is echoed well within this
+PROBE_COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255))
+
+
+class VariantResult(NamedTuple):
+    layout: str
+    verdict: str         # "applied", "echoed", "no reply" or "unverified"
+    echo: bytes          # the notification, b"" if none came
+    rtt: float           # seconds from write to echo (or timeout)
+
+
+class ProbeResult(NamedTuple):
+    address: str
+    model: str
+    variants: list
+    winner: str          # first applied layout, or None
+
+
+async def read_color(acks: AckWriter):
+    """(r, g, b) the light reports, or None if it doesn't answer."""
+    reply = await acks.write(QUERY_COLOR)
+    return tuple(reply[3:6]) if reply is not None and len(reply) >= 6 else None
+
+
+async def probe_light(acks: AckWriter, layouts=None) -> tuple:
+    """Try each layout on a connected light; returns ([VariantResult], winner)."""
+    # What the light shows before probing; the listener comes off again so
+    # the echoes of the probe writes below can't overwrite it
+    state = DeviceState()
+    acks.listeners.append(state.apply_notification)
+    try:
+        for query in STATUS_QUERIES:
+            await acks.write(query)
+    finally:
+        acks.listeners.remove(state.apply_notification)
+    power, brightness, rgb_before = state.power, state.brightness, state.rgb
+    await acks.write(cmd_power_on())
+    await acks.write(cmd_brightness(100))
+
+    current = rgb_before
+    results = []
+    winner = None
+    for i, layout in enumerate(layouts or COLOR_LAYOUTS):
+        # A color the light isn't showing, and not the one just tried
+        shift = i % len(PROBE_COLORS)
+        rgb = next(c for c in PROBE_COLORS[shift:] + PROBE_COLORS[:shift] if c != current)
+        start = time.perf_counter()
+        echo = await acks.write(encode_color_layout(layout, *rgb))
+        rtt = time.perf_counter() - start
+        reading = await read_color(acks)
+        if reading == rgb:
+            verdict = "applied"
+            winner = winner or layout
+        elif echo is None:
+            verdict = "no reply"
+        else:
+            verdict = "echoed" if reading is not None else "unverified"
+        current = reading or current
+        results.append(VariantResult(layout, verdict, bytes(echo or b""), rtt))
+
+    # Put back what the light was showing
+    if winner and rgb_before is not None:
+        await acks.write(encode_color_layout(winner, *rgb_before))
+    if brightness is not None:
+        await acks.write(cmd_brightness(brightness))
+    if power is False:
+        await acks.write(cmd_power_off())
+    return results, winner
+
+
+async def probe_device(address: str, client_factory, model: str = None) -> ProbeResult:
+    client = client_factory(address, 10.0)
+    await client.connect()
+    try:
+        # The candidate layouts go out as built, not converted to a cached one
+        acks = AckWriter(client, timeout=ECHO_TIMEOUT, layout=DEFAULT_COLOR_LAYOUT)
+        if not await acks.start():
+            raise ConnectionError("notifications unavailable, nothing to classify")
+        variants, winner = await probe_light(acks)
+    finally:
+        await client.disconnect()
+    return ProbeResult(address, model, variants, winner)
+
+
+async def probe_many(addresses: list[str], registry, client_factory, concurrency: int = None,
+                     per_model: bool = True, force: bool = False) -> list[ProbeResult]:
+    """Probe lights concurrently and cache each winning layout in the registry.
+
+    With per_model, only the first light of each known model is probed;
+    lights whose model already has a layout are skipped unless `force`.
+    """
+    from govee_group import MAX_CONCURRENT, fan_out
+    targets = {}
+    models = set()
+    for address in addresses:
+        record = registry.find(address)
+        model = record.get("model") if record else None
+        if not force and registry.layout_for(address):
+            print(f"  {address}: {registry.layout_for(address)} already cached for {model or 'this light'}")
+            continue
+        if per_model and model:
+            if model in models:
+                continue
+            models.add(model)
+        targets[record.get("address", address) if record else address] = model
+
+    results = {}
+
+    async def probe(address, _packets):
+        results[address] = await probe_device(address, client_factory, targets[address])
+        return True
+
+    for r in await fan_out(list(targets), [], concurrency or MAX_CONCURRENT, send=probe):
+        if not r.ok:
+            print(f"  {r.address}: probe failed ({r.error})")
+    for result in results.values():
+        if result.winner:
+            registry.set_layout(result.model or normalize_mac(result.address), result.winner)
+    forget_layouts()
+    return [results[a] for a in targets if a in results]
+
+
+def print_result(result: ProbeResult):
+    print(f"{result.address} ({result.model or 'unknown model'})")
+    for v in result.variants:
+        print(f"    {v.layout}  {v.verdict:10s}  {v.rtt * 1000:6.0f} ms  {v.echo.hex() or '-'}")
+    if result.winner:
+        print(f"  -> {result.winner}, cached for {result.model or result.address}")
+    else:
+        print("  -> no layout verified; nothing cached")
+
+
+def _client_factory(address: str, timeout: float):
+    import govee_ble
+    govee_ble._load_bleak()
+    return govee_ble.BleakClient(address, timeout=timeout)
+
+
+SIM_MODELS = (("H6008", "05/02"), ("H6199", "05/15"), ("H6160", "05/01"), ("H6072", "0b/02"), ("H6008", "05/02"))
+
+
+async def main():
+    args = sys.argv[1:]
+    from govee_ble import pop_option, resolve_address
+    from govee_registry import DeviceRegistry
+    group = pop_option(args, "--group")
+    concurrency = pop_option(args, "--concurrency")
+    per_model = "--all" not in args
+    force = "--force" in args
+    addresses = [a for a in args if not a.startswith("--")]
+
+    if "--sim" in args:
+        import tempfile
+        from govee_sim import BleSimulator, SimulatedDevice
+        sim = BleSimulator(0, connect_delay=0.2, echo_delay=0.01)
+        scratch = tempfile.TemporaryDirectory()     # the simulated lights stay out of the real registry
+        registry = DeviceRegistry(path=f"{scratch.name}/devices.json")
+        for i, (model, layout) in enumerate(SIM_MODELS):
+            address = f"98:17:3C:00:00:{i:02X}"
+            device = sim.devices[address] = SimulatedDevice(address, model=model, color_layout=layout)
+            registry.update_from_ble(address, device.name, save=False)
+        addresses, factory = list(sim.devices), sim.client
+    else:
+        registry = DeviceRegistry()
+        factory = _client_factory
+        if group:
+            try:
+                addresses = registry.group_addresses(group)
+            except KeyError as e:
+                print(e.args[0])
+                return
+        addresses = [resolve_address(a) for a in addresses] or [resolve_address()]
+
+    start = time.perf_counter()
+    results = await probe_many(addresses, registry, factory, int(concurrency) if concurrency else None, per_model, force)
+    for result in results:
+        print_result(result)
+    print(f"Probed {len(results)} light(s) in {time.perf_counter() - start:.1f}s")
+    if registry.layouts:
+        print("Cached layouts: " + ", ".join(f"{k}={v}" for k, v in sorted(registry.layouts.items())))
+    if "--sim" in args:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
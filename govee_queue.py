@@ -0,0 +1,133 @@
+"""
+Per-device command queue with last-write-wins coalescing.
+
+While a command is on the wire, newer commands pile up behind it. Only the
+final color and the final brightness matter, so a pending color is replaced
+in place by a newer color (same for brightness) instead of both being sent.
+Power and any other command are never dropped and act as barriers: nothing
+queued after them is merged into something queued before them, so
+"color, off, color" still reaches the light in that order.
+
+    queue = CommandQueue(session.write)
+    await queue.submit(cmd_color(0, 255, 0))   # resolves once written (or superseded and written)
+    queue.stats()                              # {"sent": ..., "elided": ...}
+
+govee_priority.PriorityScheduler keeps one CommandQueue per priority class
+and does the writing itself, using add() and pop() instead of submit().
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from govee_codec import CMD_BRIGHTNESS, CMD_COLOR, CMD_POWER, HEAD_CMD
+
+COALESCED_KINDS = ("color", "brightness")
+
+
+def command_kind(packet: bytes) -> str:
+    """Name of what a packet changes; packets of the same kind supersede each other."""
+    if packet[0] == HEAD_CMD:
+        if packet[1] == CMD_COLOR:
+            return "color"
+        if packet[1] == CMD_BRIGHTNESS:
+            return "brightness"
+        if packet[1] == CMD_POWER:
+            return "power"
+    return f"raw-{packet[0]:02x}{packet[1]:02x}"
+
+
+class _Entry:
+    __slots__ = ("packet", "kind", "waiters", "submitted")
+
+    def __init__(self, packet: bytes, kind: str):
+        self.packet = packet
+        self.kind = kind
+        self.waiters = []
+        self.submitted = time.perf_counter()
+
+    def resolve(self, ok: bool):
+        for fut in self.waiters:
+            if not fut.done():
+                fut.set_result(ok)
+
+
+class CommandQueue:
+    """Serializes writes to one device and coalesces superseded ones.
+
+    `send(packet)` is the async write to use (e.g. GoveeSession.write); it
+    should return True on success. Without one, the queue only coalesces and
+    whoever pop()s the entries writes them.
+    """
+
+    def __init__(self, send=None):
+        self.send = send
+        self.sent = 0
+        self.elided = 0
+        self._queue = deque()
+        self._latest = {}          # kind -> pending entry that newer commands may replace
+        self._worker = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "elided": self.elided, "pending": len(self._queue)}
+
+    def submit(self, packet: bytes) -> asyncio.Future:
+        """Queue a packet; the returned future resolves to the send result of the
+        write that carried it (a newer packet's, if this one was superseded)."""
+        fut = asyncio.get_running_loop().create_future()
+        self.add(packet, fut)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+        return fut
+
+    def add(self, packet: bytes, fut: asyncio.Future):
+        """Queue a packet, or fold it into a pending one of the same kind,
+        without starting a writer; `fut` goes with whichever entry carries it."""
+        kind = command_kind(packet)
+        entry = self._latest.get(kind)
+        if entry is not None:
+            entry.packet = packet
+            self.elided += 1
+        else:
+            entry = _Entry(packet, kind)
+            self._queue.append(entry)
+            if kind in COALESCED_KINDS:
+                self._latest[kind] = entry
+            else:
+                self._latest.clear()
+        entry.waiters.append(fut)
+
+    def pop(self):
+        """Oldest pending entry (no longer open to coalescing), or None."""
+        if not self._queue:
+            return None
+        entry = self._queue.popleft()
+        if self._latest.get(entry.kind) is entry:
+            del self._latest[entry.kind]
+        return entry
+
+    def pending(self, kind: str) -> bool:
+        """Whether a packet of this kind is waiting to be written."""
+        return kind in self._latest or any(e.kind == kind for e in self._queue)
+
+    async def _drain(self):
+        while True:
+            entry = self.pop()
+            if entry is None:
+                return
+            try:
+                ok = await self.send(entry.packet)
+            except Exception as e:
+                print(f"Queued write failed: {e}")
+                ok = False
+            self.sent += 1
+            entry.resolve(ok)
+
+    async def join(self):
+        """Wait until everything queued so far has been written."""
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
+
@@ -0,0 +1,224 @@
+"""
+Adaptive write rate for unacknowledged BLE writes.
+
+Writes go out with response=False, so if they arrive faster than the light
+can apply them the extras vanish without an error - the "did it change?"
+guessing in force_green.py and test_red.py. The light does echo every
+command it processes on NOTIFY_UUID, though, so RateController paces
+writes at a rate it learns per device, AIMD-style like TCP:
+
+  - every echo that comes back raises the rate: by one write/s per echo
+    until the first loss (so it doubles about every second at first), then
+    by about `step` writes/s per second of clean sending,
+  - a write whose echo never came cuts the rate by `backoff` (at most once
+    per round trip). Echoes carry only the header and command byte, but they
+    come back in order, so when an echo arrives while an earlier write of
+    the same command is already well past the fastest round trip seen, that
+    earlier write was dropped.
+
+So it climbs until frames start to drop, backs off, and hovers just under
+what the light sustains. Lights that don't send notifications are checked
+with a write-with-response every `checkpoint_every` writes instead; a
+checkpoint that takes much longer than usual counts as congestion.
+
+    rate = RateController(acks)             # a started govee_ble.AckWriter
+    await rate.write(cmd_color(255, 0, 0))  # paced, never blocks on the echo
+    rate.rate                               # learned writes per second
+
+Usage:
+    python govee_rate.py                    # probe the default light for 10 seconds
+    python govee_rate.py --sim 40           # against a simulated light that applies 40 frames/s
+
+Requires: pip install bleak
+"""
+
+import asyncio
+import sys
+import time
+from collections import deque
+
+from govee_ble import WRITE_UUID
+
+INITIAL_RATE = 10.0      # writes per second
+MIN_RATE = 2.0
+MAX_RATE = 200.0
+STEP = 5.0               # writes/s gained per second of loss-free sending
+BACKOFF = 0.7
+LOSS_SLACK = 0.01        # seconds past the fastest round trip before a skipped write counts as lost
+LOSS_TIMEOUT = 0.5       # seconds before a write with no later echo at all counts as lost
+CHECKPOINT_EVERY = 20
+
+
+class RateController:
+    """Paces writes through an AckWriter at a rate learned from its echoes."""
+
+    def __init__(self, acks, rate: float = INITIAL_RATE, min_rate: float = MIN_RATE, max_rate: float = MAX_RATE,
+                 step: float = STEP, backoff: float = BACKOFF, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.acks = acks
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.backoff = backoff
+        self.checkpoint_every = checkpoint_every
+        self.sent = 0
+        self.acked = 0
+        self.lost = 0
+        self.decreases = 0
+        self.slow_start = True
+        self.srtt = None                 # smoothed write -> echo time
+        self.min_rtt = None
+        self._outstanding = deque()      # ((head, cmd), sent at) awaiting an echo, oldest first
+        self._next_send = 0.0
+        self._last_decrease = 0.0
+        self._checkpoint_rtt = None
+        acks.listeners.append(self._on_notify)
+
+    @property
+    def echoes(self) -> bool:
+        """Whether loss can be seen from echoes (the light's notifications are subscribed)."""
+        return self.acks.subscribed
+
+    def _on_notify(self, data: bytes):
+        if len(data) < 2:
+            return
+        key = (data[0], data[1])
+        now = time.perf_counter()
+        matching = [i for i, (pending, _) in enumerate(self._outstanding) if pending == key]
+        if not matching:
+            return
+        # The echo belongs to the oldest write of this command that isn't too
+        # old to be its own; anything older than that was dropped by the light
+        lost = 0
+        if self.min_rtt is not None:
+            limit = 1.5 * self.min_rtt + LOSS_SLACK
+            while len(matching) - lost > 1 and now - self._outstanding[matching[lost]][1] > limit:
+                lost += 1
+        sent_at = self._outstanding[matching[lost]][1]      # the write this echo answers
+        for i in reversed(matching[:lost + 1]):
+            del self._outstanding[i]
+        rtt = now - sent_at
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        self.acked += 1
+        if lost:
+            self.lost += lost
+            self._decrease()
+        else:
+            self._increase()
+
+    def _increase(self):
+        # +step/rate per ack is +step per second at any rate
+        self.rate = min(self.max_rate, self.rate + (1.0 if self.slow_start else self.step / self.rate))
+
+    def _decrease(self):
+        now = time.perf_counter()
+        if now - self._last_decrease < (self.srtt or LOSS_TIMEOUT):
+            return
+        self._last_decrease = now
+        self.slow_start = False
+        self.rate = max(self.min_rate, self.rate * self.backoff)
+        self.decreases += 1
+
+    def _expire(self):
+        timeout = max(LOSS_TIMEOUT, 3 * (self.srtt or 0.0))
+        now = time.perf_counter()
+        lost = False
+        while self._outstanding and now - self._outstanding[0][1] > timeout:
+            self._outstanding.popleft()
+            self.lost += 1
+            lost = True
+        if lost:
+            self._decrease()
+
+    async def write(self, packet: bytes):
+        """Write one packet once the current rate allows it."""
+        packet = self.acks.to_layout(packet)     # echoes carry the converted command byte
+        loop = asyncio.get_running_loop()
+        delay = self._next_send - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_send = max(self._next_send, loop.time()) + 1.0 / self.rate
+        self.sent += 1
+        if self.echoes:
+            self._expire()
+            self._outstanding.append(((packet[0], packet[1]), time.perf_counter()))
+            await self.acks.write(packet, wait=False)
+        elif self.checkpoint_every and self.sent % self.checkpoint_every == 0:
+            await self._checkpoint(packet)
+        else:
+            await self.acks.write(packet, wait=False)
+
+    async def _checkpoint(self, packet: bytes):
+        """Write with response; a slow or failed one means the link is congested."""
+        start = time.perf_counter()
+        try:
+            await self.acks.client.write_gatt_char(WRITE_UUID, packet, response=True)
+        except Exception:
+            self._decrease()
+            return
+        rtt = time.perf_counter() - start
+        if self._checkpoint_rtt is not None and rtt > 2 * self._checkpoint_rtt:
+            self._decrease()
+        else:
+            self.rate = min(self.max_rate, self.rate + self.step * self.checkpoint_every / self.rate)
+        self._checkpoint_rtt = rtt if self._checkpoint_rtt is None else 0.9 * self._checkpoint_rtt + 0.1 * rtt
+
+    def stats(self) -> dict:
+        return {
+            "rate": round(self.rate, 1),
+            "sent": self.sent,
+            "acked": self.acked,
+            "lost": self.lost,
+            "decreases": self.decreases,
+            "srtt_ms": round((self.srtt or 0.0) * 1000, 1),
+        }
+
+
+async def probe(acks, seconds: float = 10.0, report_every: float = 1.0) -> RateController:
+    """Send a changing color as fast as the controller allows and print how the rate settles."""
+    rate = RateController(acks)
+    from govee_codec import new_color_buffer, encode_color_into
+    buf = new_color_buffer(1)
+    loop = asyncio.get_running_loop()
+    start = next_report = loop.time()
+    i = 0
+    while loop.time() - start < seconds:
+        encode_color_into(buf, i & 0xFF, 0, 255 - (i & 0xFF))
+        await rate.write(bytes(buf))
+        i += 1
+        if loop.time() >= next_report:
+            print(f"  {loop.time() - start:5.1f}s  {rate.stats()}")
+            next_report += report_every
+    await asyncio.sleep(LOSS_TIMEOUT)
+    rate._expire()
+    return rate
+
+
+async def main():
+    args = sys.argv[1:]
+    from govee_ble import AckWriter, pop_option, resolve_address
+    seconds = float(pop_option(args, "--seconds", 10))
+    sim_rate = pop_option(args, "--sim")
+    if sim_rate is not None:
+        from govee_sim import BleSimulator
+        sim = BleSimulator(1, connect_delay=0.05, write_latency=0.002, echo_delay=0.01, max_write_rate=float(sim_rate))
+        client = sim.client(sim.addresses[0])
+    else:
+        import govee_ble
+        govee_ble._load_bleak()
+        client = govee_ble.BleakClient(resolve_address(args[0] if args else None), timeout=10.0)
+    await client.connect()
+    try:
+        acks = AckWriter(client)
+        await acks.start()
+        rate = await probe(acks, seconds)
+    finally:
+        await client.disconnect()
+    stats = rate.stats()
+    loss = stats["lost"] / stats["sent"] if stats["sent"] else 0.0
+    print(f"Learned rate: {stats['rate']:.1f} writes/s ({loss:.1%} of {stats['sent']} writes lost while probing)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
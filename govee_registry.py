@@ -0,0 +1,262 @@
+"""
+Govee device registry
+Remembers what scans found (model, MAC, IP, last RSSI, when it was last seen,
+and whether it answers over BLE and/or LAN) in a small JSON file, so commands
+can resolve their target instantly instead of scanning for 5-10 seconds first.
+
+Entries older than the TTL are treated as unknown, and anything that stops
+answering at its cached address should be invalidated so the next lookup
+rescans.
+
+Usage:
+    python govee_registry.py                 # list known devices
+    python govee_registry.py refresh         # rescan LAN (and BLE if bleak is installed)
+    python govee_registry.py forget <mac>    # drop a device
+    python govee_registry.py group livingroom 98:17:3C:21:E3:3F ihoment_H6008_A1B2
+                                             # define a group (MACs or names)
+
+The file lives at ~/.govee_devices.json unless GOVEE_REGISTRY points elsewhere.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+REGISTRY_PATH = os.environ.get("GOVEE_REGISTRY", os.path.expanduser("~/.govee_devices.json"))
+DEFAULT_TTL = 24 * 3600          # seconds a sighting stays trustworthy
+REFRESH_FRACTION = 0.8           # background refresh kicks in at 80% of the TTL
+
+
+def normalize_mac(mac: str) -> str:
+    """Uppercase colon-separated MAC. LAN device ids are 8 bytes whose last six
+    are the BLE MAC, so both transports land on the same key."""
+    parts = mac.replace("-", ":").upper().split(":")
+    return ":".join(parts[-6:])
+
+
+class DeviceRegistry:
+    """JSON-backed {mac: record} map with TTL-based freshness."""
+
+    def __init__(self, path: str = REGISTRY_PATH, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.devices = {}
+        self.groups = {}
+        self.layouts = {}                # model (or MAC) -> color layout found by govee_probe.py
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.devices = data.get("devices", {})
+            self.groups = data.get("groups", {})
+            self.layouts = data.get("layouts", {})
+        except FileNotFoundError:
+            self.devices, self.groups, self.layouts = {}, {}, {}
+        except (ValueError, OSError) as e:
+            print(f"Ignoring unreadable registry {self.path}: {e}")
+            self.devices, self.groups, self.layouts = {}, {}, {}
+
+    def save(self):
+        """Write atomically so a crash mid-write can't leave a truncated file."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"devices": self.devices, "groups": self.groups, "layouts": self.layouts}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def set_group(self, name: str, members: list[str]):
+        """Define a named group of devices (MACs, names or IPs)."""
+        self.groups[name] = list(members)
+        self.save()
+
+    def group_addresses(self, name: str) -> list[str]:
+        """BLE addresses of a group's members. Members the registry doesn't know
+        are passed through as-is, so a group can list raw MACs."""
+        if name not in self.groups:
+            raise KeyError(f"Unknown group: {name}")
+        addresses = []
+        for member in self.groups[name]:
+            record = self.find(member)
+            addresses.append(record.get("address", record["mac"]) if record else member)
+        return addresses
+
+    def set_layout(self, key: str, layout: str):
+        """Remember the color layout a model (or a single MAC) accepts."""
+        self.layouts[key] = layout
+        self.save()
+
+    def layout_for(self, key: str):
+        """Cached color layout for a device (by MAC, then by its model), or None."""
+        record = self.find(key)
+        mac = record["mac"] if record else (normalize_mac(key) if ":" in key else key)
+        if mac in self.layouts:
+            return self.layouts[mac]
+        model = record.get("model") if record else None
+        return self.layouts.get(model) if model else None
+
+    def update(self, mac: str, transport: str, save: bool = True, **fields) -> dict:
+        """Record a sighting of `mac` over `transport` ("ble" or "lan")."""
+        mac = normalize_mac(mac)
+        record = self.devices.setdefault(mac, {"mac": mac, "transports": []})
+        record.update({k: v for k, v in fields.items() if v is not None})
+        if transport not in record["transports"]:
+            record["transports"].append(transport)
+        record["last_seen"] = time.time()
+        record.setdefault("seen", {})[transport] = record["last_seen"]
+        if save:
+            self.save()
+        return record
+
+    def update_from_lan(self, ip: str, data: dict, save: bool = True) -> dict:
+        """Record a LAN scan reply ({"ip", "device", "sku", ...})."""
+        mac = data.get("device") or ip
+        return self.update(mac, "lan", save=save, ip=data.get("ip", ip), model=data.get("sku"))
+
+    def update_from_ble(self, address: str, name: str, rssi: int = None, model: str = None, save: bool = True) -> dict:
+        """Record a BLE advertisement; the model is taken from names like ihoment_H6008_E33F."""
+        if model is None:
+            model = next((part for part in name.split("_") if part[:2].upper() in ("H6", "H7")), None)
+        return self.update(address, "ble", save=save, address=address, name=name, rssi=rssi, model=model)
+
+    def is_fresh(self, record: dict, transport: str = None) -> bool:
+        seen = record.get("seen", {}).get(transport) if transport else record.get("last_seen")
+        return seen is not None and time.time() - seen < self.ttl
+
+    def find(self, key: str):
+        """Look a device up by MAC, name or IP, fresh or not."""
+        if ":" in key and normalize_mac(key) in self.devices:
+            return self.devices[normalize_mac(key)]
+        for record in self.devices.values():
+            if key in (record.get("name"), record.get("ip"), record.get("address")):
+                return record
+        return None
+
+    def resolve(self, key: str = None, transport: str = None):
+        """Fresh record for `key` (or the most recently seen device) that supports
+        `transport`, or None if a rescan is needed."""
+        if key is not None:
+            candidates = [self.find(key)]
+        else:
+            candidates = sorted(self.devices.values(), key=lambda r: r.get("last_seen", 0), reverse=True)
+        for record in candidates:
+            if record is None:
+                continue
+            if transport and transport not in record.get("transports", []):
+                continue
+            if self.is_fresh(record, transport):
+                return record
+        return None
+
+    def invalidate(self, key: str, transport: str = None):
+        """Mark a cached address as not answering, so the next resolve rescans."""
+        record = self.find(key)
+        if record is None:
+            return
+        if transport:
+            record.get("seen", {}).pop(transport, None)
+        else:
+            record.pop("last_seen", None)
+            record["seen"] = {}
+        self.save()
+
+    def forget(self, key: str) -> bool:
+        record = self.find(key)
+        if record is None:
+            return False
+        del self.devices[record["mac"]]
+        self.save()
+        return True
+
+    def due_for_refresh(self) -> bool:
+        """True if any known device is past REFRESH_FRACTION of its TTL."""
+        horizon = time.time() - self.ttl * REFRESH_FRACTION
+        return any(seen < horizon for r in self.devices.values() for seen in r.get("seen", {}).values()) \
+            or any(not r.get("seen") for r in self.devices.values())
+
+    async def refresh_lan(self, timeout: float = 2.0) -> int:
+        """Rescan the LAN and record every reply; returns how many answered."""
+        from govee_lan import GoveeLanClient
+        client = await GoveeLanClient.open()
+        found = await client.scan(timeout=timeout)
+        for ip, data in found.items():
+            self.update_from_lan(ip, data, save=False)
+        if found:
+            self.save()
+        return len(found)
+
+    async def refresh_ble(self, timeout: float = 10.0) -> int:
+        """Rescan BLE (needs bleak); scan_govee records what it finds here."""
+        from govee_ble import scan_govee
+        return len(await scan_govee(timeout=timeout, registry=self))
+
+    async def refresh(self, ble: bool = True) -> int:
+        tasks = [self.refresh_lan()]
+        if ble:
+            tasks.append(self.refresh_ble())
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, ImportError):
+                continue
+            if isinstance(result, Exception):
+                print(f"Refresh failed: {result}")
+        return sum(r for r in results if isinstance(r, int))
+
+    async def refresh_forever(self, interval: float = 60.0, ble: bool = False):
+        """Background task: wake every `interval` and rescan only when entries are aging out."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.due_for_refresh():
+                await self.refresh(ble=ble)
+
+    def start_background_refresh(self, interval: float = 60.0, ble: bool = False) -> asyncio.Task:
+        return asyncio.create_task(self.refresh_forever(interval, ble))
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def print_devices(registry: DeviceRegistry):
+    if not registry.devices:
+        print(f"No devices in {registry.path}. Run: python govee_registry.py refresh")
+        return
+    now = time.time()
+    for record in registry.devices.values():
+        age = format_age(now - record["last_seen"]) if "last_seen" in record else "never"
+        stale = "" if registry.is_fresh(record) else "  (stale)"
+        print(f"  {record['mac']} | {record.get('model') or '?':6s} | {record.get('name') or '-'} | "
+              f"ip={record.get('ip') or '-'} | rssi={record.get('rssi') if record.get('rssi') is not None else '-'} | "
+              f"{','.join(record.get('transports', []))} | seen {age} ago{stale}")
+    if registry.layouts:
+        print("Color layouts: " + ", ".join(f"{k}={v}" for k, v in sorted(registry.layouts.items())))
+
+
+async def main():
+    registry = DeviceRegistry()
+    action = sys.argv[1].lower() if len(sys.argv) >= 2 else "list"
+    if action == "refresh":
+        count = await registry.refresh()
+        print(f"{count} device(s) answered.")
+        print_devices(registry)
+    elif action == "forget" and len(sys.argv) >= 3:
+        print("Forgotten." if registry.forget(sys.argv[2]) else f"Unknown device: {sys.argv[2]}")
+    elif action == "group" and len(sys.argv) >= 4:
+        registry.set_group(sys.argv[2], sys.argv[3:])
+        print(f"Group {sys.argv[2]}: {', '.join(registry.group_addresses(sys.argv[2]))}")
+    elif action == "list":
+        print_devices(registry)
+        for name, members in registry.groups.items():
+            print(f"  group {name}: {', '.join(members)}")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,314 @@
+"""
+Latency-aware routing between LAN and BLE
+Many lights answer on both transports. The router knows from the device
+registry which ones each device has, keeps a running latency estimate and
+failure count per device and transport, and sends every command over the
+fastest path that is currently healthy. When a path fails the command is
+retried on the next one straight away, and the failed path sits out for a
+backoff period before it is tried again.
+
+Latency comes from real traffic where there is any and from devStatus round
+trips on LAN, whose commands are fire-and-forget. BLE writes are timed up to
+the notification echo. A write that isn't echoed counts as delivered, as it
+does in AckWriter and the daemon, unless the light has echoed earlier writes
+on the same connection, in which case it counts as a failure. The pool's
+AckWriter sends colors in the light's cached layout. Sending on LAN proves
+nothing, so a LAN path that hasn't answered devStatus for LAN_STALE_AFTER
+seconds is checked again before the next command is trusted to it, however
+much traffic it is carrying.
+
+The estimates live as long as the router does: the one-shot commands below
+start from the priors, while `watch` keeps one router running and re-probes
+every device it was given with monitor() so the table stays current.
+
+Usage:
+    python govee_router.py <device> color red       # device = MAC, name or IP from the registry
+    python govee_router.py <device> brightness 50
+    python govee_router.py <device> probe           # measure both transports and print the table
+    python govee_router.py <device>[,<device>...] watch [--interval 60]   # probe until Ctrl-C
+
+Requires: pip install bleak (for the BLE path)
+"""
+
+import asyncio
+import sys
+import time
+
+from govee_lan import GoveeLanClient, packet_to_message
+from govee_metrics import METRICS
+from govee_state import QUERY_POWER
+
+EWMA_ALPHA = 0.2              # weight of the newest latency sample
+PRIOR_LATENCY = {"lan": 0.02, "ble": 0.5}   # until a path has been measured
+LAN_STALE_AFTER = 30.0        # re-check a LAN path with devStatus after this long unanswered
+PROBE_INTERVAL = 60.0
+BACKOFF_MIN = 2.0             # seconds a failed path sits out, doubling per consecutive failure
+BACKOFF_MAX = 120.0
+BLE_PING = QUERY_POWER       # answered with a status notification, so it can be timed
+
+
+class PathStats:
+    """Latency estimate and health of one transport to one device."""
+
+    def __init__(self, transport: str):
+        self.transport = transport
+        self.latency = PRIOR_LATENCY.get(transport, 1.0)
+        self.samples = 0
+        self.ok = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_ok = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def record_ok(self, latency: float = None):
+        self.ok += 1
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_ok = time.monotonic()
+        if latency is not None:
+            if self.samples:
+                latency = self.latency + EWMA_ALPHA * (latency - self.latency)
+            self.latency = latency
+            self.samples += 1
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        backoff = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (self.consecutive_failures - 1))
+        self.down_until = time.monotonic() + backoff
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": round(self.latency * 1000, 2),
+            "samples": self.samples,
+            "ok": self.ok,
+            "failures": self.failures,
+            "healthy": self.healthy,
+        }
+
+
+class GoveeRouter:
+    """Sends commands to registry devices over whichever transport is fastest.
+
+    `lan` (a GoveeLanClient) and `pool` (a govee_pool.BlePool) are created on
+    start() if not given; the pool is only created once a BLE path is used.
+    """
+
+    def __init__(self, registry=None, lan: GoveeLanClient = None, pool=None):
+        if registry is None:
+            from govee_registry import DeviceRegistry
+            registry = DeviceRegistry()
+        self.registry = registry
+        self.lan = lan
+        self.pool = pool
+        self.paths = {}          # (mac or key, transport) -> PathStats
+        self._monitor = None
+
+    async def start(self) -> "GoveeRouter":
+        if self.lan is None:
+            self.lan = await GoveeLanClient.open()
+        return self
+
+    def _ble_pool(self):
+        if self.pool is None:
+            from govee_pool import BlePool
+            self.pool = BlePool()
+        return self.pool
+
+    def targets(self, key: str) -> dict:
+        """{transport: ip or BLE address} for a device, from the registry.
+
+        Keys the registry doesn't know are taken at face value: something with
+        colons is a BLE address, anything else an IP.
+        """
+        record = self.registry.find(key)
+        if record is None:
+            return {"ble": key} if ":" in key else {"lan": key}
+        targets = {}
+        transports = record.get("transports", [])
+        if "lan" in transports and record.get("ip"):
+            targets["lan"] = record["ip"]
+        if "ble" in transports or record.get("address"):
+            targets["ble"] = record.get("address", record["mac"])
+        return targets
+
+    def _path(self, key: str, transport: str) -> PathStats:
+        record = self.registry.find(key)
+        device = record["mac"] if record else key
+        stats = self.paths.get((device, transport))
+        if stats is None:
+            stats = self.paths[(device, transport)] = PathStats(transport)
+        return stats
+
+    def routes(self, key: str, packet: bytes = None) -> list:
+        """(transport, target, stats) in the order they'd be tried: healthy
+        paths fastest first, then the ones sitting out a backoff as a last resort."""
+        routes = []
+        for transport, target in self.targets(key).items():
+            if transport == "lan" and packet is not None and packet_to_message(packet) is None:
+                continue
+            routes.append((transport, target, self._path(key, transport)))
+        routes.sort(key=lambda r: (not r[2].healthy, r[2].latency))
+        return routes
+
+    async def _send_lan(self, ip: str, packet: bytes, stats: PathStats) -> bool:
+        # A sendto proves nothing; only devStatus answers keep the path fresh,
+        # so a steady stream of commands still gets checked every LAN_STALE_AFTER
+        stale = time.monotonic() - stats.last_ok > LAN_STALE_AFTER
+        if stale and not await self._probe_lan(ip, stats):
+            return False
+        self.lan.send(ip, packet_to_message(packet))
+        return True
+
+    async def _send_ble(self, address: str, packet: bytes, stats: PathStats) -> bool:
+        pool = self._ble_pool()
+        try:
+            conn = await pool.acquire(address)
+        except Exception as e:
+            print(f"BLE connect to {address} failed: {e}")
+            stats.record_failure()
+            return False
+        try:
+            async with conn.lock:
+                start = time.perf_counter()
+                echo = await conn.acks.write(packet)
+            if echo is None and conn.acks.echoed:
+                print(f"BLE write to {address} was not acknowledged")
+                stats.record_failure()
+                return False
+            # No echo from a light that has never echoed is delivered, just untimed
+            stats.record_ok(None if echo is None else time.perf_counter() - start)
+            return True
+        except Exception as e:
+            print(f"BLE write to {address} failed: {e}")
+            stats.record_failure()
+            return False
+        finally:
+            pool.release(conn)
+
+    async def send(self, key: str, packet: bytes):
+        """Send one command packet; returns the transport that carried it, or
+        None if every path failed."""
+        for attempt, (transport, target, stats) in enumerate(self.routes(key, packet)):
+            if attempt:
+                METRICS.counter("govee_failovers_total", device=key, transport=transport).inc()
+            if transport == "lan":
+                ok = await self._send_lan(target, packet, stats)
+            else:
+                ok = await self._send_ble(target, packet, stats)
+            if ok:
+                return transport
+        return None
+
+    async def _probe_lan(self, ip: str, stats: PathStats) -> bool:
+        start = time.perf_counter()
+        if await self.lan.status(ip) is None:
+            stats.record_failure()
+            return False
+        stats.record_ok(time.perf_counter() - start)
+        return True
+
+    async def probe(self, key: str) -> dict:
+        """Measure every transport of a device now; returns {transport: ok}."""
+        results = {}
+        for transport, target in self.targets(key).items():
+            stats = self._path(key, transport)
+            if transport == "lan":
+                results[transport] = await self._probe_lan(target, stats)
+            else:
+                results[transport] = await self._send_ble(target, BLE_PING, stats)
+        return results
+
+    async def monitor(self, keys: list[str], interval: float = PROBE_INTERVAL, on_round=None):
+        """Probe `keys` every `interval` seconds until cancelled, calling
+        `on_round(self)` after each round."""
+        while True:
+            await asyncio.gather(*(self.probe(key) for key in keys))
+            if on_round is not None:
+                on_round(self)
+            await asyncio.sleep(interval)
+
+    def start_monitor(self, keys: list[str], interval: float = PROBE_INTERVAL,
+                      on_round=None) -> asyncio.Task:
+        self._monitor = asyncio.create_task(self.monitor(keys, interval, on_round))
+        return self._monitor
+
+    def stats(self) -> dict:
+        return {f"{device} {transport}": stats.as_dict()
+                for (device, transport), stats in self.paths.items()}
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        if self.pool is not None:
+            await self.pool.close()
+
+
+def print_table(router: GoveeRouter):
+    for name, stats in router.stats().items():
+        state = "up" if stats["healthy"] else "DOWN"
+        print(f"  {name:28s} {stats['latency_ms']:>9.2f} ms  "
+              f"ok={stats['ok']} failures={stats['failures']} {state}")
+
+
+def print_round(router: GoveeRouter):
+    print(time.strftime("%H:%M:%S"))
+    print_table(router)
+
+
+async def watch(router: GoveeRouter, keys: list[str], interval: float):
+    """Keep one router probing `keys` and print the table after every round."""
+    print(f"Probing {', '.join(keys)} every {interval:g}s, Ctrl-C to stop")
+    await router.start_monitor(keys, interval, on_round=print_round)
+
+
+async def main():
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print(__doc__)
+        return
+    key = args.pop(0)
+    router = await GoveeRouter().start()
+    try:
+        if args[0].lower() == "probe":
+            await router.probe(key)
+            print_table(router)
+            return
+        if args[0].lower() == "watch":
+            from govee_ble import pop_option
+            try:
+                interval = float(pop_option(args, "--interval") or PROBE_INTERVAL)
+                if interval <= 0:
+                    raise ValueError(interval)
+            except ValueError:
+                print(__doc__)
+                return
+            await watch(router, key.split(","), interval)
+            return
+        from govee_ble import parse_command
+        try:
+            pkt, description = parse_command(args)
+        except ValueError as e:
+            print(e)
+            return
+        print(description)
+        transport = await router.send(key, pkt)
+        if transport:
+            print(f"Done via {transport.upper()}.")
+        else:
+            print("Failed on every transport.")
+        print_table(router)
+    finally:
+        await router.close()
+        router.lan.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,379 @@
+"""
+Scene library: scenes compiled ahead of time into ready-to-send frames.
+
+A scene source file describes static colors, multi-step sequences and
+animations; `compile` turns it into one binary file of checksummed 20-byte
+frames plus their start times. Playback memory-maps that file and sends the
+frames as they are - no encoding or parsing per frame, and scenes that
+aren't being played cost no memory beyond their index entry. Every color in
+govee_ble.NAMED_COLORS is compiled in as a one-frame scene of the same name.
+
+Source format (see scenes.txt), one step per line under "scene <name> [loop]":
+
+    scene force_green
+        on                          wait 1
+        brightness 100              wait 0.5
+        raw 05 02 00 ff 00          wait 1.5      # cmd byte, then payload bytes (hex)
+        color green
+
+    scene dusk
+        fade orange purple 20s ease_in_out
+
+    scene party loop
+        rainbow 6s
+
+Steps are any govee_ble.py command (on, off, color, brightness, temp), "raw",
+"fade <color> <color> <duration> [easing]", "rainbow <duration>" or a bare
+"wait <duration>". A trailing "wait" delays the step after it; without one
+the next step follows as soon as the link takes it. Colors are converted to
+the layout govee_probe.py found for the light when they are sent, except in
+scenes with a "raw" step: those go out exactly as written, so a sequence
+like force_green that tries each layout in turn stays intact.
+
+Usage:
+    python govee_scenes.py compile scenes.txt             # -> ~/.govee_scenes.gvs (GOVEE_SCENES)
+    python govee_scenes.py list
+    python govee_scenes.py check                          # verify every frame's checksum
+    python govee_scenes.py play force_green
+    python govee_scenes.py play party --loops 3 --sim
+    python govee_scenes.py play dusk --lan 192.168.1.40
+
+A running daemon plays them too: "scene dusk", "scene stop".
+
+File format (little-endian): b"GVSC", version byte, u16 scene count, u32
+frame count; then per scene a 32-byte UTF-8 name, u32 first frame, u32
+frame count, f32 duration, u8 flags (1 = loop, 2 = raw), 3 pad bytes; then an f32
+start time per frame; then the 20-byte frames.
+
+Requires: pip install numpy (compiling fades and rainbows), bleak (BLE playback)
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import sys
+from typing import NamedTuple
+
+from govee_codec import FRAME_LEN, RawFrame, encode, is_valid
+
+SCENES_PATH = os.environ.get("GOVEE_SCENES", os.path.expanduser("~/.govee_scenes.gvs"))
+MAGIC = b"GVSC"
+VERSION = 1
+ANIMATION_FPS = 20
+FLAG_LOOP = 1
+FLAG_RAW = 2             # has a "raw" step: send every frame as written
+
+_HEADER = struct.Struct("<4sBxHI")
+_ENTRY = struct.Struct("<32sIIfB3x")
+
+
+class SceneInfo(NamedTuple):
+    name: str
+    first: int           # index of the scene's first frame in the library
+    count: int
+    duration: float      # seconds; a looping scene restarts after this long
+    loop: bool
+    raw: bool = False
+
+
+class Scene(NamedTuple):
+    info: SceneInfo
+    times: tuple         # start time of each frame, seconds from the scene start
+    frames: memoryview   # count * 20 bytes, straight out of the mapped file
+
+    def frame(self, i: int) -> memoryview:
+        return self.frames[i * FRAME_LEN:(i + 1) * FRAME_LEN]
+
+
+class CompiledScene(NamedTuple):
+    name: str
+    times: list
+    frames: bytes        # concatenated 20-byte frames
+    duration: float
+    loop: bool
+    raw: bool = False
+
+
+# -- compiling ---------------------------------------------------------------
+
+def _color_frames(colors) -> bytes:
+    from govee_codec import encode_colors
+    return bytes(encode_colors(colors))
+
+
+def _compile_step(args: list[str], cursor: float) -> tuple:
+    """([times], frames, seconds the step lasts) for one step, starting at `cursor`."""
+    from govee_ble import parse_command, parse_duration
+    name = args[0].lower()
+    if name == "wait":
+        return [], b"", parse_duration(args[1])
+    if name == "raw":
+        values = [int(x, 16) for x in args[1:]]
+        return [cursor], encode(values[0], values[1:]), 0.0
+    if name == "fade":
+        from govee_fade import parse_color, plan
+        rest = list(args[1:])
+        start_rgb, end_rgb = parse_color(rest), parse_color(rest)
+        duration = parse_duration(rest[0])
+        transition = plan(start_rgb, end_rgb, duration, rest[1] if len(rest) > 1 else "ease_in_out", ANIMATION_FPS)
+        return [cursor + float(t) for t in transition.times], transition.frames.tobytes(), duration
+    if name == "rainbow":
+        import colorsys
+        duration = parse_duration(args[1])
+        count = max(2, int(duration * ANIMATION_FPS))
+        colors = []
+        for i in range(count):
+            r, g, b = colorsys.hsv_to_rgb(i / count, 1.0, 1.0)
+            colors.append((int(r * 255), int(g * 255), int(b * 255)))
+        return [cursor + i * duration / count for i in range(count)], _color_frames(colors), duration
+    packet, _ = parse_command(list(args))
+    return [cursor], bytes(packet), 0.0
+
+
+def compile_source(text: str, source: str = "<scenes>") -> list[CompiledScene]:
+    """Compile scene source text; raises ValueError naming the bad line."""
+    scenes = []
+    current = None
+    for number, raw in enumerate(text.splitlines(), 1):
+        tokens = raw.split("#", 1)[0].split()
+        if not tokens:
+            continue
+        try:
+            if tokens[0] == "scene":
+                current = {"name": tokens[1], "loop": "loop" in tokens[2:], "raw": False,
+                           "times": [], "frames": [], "cursor": 0.0}
+                if len(tokens[1].encode()) > 32:
+                    raise ValueError(f"scene name longer than 32 bytes: {tokens[1]}")
+                scenes.append(current)
+                continue
+            if current is None:
+                raise ValueError("step outside a scene")
+            wait = 0.0
+            if len(tokens) >= 3 and tokens[-2] == "wait" and tokens[0] != "wait":
+                from govee_ble import parse_duration
+                wait = parse_duration(tokens[-1])
+                tokens = tokens[:-2]
+            times, frames, lasts = _compile_step(tokens, current["cursor"])
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"{source}:{number}: {str(e).splitlines()[0] or 'bad step'}") from None
+        current["raw"] = current["raw"] or tokens[0] == "raw"
+        current["times"] += times
+        current["frames"].append(frames)
+        current["cursor"] += lasts + wait
+    return [CompiledScene(s["name"], s["times"], b"".join(s["frames"]), s["cursor"], s["loop"], s["raw"])
+            for s in scenes]
+
+
+def named_color_scenes() -> list[CompiledScene]:
+    from govee_ble import NAMED_COLORS
+    frames = _color_frames(NAMED_COLORS.values())
+    return [CompiledScene(name, [0.0], frames[i * FRAME_LEN:(i + 1) * FRAME_LEN], 0.0, False)
+            for i, name in enumerate(NAMED_COLORS)]
+
+
+def write_library(path: str, scenes: list[CompiledScene]) -> int:
+    """Write compiled scenes to `path` atomically; returns the number of frames."""
+    index, times, frames = bytearray(), bytearray(), bytearray()
+    total = 0
+    for scene in scenes:
+        count = len(scene.frames) // FRAME_LEN
+        flags = (FLAG_LOOP if scene.loop else 0) | (FLAG_RAW if scene.raw else 0)
+        index += _ENTRY.pack(scene.name.encode(), total, count, scene.duration, flags)
+        times += struct.pack(f"<{count}f", *scene.times)
+        frames += scene.frames
+        total += count
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(scenes), total))
+        f.write(index)
+        f.write(times)
+        f.write(frames)
+    os.replace(tmp, path)
+    return total
+
+
+def compile_file(source: str, path: str = SCENES_PATH) -> tuple:
+    """Compile a source file (plus the named colors) into a library; (scenes, frames)."""
+    with open(source) as f:
+        scenes = compile_source(f.read(), source)
+    defined = {s.name for s in scenes}
+    scenes += [s for s in named_color_scenes() if s.name not in defined]
+    return len(scenes), write_library(path, scenes)
+
+
+# -- playback ----------------------------------------------------------------
+
+class SceneLibrary:
+    """A compiled scene file, memory-mapped read-only. Only the index is read
+    up front; a scene's times and frames are paged in when it is played."""
+
+    def __init__(self, path: str = SCENES_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, total = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} scene library")
+        self._times_at = _HEADER.size + count * _ENTRY.size
+        self._frames_at = self._times_at + total * 4
+        self.scenes = {}
+        for i in range(count):
+            name, first, n, duration, flags = _ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)
+            name = name.rstrip(b"\0").decode()
+            self.scenes[name] = SceneInfo(name, first, n, duration,
+                                          bool(flags & FLAG_LOOP), bool(flags & FLAG_RAW))
+        self.frame_count = total
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.scenes
+
+    def __getitem__(self, name: str) -> Scene:
+        info = self.scenes[name]
+        times = struct.unpack_from(f"<{info.count}f", self._map, self._times_at + info.first * 4)
+        start = self._frames_at + info.first * FRAME_LEN
+        return Scene(info, times, memoryview(self._map)[start:start + info.count * FRAME_LEN])
+
+    def verify(self) -> list[str]:
+        """Names of scenes with a frame whose checksum doesn't match."""
+        bad = []
+        for name in self.scenes:
+            scene = self[name]
+            if not all(is_valid(scene.frame(i)) for i in range(scene.info.count)):
+                bad.append(name)
+            scene.frames.release()
+        return bad
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def play(scene: Scene, send, loops: int = 1, speed: float = 1.0) -> dict:
+    """Send a scene's frames through `send(packet)` on their timestamps.
+
+    If the link falls behind, frames that are already overdue are skipped
+    except the newest per command, as in govee_fade.play. `loops` = 0
+    repeats a looping scene until cancelled. Frames of a raw scene are sent
+    as RawFrames, which AckWriter doesn't convert to the light's layout.
+    """
+    info, times = scene.info, scene.times
+    frame_type = RawFrame if info.raw else bytes
+    loop = asyncio.get_running_loop()
+    sent = skipped = rounds = 0
+    while True:
+        start = loop.time()
+        i = 0
+        while i < info.count:
+            delay = times[i] / speed - (loop.time() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = (loop.time() - start) * speed
+            j = i + 1
+            while j < info.count and times[j] <= now:
+                j += 1
+            newest = {}
+            for k in range(i, j):
+                newest[scene.frames[k * FRAME_LEN + 1]] = k
+            for k in sorted(newest.values()):
+                await send(frame_type(scene.frame(k)))
+            sent += len(newest)
+            skipped += j - i - len(newest)
+            i = j
+        rounds += 1
+        if not info.loop or (loops and rounds >= loops):
+            break
+        rest = info.duration / speed - (loop.time() - start)
+        if rest > 0:
+            await asyncio.sleep(rest)
+    return {"frames": info.count, "sent": sent, "skipped": skipped, "loops": rounds}
+
+
+def print_library(library: SceneLibrary):
+    for info in library.scenes.values():
+        kind = "loop" if info.loop else ("static" if info.count == 1 else "sequence")
+        kind += ", raw" if info.raw else ""
+        print(f"  {info.name:24s} {info.count:6d} frames {info.duration:7.1f}s  {kind}")
+    size = os.path.getsize(library.path)
+    print(f"{len(library.scenes)} scenes, {library.frame_count} frames, {size / 1024:.1f} KiB ({library.path})")
+
+
+async def _play_main(library: SceneLibrary, name: str, args: list[str]):
+    from govee_ble import AckWriter, pop_option, resolve_address
+    loops = int(pop_option(args, "--loops", 1))
+    speed = float(pop_option(args, "--speed", 1.0))
+    lan_ip = pop_option(args, "--lan")
+    scene = library[name]
+    if lan_ip:
+        from govee_fade import lan_sender
+        from govee_lan import GoveeLanClient
+        client = await GoveeLanClient.open()
+        try:
+            stats = await play(scene, lan_sender(client, lan_ip), loops, speed)
+        finally:
+            client.close()
+    else:
+        if "--sim" in args:
+            from govee_sim import BleSimulator
+            sim = BleSimulator(1, connect_delay=0.05, echo_delay=0.01)
+            ble = sim.client(sim.addresses[0])
+        else:
+            import govee_ble
+            govee_ble._load_bleak()
+            ble = govee_ble.BleakClient(resolve_address(), timeout=10.0)
+        await ble.connect()
+        try:
+            acks = AckWriter(ble)
+            await acks.start()
+            stats = await play(scene, acks.write, loops, speed)
+        finally:
+            await ble.disconnect()
+        if "--sim" in args:
+            print(f"  light: {sim.devices[sim.addresses[0]].status()}")
+    print(f"Played {name}: {stats['sent']}/{stats['frames'] * stats['loops']} frames sent, {stats['skipped']} skipped")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in ("compile", "list", "check", "play"):
+        print(__doc__)
+        return
+    from govee_ble import pop_option
+    path = pop_option(args, "--lib", SCENES_PATH)
+    action = args.pop(0)
+    if action == "compile":
+        if not args:
+            print("Usage: govee_scenes.py compile <source> [--lib path]")
+            return
+        try:
+            scenes, frames = compile_file(args[0], path)
+        except (OSError, ValueError) as e:
+            print(e)
+            return
+        print(f"Compiled {scenes} scenes ({frames} frames) into {path}")
+        return
+    try:
+        library = SceneLibrary(path)
+    except (OSError, ValueError) as e:
+        print(f"{e} (compile one with: python govee_scenes.py compile scenes.txt)")
+        return
+    with library:
+        if action == "list":
+            print_library(library)
+        elif action == "check":
+            bad = library.verify()
+            print(f"Bad checksums in: {', '.join(bad)}" if bad else f"All {library.frame_count} frames OK")
+        elif not args or args[0] not in library:
+            print(f"Unknown scene. Known: {', '.join(library.scenes)}")
+        else:
+            asyncio.run(_play_main(library, args[0], args[1:]))
+
+
+if __name__ == "__main__":
+    main()
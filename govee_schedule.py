@@ -0,0 +1,511 @@
+"""
+Resident scheduler: cron-style and one-shot timers, and sunrise / sunset
+ramps, for any number of lights.
+
+Every job's next fire time lives in one TimerWheel on the event loop.
+Timers are bucketed by tick (50 ms by default), so everything due in the
+same tick fires on a single wakeup, and the loop sleeps straight through to
+the next occupied tick instead of polling - a thousand lights scheduled for
+07:00 cost one wakeup, not a thousand asyncio handles. A few seconds before
+each fire time the target lights are connected through the BlePool, so the
+command itself goes out on a warm link.
+
+Ramps are precomputed with govee_fade.plan: brightness and color
+temperature frames (the same bytes as cmd_brightness and cmd_color_temp)
+with repeats dropped, one timer per step.
+
+Schedule file, one job per line ('#' starts a comment):
+
+    0 7 * * 1-5      bedroom              sunrise 30m
+    30 22 * * *      livingroom           sunset 20m
+    */15 * * * *     98:17:3C:21:E3:3F    brightness 80
+    @hourly          desk,98:17:3C:21:E3:3F   color warm
+    at 22:30         livingroom           off
+    at 2026-12-24T18:00   tree            color red
+    in 90s           desk                 on
+
+The first five fields are minute, hour, day of month, month and day of week
+(0 = Sunday), each "*", a number, a range "a-b", a list "a,b" or a step
+"*/n". Targets are registry groups, device names or MACs, comma-separated.
+Actions are any govee_ble.py command, plus "sunrise <duration> [from_K to_K]"
+and "sunset <duration> [from_K to_K]".
+
+Usage:
+    python govee_schedule.py schedule.txt                # run until interrupted
+    python govee_schedule.py schedule.txt --next 10      # print the next 10 fire times and exit
+    python govee_schedule.py schedule.txt --sim          # against simulated lights
+    python govee_schedule.py --bench 10000               # timer wheel only: 10000 timers over 2 seconds
+
+Requires: pip install numpy bleak
+"""
+
+import asyncio
+import heapq
+import math
+import sys
+import time
+from datetime import datetime, timedelta
+
+from govee_metrics import METRICS, quantile
+
+RESOLUTION = 0.05        # seconds per wheel tick; timers never fire early, at most this late
+PREWARM_LEAD = 5.0       # seconds before a fire time to connect its lights
+REANCHOR = 900.0         # far-off jobs re-check the wall clock this often (NTP steps, suspend)
+RAMP_STEP = 10.0         # seconds between ramp steps
+SUNRISE_KELVIN = (2000, 5000)
+SUNSET_KELVIN = (5000, 2000)
+
+
+class Timer:
+    __slots__ = ("when", "callback", "args", "cancelled", "_wheel")
+
+    def __init__(self, wheel, when: float, callback, args):
+        self._wheel = wheel
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._wheel._pending -= 1
+
+
+class TimerWheel:
+    """Timers on loop time, bucketed per tick, with one loop handle armed
+    for the earliest occupied tick.
+
+    Adding a timer is a dict append (plus a heap push the first time a tick
+    is used); cancelling just marks it.
+    """
+
+    def __init__(self, resolution: float = RESOLUTION):
+        self.resolution = resolution
+        self.wakeups = 0
+        self.fired = 0
+        self._buckets = {}       # tick -> [Timer]
+        self._ticks = []         # heap of ticks that have a bucket
+        self._pending = 0
+        self._handle = None
+        self._armed_tick = None
+        self._lateness = METRICS.histogram("govee_timer_lateness_seconds")
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def call_at(self, when: float, callback, *args) -> Timer:
+        """Run callback(*args) at loop time `when` (never before it)."""
+        tick = math.ceil(when / self.resolution)
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            bucket = self._buckets[tick] = []
+            heapq.heappush(self._ticks, tick)
+        timer = Timer(self, when, callback, args)
+        bucket.append(timer)
+        self._pending += 1
+        if self._armed_tick is None or tick < self._armed_tick:
+            self._arm()
+        return timer
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        return self.call_at(asyncio.get_running_loop().time() + delay, callback, *args)
+
+    def _arm(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._armed_tick = None
+        if self._ticks:
+            self._armed_tick = self._ticks[0]
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_at(self._armed_tick * self.resolution, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self.wakeups += 1
+        now = asyncio.get_running_loop().time()
+        while self._ticks and self._ticks[0] * self.resolution <= now:
+            tick = heapq.heappop(self._ticks)
+            for timer in self._buckets.pop(tick):
+                if timer.cancelled:
+                    continue
+                timer.cancelled = True
+                self._pending -= 1
+                self.fired += 1
+                self._lateness.observe(now - timer.when)
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    print(f"Timer callback failed: {e}")
+        self._arm()
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._buckets.clear()
+        self._ticks.clear()
+        self._pending = 0
+        self._handle = self._armed_tick = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "fired": self.fired,
+            "wakeups": self.wakeups,
+            "lateness_p95_ms": round(quantile(self._lateness.recent, 0.95) * 1000, 2),
+        }
+
+
+def _parse_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(x) for x in spec.split("-"))
+        else:
+            start = end = int(spec)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+MACROS = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@midnight": "0 0 * * *",
+          "@weekly": "0 0 * * 0", "@monthly": "0 0 1 * *"}
+
+
+class Cron:
+    """Five-field cron expression in local time."""
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        fields = MACROS.get(expr, expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron needs 5 fields: {expr}")
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, t: datetime) -> bool:
+        day = t.day in self.days
+        weekday = (t.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday          # cron: either restriction matches
+
+    def next_after(self, ts: float) -> float:
+        """Wall-clock timestamp of the first match strictly after `ts`."""
+        t = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t.timestamp()
+        raise ValueError(f"Cron never matches: {self.expr}")
+
+
+def parse_at(text: str, now: float = None) -> float:
+    """Timestamp for "HH:MM" (next occurrence) or an ISO date-time."""
+    now = time.time() if now is None else now
+    if "T" in text or "-" in text:
+        return datetime.fromisoformat(text).timestamp()
+    hour, minute = (int(x) for x in text.split(":"))
+    t = datetime.fromtimestamp(now).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if t.timestamp() <= now:
+        t += timedelta(days=1)
+    return t.timestamp()
+
+
+def ramp_steps(duration: float, brightness: tuple, kelvin: tuple, step: float = RAMP_STEP) -> list:
+    """[(offset, [packets])] for a brightness + color temperature ramp."""
+    from govee_fade import plan
+    transition = plan(duration=duration, easing="ease_in_out", fps=1.0 / step,
+                      start_brightness=brightness[0], end_brightness=brightness[1],
+                      start_kelvin=kelvin[0], end_kelvin=kelvin[1])
+    steps = []
+    for offset, frame in zip(transition.times, transition.frames):
+        if steps and steps[-1][0] == float(offset):
+            steps[-1][1].append(frame.tobytes())
+        else:
+            steps.append((float(offset), [frame.tobytes()]))
+    return steps
+
+
+def parse_action(args: list[str]) -> tuple:
+    """(steps, description) for an action; steps are [(offset seconds, [packets])]."""
+    from govee_ble import cmd_power_off, cmd_power_on, parse_command, parse_duration
+    name = args[0].lower() if args else ""
+    if name in ("sunrise", "sunset"):
+        if len(args) < 2:
+            raise ValueError(f"Usage: {name} <duration> [from_K to_K]")
+        duration = parse_duration(args[1])
+        kelvin = (int(args[2]), int(args[3])) if len(args) >= 4 else (SUNRISE_KELVIN if name == "sunrise" else SUNSET_KELVIN)
+        if name == "sunrise":
+            steps = ramp_steps(duration, (1, 100), kelvin)
+            steps[0][1].insert(0, bytes(cmd_power_on()))
+        else:
+            steps = ramp_steps(duration, (100, 1), kelvin) + [(duration, [bytes(cmd_power_off())])]
+        return steps, f"{name} over {args[1]} ({kelvin[0]}K -> {kelvin[1]}K)"
+    packet, description = parse_command(list(args))
+    return [(0.0, [bytes(packet)])], description
+
+
+class Job:
+    def __init__(self, name: str, targets: list[str], steps: list, cron: Cron = None, at: float = None):
+        self.name = name
+        self.targets = targets
+        self.steps = steps
+        self.cron = cron
+        self.at = at
+        self.next_fire = None      # wall-clock timestamp
+        self.fires = 0
+        self.failures = 0
+        self.timers = []
+
+    def next_after(self, ts: float):
+        if self.cron is not None:
+            return self.cron.next_after(ts)
+        return self.at if self.at is not None and self.at > ts else None
+
+
+def parse_line(line: str, now: float = None) -> tuple:
+    """(when, target, action args) for one schedule line; `when` is a Cron or a timestamp."""
+    now = time.time() if now is None else now
+    tokens = line.split()
+    if tokens[0] == "at":
+        return parse_at(tokens[1], now), tokens[2], tokens[3:]
+    if tokens[0] == "in":
+        from govee_ble import parse_duration
+        return now + parse_duration(tokens[1]), tokens[2], tokens[3:]
+    if tokens[0].startswith("@"):
+        return Cron(tokens[0]), tokens[1], tokens[2:]
+    return Cron(" ".join(tokens[:5])), tokens[5], tokens[6:]
+
+
+def load_schedule(path: str, registry=None) -> list[Job]:
+    """Read a schedule file into jobs; raises ValueError naming the bad line."""
+    jobs = []
+    with open(path) as f:
+        for number, raw in enumerate(f, 1):
+            line = raw.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                when, target, action = parse_line(line)
+                steps, description = parse_action(action)
+                targets = resolve_targets(target, registry)
+            except (ValueError, KeyError, IndexError) as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+            cron = when if isinstance(when, Cron) else None
+            at = None if cron else when
+            jobs.append(Job(f"{target} {description}", targets, steps, cron=cron, at=at))
+    return jobs
+
+
+def resolve_targets(target: str, registry=None) -> list[str]:
+    """BLE addresses for comma-separated group names, device names and MACs."""
+    addresses = []
+    for item in target.split(","):
+        if registry is not None and item in registry.groups:
+            addresses.extend(registry.group_addresses(item))
+            continue
+        record = registry.find(item) if registry is not None else None
+        addresses.append(record.get("address", record["mac"]) if record else item)
+    return list(dict.fromkeys(addresses))
+
+
+class Scheduler:
+    """Fires jobs' packets at their lights on time, warming connections first.
+
+    `send(address, packets)` writes to one light (BlePool.send); `prewarm(addresses)`
+    starts connecting them (BlePool.prewarm) and may be None.
+    """
+
+    def __init__(self, send, prewarm=None, concurrency: int = None, prewarm_lead: float = PREWARM_LEAD,
+                 wheel: TimerWheel = None):
+        from govee_group import MAX_CONCURRENT
+        self.send = send
+        self.prewarm = prewarm
+        self.concurrency = concurrency or MAX_CONCURRENT
+        self.prewarm_lead = prewarm_lead
+        self.wheel = wheel or TimerWheel()
+        self.jobs = []
+        self._tasks = set()
+        self._fires = METRICS.counter("govee_schedule_fires_total")
+        self._failures = METRICS.counter("govee_schedule_failures_total")
+
+    def add(self, job: Job) -> Job:
+        self.jobs.append(job)
+        self._plan(job, time.time())
+        return job
+
+    def _plan(self, job: Job, after: float):
+        """Put the job's next occurrence (or a re-anchor, if it is far off) on the wheel."""
+        job.timers = []
+        job.next_fire = job.next_after(after)
+        if job.next_fire is None:
+            return
+        delay = job.next_fire - time.time()
+        if delay - self.prewarm_lead > REANCHOR:
+            job.timers.append(self.wheel.call_later(REANCHOR, self._plan, job, after))
+            return
+        loop = asyncio.get_running_loop()
+        # Anchor the whole occurrence to loop time once, so its steps keep their spacing
+        start = loop.time() + delay
+        if self.prewarm is not None:
+            prewarm_at = max(start - self.prewarm_lead, loop.time())
+            job.timers.append(self.wheel.call_at(prewarm_at, self.prewarm, job.targets))
+        for offset, packets in job.steps:
+            job.timers.append(self.wheel.call_at(start + offset, self._fire, job, packets))
+        last = job.steps[-1][0] if job.steps else 0.0
+        job.timers.append(self.wheel.call_at(start + last, self._plan, job, job.next_fire))
+
+    def _fire(self, job: Job, packets: list):
+        task = asyncio.create_task(self._send(job, packets))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, job: Job, packets: list):
+        from govee_group import fan_out
+        results = await fan_out(job.targets, packets, self.concurrency, send=self.send)
+        job.fires += 1
+        self._fires.inc()
+        failed = [r for r in results if not r.ok]
+        if failed:
+            job.failures += 1
+            self._failures.inc(len(failed))
+            print(f"{job.name}: {len(failed)}/{len(results)} lights failed ({failed[0].error})")
+
+    def cancel(self, job: Job):
+        for timer in job.timers:
+            timer.cancel()
+        self.jobs.remove(job)
+
+    def upcoming(self, count: int = 10) -> list:
+        """[(timestamp, job)] for the next `count` occurrences across all jobs."""
+        heap = [(job.next_fire, i, job) for i, job in enumerate(self.jobs) if job.next_fire is not None]
+        heapq.heapify(heap)
+        out = []
+        while heap and len(out) < count:
+            ts, i, job = heapq.heappop(heap)
+            out.append((ts, job))
+            following = job.next_after(ts)
+            if following is not None:
+                heapq.heappush(heap, (following, i, job))
+        return out
+
+    def stats(self) -> dict:
+        return {"jobs": len(self.jobs), "running": len(self._tasks), **self.wheel.stats()}
+
+    async def close(self):
+        self.wheel.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def bench(count: int, spread: float = 2.0, seed: int = 0) -> dict:
+    """Schedule `count` no-op timers over `spread` seconds; report wakeups and lateness."""
+    import random
+    rng = random.Random(seed)
+    wheel = TimerWheel()
+    done = asyncio.get_running_loop().create_future()
+    remaining = [count]
+
+    def tick():
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            done.set_result(None)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        wheel.call_later(rng.uniform(0, spread), tick)
+    scheduled = time.perf_counter() - start
+    cpu = time.process_time()
+    await done
+    return {**wheel.stats(), "schedule_us_per_timer": scheduled / count * 1e6,
+            "cpu_seconds": time.process_time() - cpu}
+
+
+async def main():
+    args = sys.argv[1:]
+    from govee_ble import pop_option
+    bench_count = pop_option(args, "--bench")
+    if bench_count is not None:
+        result = await bench(int(bench_count))
+        print(f"{result['fired']} timers, {result['wakeups']} wakeups, lateness p95 {result['lateness_p95_ms']:.1f} ms, "
+              f"{result['schedule_us_per_timer']:.1f} us to schedule each, {result['cpu_seconds']:.3f}s CPU")
+        return
+    next_count = pop_option(args, "--next")
+    if not args:
+        print(__doc__)
+        return
+    from govee_registry import DeviceRegistry
+    registry = DeviceRegistry()
+    try:
+        jobs = load_schedule(args[0], registry)
+    except (OSError, ValueError) as e:
+        print(e)
+        return
+
+    from govee_pool import BlePool
+    sim = None
+    if "--sim" in args:
+        from govee_sim import BleSimulator, SimulatedDevice
+        sim = BleSimulator(0, connect_delay=0.5, echo_delay=0.01)
+        for job in jobs:
+            for address in job.targets:
+                sim.devices.setdefault(address, SimulatedDevice(address))
+        pool = BlePool(client_factory=sim.client)
+    else:
+        pool = BlePool()
+    scheduler = Scheduler(pool.send, pool.prewarm, pool.max_connections)
+    for job in jobs:
+        scheduler.add(job)
+    refresh = registry.start_background_refresh() if sim is None and next_count is None else None
+
+    if next_count is not None:
+        for ts, job in scheduler.upcoming(int(next_count)):
+            print(f"  {datetime.fromtimestamp(ts):%Y-%m-%d %H:%M}  {job.name}")
+        await scheduler.close()
+        return
+
+    print(f"Scheduled {len(jobs)} jobs on {len({a for j in jobs for a in j.targets})} lights; Ctrl+C to stop")
+    for ts, job in scheduler.upcoming(5):
+        print(f"  next {datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S}  {job.name}")
+    try:
+        # Cron jobs keep this running; a schedule of one-shots ends after the last one
+        while any(job.next_fire for job in scheduler.jobs) or scheduler._tasks:
+            await asyncio.sleep(1)
+    finally:
+        if sim is not None:
+            for address, device in sim.devices.items():
+                print(f"  {address}: {device.status()}")
+        print(f"Stats: {scheduler.stats()} pool={pool.stats()}")
+        if refresh is not None:
+            refresh.cancel()
+        await scheduler.close()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,452 @@
+"""
+Local Govee device simulator, for measuring throughput and latency without
+the H6008 on the desk.
+
+BLE: FakeBleakClient / FakeBleakScanner stand in for bleak's classes. They
+expose a service with WRITE_UUID and NOTIFY_UUID, apply written frames to a
+SimulatedDevice, echo them on the notify characteristic like the real light,
+and have configurable connect delay, write latency and drop rate. With
+max_write_rate, frames arriving faster than the light can apply them are
+silently lost (no echo), the way the H6008 behaves under unacked bursts.
+Each device takes colors in one of govee_codec.COLOR_LAYOUTS (color_layout);
+color frames in another layout are echoed but don't change anything, and
+commands the model doesn't know get no echo at all. 0xAA status queries are
+answered with the device's power, brightness or color.
+
+    sim = BleSimulator(devices=100, connect_delay=0.5, write_latency=0.01)
+    pool = BlePool(client_factory=sim.client)          # anything taking a factory
+    with sim.patch(govee_ble):                         # or patch module globals
+        await govee_ble.send_command(cmd_power_on(), sim.addresses[0])
+
+LAN: LanSimulator answers the scan, turn, brightness, colorwc and devStatus
+messages govee_lan.py sends, with one UDP socket per simulated device on
+127.0.0.x (all of 127/8 is loopback on Linux).
+
+    python govee_sim.py lan 200        # run 200 LAN devices until Ctrl-C
+
+No dependencies beyond the standard library.
+"""
+
+import asyncio
+import contextlib
+import ipaddress
+import json
+import random
+import socket
+import sys
+import time
+
+from govee_codec import (CMD_BRIGHTNESS, CMD_COLOR, CMD_POWER, COLOR_LAYOUTS, DEFAULT_COLOR_LAYOUT, HEAD_CMD,
+                         HEAD_KEEP_ALIVE, MODE_MANUAL, decode, encode, match_color_layout)
+from govee_ble import NOTIFY_UUID, WRITE_UUID
+
+SERVICE_UUID = "00010203-0405-0607-0809-0a0b0c0d1910"
+
+
+class SimulatedDevice:
+    """State of one fake light, updated by BLE frames or LAN messages."""
+
+    def __init__(self, address: str, name: str = None, model: str = "H6008", ip: str = None,
+                 color_layout: str = DEFAULT_COLOR_LAYOUT):
+        self.address = address
+        self.name = name or f"ihoment_{model}_{address.replace(':', '')[-4:]}"
+        self.model = model
+        self.color_layout = color_layout
+        self.ip = ip
+        self.power = False
+        self.brightness = 100
+        self.rgb = (255, 255, 255)
+        self.kelvin = 0
+        self.frames = 0          # frames applied
+        self.dropped = 0         # frames lost to the drop rate or max_write_rate
+        self.last_applied = 0.0
+
+    def apply_frame(self, frame: bytes):
+        try:
+            head, cmd, payload = decode(frame)
+        except ValueError:
+            return
+        if head != HEAD_CMD:
+            return
+        if cmd == CMD_POWER:
+            self.power = bool(payload[0])
+        elif cmd == CMD_BRIGHTNESS:
+            self.brightness = payload[0]
+        else:
+            match = match_color_layout(frame)
+            if match is None or match[0] != self.color_layout:
+                return
+            self.rgb = match[1]
+            kelvin = cmd == CMD_COLOR and payload[0] == MODE_MANUAL and payload[4] == 0x01
+            self.kelvin = (payload[5] << 8 | payload[6]) if kelvin else 0
+        self.frames += 1
+        self.last_applied = time.monotonic()
+
+    def knows(self, frame: bytes) -> bool:
+        """Whether the model answers this frame at all (unknown commands get no echo)."""
+        return frame[0] == HEAD_KEEP_ALIVE or frame[1] in (CMD_POWER, CMD_BRIGHTNESS, CMD_COLOR,
+                                                           COLOR_LAYOUTS[self.color_layout][0])
+
+    def reply(self, frame: bytes) -> bytes:
+        """Notification for a frame: commands are echoed, status queries answered."""
+        head, cmd = frame[0], frame[1]
+        if head != HEAD_KEEP_ALIVE:
+            return encode(cmd, (), head=head)
+        if cmd == CMD_POWER:
+            return encode(cmd, (int(self.power),), head=head)
+        if cmd == CMD_BRIGHTNESS:
+            return encode(cmd, (self.brightness,), head=head)
+        if cmd == CMD_COLOR:
+            return encode(cmd, (MODE_MANUAL, *self.rgb), head=head)
+        return encode(cmd, (), head=head)
+
+    def status(self) -> dict:
+        r, g, b = self.rgb
+        return {"onOff": int(self.power), "brightness": self.brightness,
+                "color": {"r": r, "g": g, "b": b}, "colorTemInKelvin": self.kelvin}
+
+
+class _Characteristic:
+    def __init__(self, uuid: str, properties: list[str]):
+        self.uuid = uuid
+        self.properties = properties
+        self.descriptors = []
+
+
+class _Service:
+    def __init__(self):
+        self.uuid = SERVICE_UUID
+        self.characteristics = [
+            _Characteristic(WRITE_UUID, ["write-without-response", "write"]),
+            _Characteristic(NOTIFY_UUID, ["notify"]),
+        ]
+
+
+class FakeBleakClient:
+    """Drop-in for bleak.BleakClient backed by a BleSimulator."""
+
+    def __init__(self, address, timeout: float = 10.0, disconnected_callback=None, simulator=None):
+        self.simulator = simulator
+        self.address = getattr(address, "address", address)
+        self.timeout = timeout
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.services = [_Service()]
+        self._notify = None
+
+    async def connect(self, **kwargs):
+        sim = self.simulator
+        device = sim.devices.get(self.address)
+        await asyncio.sleep(sim.connect_delay)
+        if device is None or (sim.connect_failure_rate and sim.random.random() < sim.connect_failure_rate):
+            raise TimeoutError(f"Device with address {self.address} was not found")
+        sim.connects += 1
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        was_connected = self.is_connected
+        self.is_connected = False
+        self._notify = None
+        if was_connected and self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+        return True
+
+    def drop_link(self):
+        """Simulate the light going out of range."""
+        asyncio.ensure_future(self.disconnect())
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    async def start_notify(self, uuid, callback):
+        if str(uuid) != NOTIFY_UUID:
+            raise ValueError(f"Characteristic {uuid} not found")
+        self._notify = callback
+
+    async def stop_notify(self, uuid):
+        self._notify = None
+
+    async def read_gatt_char(self, uuid):
+        raise ValueError(f"Characteristic {uuid} does not support read")
+
+    async def write_gatt_char(self, uuid, data, response: bool = False):
+        if not self.is_connected:
+            raise ConnectionError("Not connected")
+        if str(uuid) != WRITE_UUID:
+            raise ValueError(f"Characteristic {uuid} not found")
+        sim = self.simulator
+        frame = bytes(data)
+        sim.writes += 1
+        if sim.write_latency:
+            await asyncio.sleep(sim.write_latency)
+        device = sim.devices[self.address]
+        if sim.drop_rate and sim.random.random() < sim.drop_rate:
+            device.dropped += 1
+            return
+        if (sim.max_write_rate and frame[0] == HEAD_CMD
+                and time.monotonic() - device.last_applied < 1.0 / sim.max_write_rate):
+            device.dropped += 1
+            return
+        device.apply_frame(frame)
+        if sim.echo and self._notify is not None and device.knows(frame):
+            echo = bytearray(device.reply(frame))
+            loop = asyncio.get_running_loop()
+            loop.call_later(sim.echo_delay, self._echo, echo)
+
+    def _echo(self, echo: bytearray):
+        if self._notify is not None:
+            self._notify(NOTIFY_UUID, echo)
+
+
+class _FakeDevice:
+    def __init__(self, address: str, name: str):
+        self.address = address
+        self.name = name
+
+
+class _FakeAdvertisement:
+    def __init__(self, name: str, rssi: int):
+        self.local_name = name
+        self.rssi = rssi
+        self.manufacturer_data = {}
+
+
+class FakeBleakScanner:
+    """Drop-in for bleak.BleakScanner: each device advertises once, spread over adv_interval."""
+
+    def __init__(self, detection_callback=None, simulator=None, **kwargs):
+        self.simulator = simulator
+        self.detection_callback = detection_callback
+        self._handles = []
+
+    def _adverts(self):
+        sim = self.simulator
+        for device in sim.devices.values():
+            yield (sim.random.uniform(0, sim.adv_interval), _FakeDevice(device.address, device.name),
+                   _FakeAdvertisement(device.name, sim.random.randint(-90, -40)))
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for delay, device, adv in self._adverts():
+            self._handles.append(loop.call_later(delay, self.detection_callback, device, adv))
+
+    async def stop(self):
+        for handle in self._handles:
+            handle.cancel()
+        self._handles = []
+
+    @classmethod
+    async def discover(cls, timeout: float = 5.0, return_adv: bool = False, simulator=None, **kwargs):
+        scanner = cls(simulator=simulator)
+        adverts = list(scanner._adverts())
+        await asyncio.sleep(timeout)
+        if return_adv:
+            return {device.address: (device, adv) for _, device, adv in adverts}
+        return [device for _, device, _ in adverts]
+
+
+class BleSimulator:
+    """A population of simulated BLE lights plus factories for fake bleak objects."""
+
+    def __init__(self, devices: int = 1, connect_delay: float = 0.5, write_latency: float = 0.005,
+                 drop_rate: float = 0.0, echo: bool = True, echo_delay: float = 0.01,
+                 connect_failure_rate: float = 0.0, adv_interval: float = 0.1, seed: int = 0,
+                 max_write_rate: float = 0.0):
+        self.random = random.Random(seed)
+        self.max_write_rate = max_write_rate
+        self.connect_delay = connect_delay
+        self.write_latency = write_latency
+        self.drop_rate = drop_rate
+        self.echo = echo
+        self.echo_delay = echo_delay
+        self.connect_failure_rate = connect_failure_rate
+        self.adv_interval = adv_interval
+        self.connects = 0
+        self.writes = 0
+        self.devices = {}
+        for i in range(devices):
+            address = "98:17:3C:%02X:%02X:%02X" % ((i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF)
+            self.devices[address] = SimulatedDevice(address)
+
+    @property
+    def addresses(self) -> list[str]:
+        return list(self.devices)
+
+    def client(self, address, timeout: float = 10.0, disconnected_callback=None, **kwargs) -> FakeBleakClient:
+        """Factory with BleakClient's signature (also fits BlePool's client_factory)."""
+        return FakeBleakClient(address, timeout, disconnected_callback, simulator=self)
+
+    def scanner(self, detection_callback=None, **kwargs) -> FakeBleakScanner:
+        return FakeBleakScanner(detection_callback, simulator=self)
+
+    @contextlib.contextmanager
+    def patch(self, *modules):
+        """Temporarily replace BleakClient / BleakScanner in the given modules."""
+        sim = self
+
+        class Client(FakeBleakClient):
+            def __init__(self, address, timeout=10.0, disconnected_callback=None, **kwargs):
+                super().__init__(address, timeout, disconnected_callback, simulator=sim)
+
+        class Scanner(FakeBleakScanner):
+            def __init__(self, detection_callback=None, **kwargs):
+                super().__init__(detection_callback, simulator=sim)
+
+            @classmethod
+            async def discover(cls, timeout=5.0, return_adv=False, **kwargs):
+                return await FakeBleakScanner.discover(timeout, return_adv, simulator=sim)
+
+        saved = []
+        for module in modules:
+            for name, fake in (("BleakClient", Client), ("BleakScanner", Scanner)):
+                if hasattr(module, name):
+                    saved.append((module, name, getattr(module, name)))
+                    setattr(module, name, fake)
+        try:
+            yield self
+        finally:
+            for module, name, original in reversed(saved):
+                setattr(module, name, original)
+
+
+class _DeviceProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sim: "LanSimulator", device: SimulatedDevice):
+        self.sim = sim
+        self.device = device
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.sim.received += 1
+        try:
+            msg = json.loads(data)["msg"]
+        except (ValueError, KeyError, TypeError):
+            return
+        device, cmd, value = self.device, msg.get("cmd"), msg.get("data", {})
+        if cmd == "turn":
+            device.power = bool(value.get("value"))
+        elif cmd == "brightness":
+            device.brightness = value.get("value", device.brightness)
+        elif cmd == "colorwc":
+            color = value.get("color", {})
+            device.rgb = (color.get("r", 0), color.get("g", 0), color.get("b", 0))
+            device.kelvin = value.get("colorTemInKelvin", 0)
+        elif cmd == "devStatus":
+            reply = json.dumps({"msg": {"cmd": "devStatus", "data": device.status()}}).encode()
+            self.transport.sendto(reply, (addr[0], self.sim.reply_port))
+            return
+        else:
+            return
+        device.frames += 1
+
+
+class _ScanProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sim: "LanSimulator"):
+        self.sim = sim
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            if json.loads(data)["msg"]["cmd"] != "scan":
+                return
+        except (ValueError, KeyError, TypeError):
+            return
+        loop = asyncio.get_running_loop()
+        for device in self.sim.devices.values():
+            reply = {"msg": {"cmd": "scan", "data": {
+                "ip": device.ip, "device": "1F:80:" + device.address, "sku": device.model,
+                "bleVersionHard": "3.01.01", "bleVersionSoft": "1.03.01",
+                "wifiVersionHard": "1.00.10", "wifiVersionSoft": "1.02.03"}}}
+            # Each device answers from its own address after a small random
+            # delay, like real lights do
+            transport = self.sim.transports[device.ip]
+            loop.call_later(self.sim.random.uniform(0, self.sim.scan_jitter), transport.sendto,
+                            json.dumps(reply).encode(), (addr[0], self.sim.reply_port))
+
+
+def _bound_socket(address) -> socket.socket:
+    # SO_REUSEADDR so a simulator can be restarted right after the last one closed
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.setblocking(False)
+    return sock
+
+
+class LanSimulator:
+    """UDP responders for `devices` fake LAN lights on consecutive IPs from first_ip.
+
+    Scans are answered on scan_address, commands on each device's
+    (ip, cmd_port); replies go to the sender's host on reply_port.
+    """
+
+    def __init__(self, devices: int = 1, first_ip: str = "127.0.0.2",
+                 scan_address=("127.0.0.1", 4001), cmd_port: int = 4003, reply_port: int = 4002,
+                 scan_jitter: float = 0.1, seed: int = 0):
+        self.random = random.Random(seed)
+        self.scan_jitter = scan_jitter
+        self.scan_address = scan_address
+        self.cmd_port = cmd_port
+        self.reply_port = reply_port
+        self.received = 0
+        self.devices = {}
+        self.transports = {}
+        self._scan_transport = None
+        for i in range(devices):
+            ip = str(ipaddress.IPv4Address(first_ip) + i)
+            address = "98:17:3C:00:%02X:%02X" % ((i >> 8) & 0xFF, i & 0xFF)
+            self.devices[ip] = SimulatedDevice(address, ip=ip)
+
+    @property
+    def ips(self) -> list[str]:
+        return list(self.devices)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for ip, device in self.devices.items():
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda d=device: _DeviceProtocol(self, d), sock=_bound_socket((ip, self.cmd_port)))
+            self.transports[ip] = transport
+        self._scan_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ScanProtocol(self), sock=_bound_socket(self.scan_address))
+        return self
+
+    def close(self):
+        for transport in self.transports.values():
+            transport.close()
+        self.transports = {}
+        if self._scan_transport is not None:
+            self._scan_transport.close()
+            self._scan_transport = None
+
+
+async def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "lan":
+        print(__doc__)
+        return
+    count = int(sys.argv[2]) if len(sys.argv) >= 3 else 1
+    sim = await LanSimulator(count).start()
+    print(f"Simulating {count} LAN device(s) on {sim.ips[0]}..{sim.ips[-1]}, scan on {sim.scan_address[0]}:{sim.scan_address[1]}")
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(f"  {sim.received} messages received")
+    finally:
+        sim.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
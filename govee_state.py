@@ -0,0 +1,147 @@
+"""
+Per-device state model: what the light is currently showing, as far as we know.
+
+State is learned from three places: commands we sent (apply_packet), the
+light's replies on NOTIFY_UUID (apply_notification - 0xAA status frames, the
+same shape the keep-alive gets back), and LAN devStatus answers
+(apply_lan_status). With that, a write that would not change anything - "set
+it to what it already is" - can be skipped.
+
+Knowledge goes stale: someone may have used the app or the wall switch since,
+so a field is only trusted for max_age seconds after it was last confirmed.
+
+    state = DeviceState()
+    if state.would_change(pkt):
+        await session.write(pkt)
+        state.apply_packet(pkt)
+"""
+
+import time
+
+from govee_codec import CMD_BRIGHTNESS, CMD_COLOR, CMD_POWER, HEAD_CMD, HEAD_KEEP_ALIVE, MODE_MANUAL, encode
+
+DEFAULT_MAX_AGE = 300.0
+
+# Status queries: the light answers each with an 0xAA frame carrying the value
+QUERY_POWER = encode(CMD_POWER, (), head=HEAD_KEEP_ALIVE)
+QUERY_BRIGHTNESS = encode(CMD_BRIGHTNESS, (), head=HEAD_KEEP_ALIVE)
+QUERY_COLOR = encode(CMD_COLOR, (0x01,), head=HEAD_KEEP_ALIVE)
+STATUS_QUERIES = (QUERY_POWER, QUERY_BRIGHTNESS, QUERY_COLOR)
+
+
+class DeviceState:
+    """Last known power / brightness / color / color temperature / mode of one light."""
+
+    FIELDS = ("power", "brightness", "rgb", "kelvin", "mode")
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.power = None
+        self.brightness = None
+        self.rgb = None
+        self.kelvin = None
+        self.mode = None
+        self._updated = {}          # field -> monotonic time it was last set
+        self.skipped = 0            # writes suppressed as redundant
+
+    def _set(self, field: str, value, now: float = None):
+        setattr(self, field, value)
+        self._updated[field] = time.monotonic() if now is None else now
+
+    def known(self, field: str) -> bool:
+        """True if `field` has a value confirmed within max_age."""
+        updated = self._updated.get(field)
+        return updated is not None and time.monotonic() - updated < self.max_age
+
+    def _changes(self, packet: bytes) -> dict:
+        """Fields a command packet would set, or {} if it isn't one we model."""
+        if len(packet) < 9 or packet[0] != HEAD_CMD:
+            return {}
+        cmd = packet[1]
+        if cmd == CMD_POWER:
+            return {"power": bool(packet[2])}
+        if cmd == CMD_BRIGHTNESS:
+            return {"brightness": packet[2]}
+        if cmd == CMD_COLOR and packet[2] == MODE_MANUAL:
+            if packet[6] == 0x01:
+                return {"mode": MODE_MANUAL, "kelvin": packet[7] << 8 | packet[8], "rgb": (packet[3], packet[4], packet[5])}
+            return {"mode": MODE_MANUAL, "kelvin": 0, "rgb": (packet[3], packet[4], packet[5])}
+        return {}
+
+    def would_change(self, packet: bytes) -> bool:
+        """False only if every field the packet sets is known and already equal."""
+        changes = self._changes(packet)
+        if not changes:
+            return True
+        return any(not self.known(f) or getattr(self, f) != v for f, v in changes.items())
+
+    def apply_packet(self, packet: bytes) -> bool:
+        """Record a command that was sent. Returns True if anything changed."""
+        changes = self._changes(packet)
+        changed = any(getattr(self, f) != v for f, v in changes.items())
+        now = time.monotonic()
+        for field, value in changes.items():
+            self._set(field, value, now)
+        return changed
+
+    def apply_notification(self, frame: bytes):
+        """Update from an 0xAA status reply (aa 01 <on>, aa 04 <level>, aa 05 <mode> r g b)."""
+        if len(frame) < 6 or frame[0] != HEAD_KEEP_ALIVE:
+            return
+        cmd = frame[1]
+        if cmd == CMD_POWER:
+            self._set("power", bool(frame[2]))
+        elif cmd == CMD_BRIGHTNESS:
+            self._set("brightness", frame[2])
+        elif cmd == CMD_COLOR:
+            self._set("mode", frame[2])
+            if frame[2] == MODE_MANUAL:
+                self._set("rgb", (frame[3], frame[4], frame[5]))
+
+    def apply_lan_status(self, data: dict):
+        """Update from a LAN devStatus reply."""
+        if "onOff" in data:
+            self._set("power", bool(data["onOff"]))
+        if "brightness" in data:
+            self._set("brightness", data["brightness"])
+        if "color" in data:
+            c = data["color"]
+            self._set("rgb", (c.get("r", 0), c.get("g", 0), c.get("b", 0)))
+        if "colorTemInKelvin" in data:
+            self._set("kelvin", data["colorTemInKelvin"])
+
+    def filter(self, packets) -> list:
+        """Packets that would change something; the rest are counted in `skipped`.
+
+        Applies each kept packet to the state, so a sequence like on, on, color
+        keeps only the first on.
+        """
+        kept = []
+        for packet in packets:
+            if self.would_change(packet):
+                kept.append(packet)
+                self.apply_packet(packet)
+            else:
+                self.skipped += 1
+        return kept
+
+    def as_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+
+class StateCache:
+    """DeviceState per device address (or IP), created on first use."""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.devices = {}
+
+    def __getitem__(self, address: str) -> DeviceState:
+        state = self.devices.get(address)
+        if state is None:
+            state = self.devices[address] = DeviceState(self.max_age)
+        return state
+
+    @property
+    def skipped(self) -> int:
+        return sum(state.skipped for state in self.devices.values())
@@ -0,0 +1,278 @@
+"""
+High-rate color streaming with backpressure.
+
+Feed a light from a generator or async iterator of (r, g, b) values at
+30-60 fps. Between the producer and the link sits a one-frame mailbox:
+the sender takes the newest color whenever the link is ready for another
+write, and any color that was replaced before it got sent is dropped. So
+when the producer outpaces the light, latency stays at roughly one write
+instead of growing with a queue, and the stats say how many frames were
+dropped and what rate the link actually sustained.
+
+Over BLE the writes go out unacknowledged, paced by a govee_rate
+RateController at the rate the light's echoes show it keeps up with (or,
+with --acked, each write waits for its echo); LAN has no echo, so it is
+paced to max_fps.
+
+Usage:
+    python govee_stream.py rainbow                       # 30 fps over BLE, 10 seconds
+    python govee_stream.py rainbow --fps 60 --seconds 5
+    python govee_stream.py pulse --lan 192.168.1.40
+    python govee_stream.py rainbow --fps 60 --sim        # against the simulator
+    python govee_stream.py rainbow --acked               # wait for each echo instead of pacing
+
+    async def colors():
+        while True:
+            yield next_color()
+    stats = await stream(colors(), paced_sender(acks), fps=60)
+
+Requires: pip install bleak (for BLE)
+"""
+
+import asyncio
+import colorsys
+import math
+import sys
+import time
+from collections import deque
+
+from govee_codec import CMD_BRIGHTNESS, encode, new_color_buffer, encode_color_into
+from govee_metrics import quantile
+
+DEFAULT_FPS = 30
+EWMA_ALPHA = 0.1
+
+
+class ColorStream:
+    """Sends the newest pushed color whenever the link is free, dropping superseded ones.
+
+    `send(packet)` is an async write whose completion means the link can take
+    another frame (e.g. AckWriter.write, which waits for the echo). A color
+    may carry a fourth value, a brightness percent, which is written as its
+    own brightness command only when it differs from the last one sent.
+    """
+
+    def __init__(self, send, max_fps: float = 60.0):
+        self.send = send
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.pushed = 0
+        self.sent = 0
+        self.dropped = 0            # replaced before the link was free
+        self.unchanged = 0          # same color as the last one sent
+        self.send_time = None       # EWMA of how long a write takes
+        self.latencies = deque(maxlen=1024)   # push -> write completed, for sent frames
+        self._pending = None        # (rgb, pushed at)
+        self._last_rgb = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task = None
+        self._buf = new_color_buffer(1)
+        self._started = None
+
+    def start(self) -> "ColorStream":
+        if self._task is None:
+            self._started = time.perf_counter()
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    def push(self, rgb):
+        """Offer the next color. Never blocks; replaces a color still waiting."""
+        self.pushed += 1
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = (rgb, time.perf_counter())
+        self._ready.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_at = 0.0
+        while True:
+            if self._pending is None:
+                if self._closed:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)      # newer colors may replace the pending one meanwhile
+            rgb, pushed_at = self._pending
+            self._pending = None
+            if rgb == self._last_rgb:
+                self.unchanged += 1
+                continue
+            start = time.perf_counter()
+            next_at = loop.time() + self.min_interval
+            try:
+                for packet in self._packets(rgb):
+                    await self.send(packet)
+            except Exception as e:
+                print(f"Stream write failed: {e}")
+                continue
+            done = time.perf_counter()
+            took = done - start
+            self.send_time = took if self.send_time is None else self.send_time + EWMA_ALPHA * (took - self.send_time)
+            self.latencies.append(done - pushed_at)
+            self.sent += 1
+            self._last_rgb = rgb
+
+    def _packets(self, rgb) -> list:
+        """The writes that take the light from the last sent frame to `rgb`."""
+        if len(rgb) == 3:
+            encode_color_into(self._buf, *rgb)
+            return [bytes(self._buf)]
+        last = self._last_rgb or ()
+        packets = []
+        if rgb[3:] != last[3:]:
+            packets.append(encode(CMD_BRIGHTNESS, (max(0, min(100, rgb[3])),)))
+        if rgb[:3] != last[:3]:
+            encode_color_into(self._buf, *rgb[:3])
+            packets.append(bytes(self._buf))
+        return packets
+
+    async def close(self):
+        """Send whatever is still pending, then stop."""
+        self._closed = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+
+    @property
+    def capacity_fps(self) -> float:
+        """Writes per second the link is currently managing, from the send-time average."""
+        if not self.send_time:
+            return 0.0
+        return min(1.0 / self.send_time, 1.0 / self.min_interval if self.min_interval else math.inf)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "pushed": self.pushed,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "unchanged": self.unchanged,
+            "elapsed": elapsed,
+            "fps": self.sent / elapsed if elapsed else 0.0,
+            "capacity_fps": self.capacity_fps,
+            "latency_p50": quantile(self.latencies, 0.5),
+            "latency_p95": quantile(self.latencies, 0.95),
+        }
+
+
+async def stream(source, send, fps: float = DEFAULT_FPS, max_fps: float = None, duration: float = None) -> dict:
+    """Stream colors from `source` through `send` until it ends (or `duration` passes).
+
+    A plain iterable/generator is sampled at `fps`; an async iterator sets
+    its own pace. Output is capped at `max_fps` (default: `fps`).
+    """
+    colors = ColorStream(send, max_fps or fps).start()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        if hasattr(source, "__aiter__"):
+            async for rgb in source:
+                colors.push(rgb)
+                if duration is not None and loop.time() - start >= duration:
+                    break
+                await asyncio.sleep(0)
+        else:
+            tick = 1.0 / fps
+            for n, rgb in enumerate(source):
+                delay = start + n * tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if duration is not None and loop.time() - start >= duration:
+                    break
+                colors.push(rgb)
+    finally:
+        await colors.close()
+    return colors.stats()
+
+
+def rainbow(period: float = 5.0, fps: float = DEFAULT_FPS):
+    """Endless hue rotation, one full turn every `period` seconds."""
+    n = 0
+    while True:
+        r, g, b = colorsys.hsv_to_rgb((n / fps / period) % 1.0, 1.0, 1.0)
+        yield int(r * 255), int(g * 255), int(b * 255)
+        n += 1
+
+
+def pulse(rgb=(255, 0, 0), period: float = 2.0, fps: float = DEFAULT_FPS):
+    """Endless breathing of one color."""
+    n = 0
+    while True:
+        level = 0.5 - 0.5 * math.cos(2 * math.pi * n / fps / period)
+        yield tuple(int(c * level) for c in rgb)
+        n += 1
+
+
+def ble_sender(acks):
+    """send() for a govee_ble.AckWriter: each write waits for the echo."""
+    return acks.write
+
+
+def paced_sender(acks):
+    """send() for a started govee_ble.AckWriter that doesn't wait for echoes
+    but holds writes to the rate they show the light sustains."""
+    from govee_rate import RateController
+    return RateController(acks).write
+
+
+def lan_sender(client, ip: str):
+    """send() for a govee_lan.GoveeLanClient."""
+    from govee_lan import packet_to_message
+
+    async def send(packet: bytes):
+        client.send(ip, packet_to_message(packet))
+
+    return send
+
+
+PATTERNS = {"rainbow": rainbow, "pulse": pulse}
+
+
+async def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in PATTERNS:
+        print(__doc__)
+        return
+    from govee_ble import AckWriter, pop_option, resolve_address
+    pattern = args.pop(0)
+    fps = float(pop_option(args, "--fps", DEFAULT_FPS))
+    seconds = float(pop_option(args, "--seconds", 10))
+    lan_ip = pop_option(args, "--lan")
+    source = PATTERNS[pattern](fps=fps)
+
+    if lan_ip:
+        from govee_lan import GoveeLanClient
+        client = await GoveeLanClient.open()
+        try:
+            stats = await stream(source, lan_sender(client, lan_ip), fps, duration=seconds)
+        finally:
+            client.close()
+    else:
+        if "--sim" in args:
+            from govee_sim import BleSimulator
+            sim = BleSimulator(1, connect_delay=0.05, write_latency=0.01, echo_delay=0.02)
+            ble = sim.client(sim.addresses[0])
+        else:
+            import govee_ble
+            govee_ble._load_bleak()
+            ble = govee_ble.BleakClient(resolve_address(), timeout=10.0)
+        await ble.connect()
+        try:
+            acks = AckWriter(ble)
+            await acks.start()
+            send = ble_sender(acks) if "--acked" in args else paced_sender(acks)
+            stats = await stream(source, send, fps, duration=seconds)
+        finally:
+            await ble.disconnect()
+    print(f"Sent {stats['sent']}/{stats['pushed']} frames in {stats['elapsed']:.1f}s "
+          f"({stats['fps']:.1f} fps, link ~{stats['capacity_fps']:.0f} fps), "
+          f"{stats['dropped']} dropped, {stats['unchanged']} unchanged, "
+          f"latency p50 {stats['latency_p50'] * 1000:.0f} ms / p95 {stats['latency_p95'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,241 @@
+"""
+Packet trace: an always-on ring buffer of every frame sent and received.
+
+AckWriter and GoveeLanClient record each outbound write and each inbound
+notification / LAN reply (timestamp, direction, transport, device, raw
+bytes) into the shared TRACE buffer. It holds the last `capacity` frames,
+so it can stay on in production; when something odd happens, dump it to a
+compact binary file and replay it later against the light or the simulator,
+at the original pace or faster.
+
+Usage:
+    python govee_trace.py show trace.gvt                    # print a dump
+    python govee_trace.py replay trace.gvt                  # resend the outbound frames to the same devices
+    python govee_trace.py replay trace.gvt --speed 4        # 4x faster
+    python govee_trace.py replay trace.gvt --sim            # against govee_sim, then print the end states
+    python govee_trace.py replay trace.gvt --ble 98:17:3C:21:E3:3F   # all BLE frames to one device
+    python govee_trace.py replay trace.gvt --lan 192.168.1.40        # all LAN messages to one device
+
+A running daemon dumps its buffer on "trace [name]" (govee_ctl.py trace) to
+~/.govee_traces/<name>; the name can't point anywhere else.
+
+File format (little-endian): b"GVTR", version byte, u16 device count, each
+device as u8 length + UTF-8 name, then records of f64 timestamp, u8
+direction (0 out, 1 in), u8 transport (0 ble, 1 lan), u16 device index,
+u16 length and the raw bytes.
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import time
+from collections import deque
+from typing import NamedTuple
+
+from govee_codec import RawFrame
+
+MAGIC = b"GVTR"
+VERSION = 1
+DEFAULT_CAPACITY = 4096
+DEFAULT_PATH = "trace.gvt"
+TRACE_DIR = os.path.expanduser("~/.govee_traces")     # where the daemon writes dumps
+
+OUT, IN = 0, 1
+TRANSPORTS = ("ble", "lan")
+_RECORD = struct.Struct("<dBBHH")
+
+
+class TraceRecord(NamedTuple):
+    time: float          # time.time() when it was recorded
+    direction: int       # OUT or IN
+    transport: str       # "ble" or "lan"
+    device: str          # BLE address or IP
+    data: bytes
+
+
+class TraceBuffer:
+    """Bounded buffer of the most recent frames; recording is one deque append."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.enabled = True
+        self.records = deque(maxlen=capacity)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def record(self, direction: int, transport: str, device: str, data: bytes):
+        if self.enabled:
+            self.records.append((time.time(), direction, transport, device, bytes(data)))
+
+    def snapshot(self) -> list[TraceRecord]:
+        return [TraceRecord(*r) for r in list(self.records)]
+
+    def clear(self):
+        self.records.clear()
+
+    def dump(self, path: str = DEFAULT_PATH) -> int:
+        """Write the buffer to `path`; returns the number of records written."""
+        return write_trace(path, self.snapshot())
+
+
+def trace_path(name: str = DEFAULT_PATH) -> str:
+    """Path in TRACE_DIR for a dump requested by name (e.g. by a daemon
+    client); anything that isn't a plain file name raises ValueError."""
+    if not name or name.startswith(".") or "/" in name or "\\" in name or "\0" in name:
+        raise ValueError(f"not a plain trace file name: {name!r}")
+    os.makedirs(TRACE_DIR, mode=0o700, exist_ok=True)
+    return os.path.join(TRACE_DIR, name)
+
+
+def write_trace(path: str, records: list[TraceRecord]) -> int:
+    devices = {}
+    for r in records:
+        devices.setdefault(r.device, len(devices))
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out += struct.pack("<H", len(devices))
+    for name in devices:
+        encoded = name.encode()
+        out.append(len(encoded))
+        out += encoded
+    for r in records:
+        out += _RECORD.pack(r.time, r.direction, TRANSPORTS.index(r.transport), devices[r.device], len(r.data))
+        out += r.data
+    with open(path, "wb") as f:
+        f.write(out)
+    return len(records)
+
+
+def read_trace(path: str) -> list[TraceRecord]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC or data[4] != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} trace file")
+    (count,) = struct.unpack_from("<H", data, 5)
+    offset = 7
+    devices = []
+    for _ in range(count):
+        length = data[offset]
+        devices.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    records = []
+    while offset < len(data):
+        t, direction, transport, device, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        records.append(TraceRecord(t, direction, TRANSPORTS[transport], devices[device], data[offset:offset + length]))
+        offset += length
+    return records
+
+
+async def replay(records: list[TraceRecord], send, speed: float = 1.0) -> int:
+    """Resend the outbound records through `send(record)` (async), keeping
+    their original spacing divided by `speed` (0 = as fast as possible).
+    Returns how many were sent."""
+    outbound = [r for r in records if r.direction == OUT]
+    if not outbound:
+        return 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = outbound[0].time
+    for r in outbound:
+        if speed:
+            delay = (r.time - first) / speed - (loop.time() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await send(r)
+    return len(outbound)
+
+
+def format_record(r: TraceRecord, start: float) -> str:
+    arrow = "->" if r.direction == OUT else "<-"
+    payload = r.data.hex() if r.transport == "ble" else r.data.decode(errors="replace")
+    return f"{r.time - start:10.4f}s {r.transport} {arrow} {r.device:17s} {payload}"
+
+
+TRACE = TraceBuffer()
+
+
+async def _replay_main(records: list[TraceRecord], speed: float, ble_address: str, lan_ip: str, simulate: bool):
+    from govee_lan import MSG_SCAN, GoveeLanClient
+    # Scans aren't addressed to a device; everything else is replayed
+    records = [r for r in records if r.data != MSG_SCAN]
+    ble_devices = {ble_address or r.device for r in records if r.transport == "ble" and r.direction == OUT}
+    lan_devices = {lan_ip or r.device for r in records if r.transport == "lan" and r.direction == OUT}
+    TRACE.enabled = False     # don't trace the replay into the buffer being replayed
+
+    lan_sim = ble_sim = None
+    ip_map = {}
+    if simulate:
+        from govee_sim import BleSimulator, LanSimulator, SimulatedDevice
+        if lan_devices:
+            lan_sim = await LanSimulator(len(lan_devices)).start()
+            ip_map = dict(zip(sorted(lan_devices), lan_sim.ips))
+        ble_sim = BleSimulator(0, connect_delay=0.05, echo_delay=0.005)
+        for address in ble_devices:
+            ble_sim.devices[address] = SimulatedDevice(address)
+
+    lan = await GoveeLanClient.open("127.0.0.1" if simulate else "0.0.0.0") if lan_devices else None
+    writers = {}
+    try:
+        if ble_devices:
+            import govee_ble
+            if simulate:
+                client_class = ble_sim.client
+            else:
+                govee_ble._load_bleak()
+                client_class = lambda a: govee_ble.BleakClient(a, timeout=10.0)
+            for address in ble_devices:
+                client = client_class(address)
+                await client.connect()
+                writers[address] = govee_ble.AckWriter(client)
+
+        async def send(r: TraceRecord):
+            if r.transport == "ble":
+                # Recorded frames are already in the light's layout
+                await writers[ble_address or r.device].write(RawFrame(r.data), wait=False)
+            else:
+                ip = lan_ip or r.device
+                lan.send(ip_map.get(ip, ip), r.data)
+                await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        sent = await replay(records, send, speed)
+        print(f"Replayed {sent} frames in {time.perf_counter() - start:.2f}s")
+        if simulate:
+            await asyncio.sleep(0.1)
+            for address in ble_devices:
+                print(f"  ble {address}: {ble_sim.devices[address].status()}")
+            for original, ip in ip_map.items():
+                print(f"  lan {original}: {lan_sim.devices[ip].status()}")
+    finally:
+        for writer in writers.values():
+            await writer.client.disconnect()
+        if lan is not None:
+            lan.close()
+        if lan_sim is not None:
+            lan_sim.close()
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ("show", "replay"):
+        print(__doc__)
+        return
+    from govee_ble import pop_option
+    speed = float(pop_option(args, "--speed", 1.0))
+    ble_address = pop_option(args, "--ble")
+    lan_ip = pop_option(args, "--lan")
+    simulate = "--sim" in args
+    records = read_trace(args[1])
+    if args[0] == "show":
+        start = records[0].time if records else 0.0
+        for r in records:
+            print(format_record(r, start))
+        print(f"{len(records)} records")
+        return
+    asyncio.run(_replay_main(records, speed, ble_address, lan_ip, simulate))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,18 +16,11 @@ To get YELLOW on device (R=255, G=255, B=0):
 """
 import asyncio
 from bleak import BleakClient
+from govee_codec import encode as build_frame
 
 DEVICE_ADDRESS = "98:17:3C:21:E3:3F"
 WRITE_UUID = "00010203-0405-0607-0809-0a0b0c0d2b11"
 
-def build_frame(cmd, payload):
-    frame = bytes([0x33, cmd & 0xFF]) + bytes(payload)
-    frame += bytes([0] * (19 - len(frame)))
-    checksum = 0
-    for b in frame:
-        checksum ^= b
-    frame += bytes([checksum & 0xFF])
-    return frame
 
 async def main():
     async with BleakClient(DEVICE_ADDRESS, timeout=15.0) as client:
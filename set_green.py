@@ -1,6 +1,6 @@
-"""Send power on, brightness 100, and green color in sequence with delays."""
+"""Send power on, brightness 100, and green color in sequence, paced by device acks."""
 import asyncio
-from govee_ble import cmd_power_on, cmd_brightness, cmd_color, DEVICE_ADDRESS, WRITE_UUID
+from govee_ble import cmd_power_on, cmd_brightness, cmd_color, DEVICE_ADDRESS, AckWriter
 from bleak import BleakClient
 
 async def main():
@@ -9,22 +9,20 @@ async def main():
             print("Failed to connect.")
             return
 
+        acks = AckWriter(client)
+        await acks.start()
+
         print("Connected. Sending power ON...")
-        await client.write_gatt_char(WRITE_UUID, cmd_power_on(), response=False)
-        await asyncio.sleep(1)
+        await acks.write(cmd_power_on())
 
         print("Setting brightness to 100%...")
-        await client.write_gatt_char(WRITE_UUID, cmd_brightness(100), response=False)
-        await asyncio.sleep(1)
+        await acks.write(cmd_brightness(100))
 
         print("Setting color to GREEN (0, 255, 0)...")
-        await client.write_gatt_char(WRITE_UUID, cmd_color(0, 255, 0), response=False)
-        await asyncio.sleep(0.5)
-
-        # Send color again to be sure
-        print("Re-sending green...")
-        await client.write_gatt_char(WRITE_UUID, cmd_color(0, 255, 0), response=False)
-        await asyncio.sleep(0.5)
+        if await acks.write(cmd_color(0, 255, 0)) is None:
+            # No echo - send color again to be sure
+            print("Re-sending green...")
+            await acks.write(cmd_color(0, 255, 0))
 
         print("Done! Light should be green.")
 
@@ -1,18 +1,11 @@
 """Set Govee to yellow with proper sequencing."""
 import asyncio
 from bleak import BleakClient
+from govee_codec import encode as build_frame
+from govee_ble import AckWriter
 
 DEVICE_ADDRESS = "98:17:3C:21:E3:3F"
-WRITE_UUID = "00010203-0405-0607-0809-0a0b0c0d2b11"
 
-def build_frame(cmd, payload):
-    frame = bytes([0x33, cmd & 0xFF]) + bytes(payload)
-    frame += bytes([0] * (19 - len(frame)))
-    checksum = 0
-    for b in frame:
-        checksum ^= b
-    frame += bytes([checksum & 0xFF])
-    return frame
 
 async def main():
     async with BleakClient(DEVICE_ADDRESS, timeout=15.0) as client:
@@ -21,21 +14,21 @@ async def main():
             return
 
         print("Connected!")
+        acks = AckWriter(client)
+        await acks.start()
 
         # Power on
-        await client.write_gatt_char(WRITE_UUID, build_frame(0x01, [0x01]), response=False)
-        await asyncio.sleep(1)
+        await acks.write(build_frame(0x01, [0x01]))
 
         # Brightness max
-        await client.write_gatt_char(WRITE_UUID, build_frame(0x04, [0xFF]), response=False)
-        await asyncio.sleep(1)
+        await acks.write(build_frame(0x04, [0xFF]))
 
-        # Set YELLOW (255, 255, 0) - send 3 times to be sure
+        # Set YELLOW (255, 255, 0) - retry up to 3 times until the light echoes it
         for i in range(3):
             pkt = build_frame(0x05, [0x02, 0xFF, 0xFF, 0x00])
             print(f"  Yellow attempt {i+1}: {pkt.hex()}")
-            await client.write_gatt_char(WRITE_UUID, pkt, response=False)
-            await asyncio.sleep(1)
+            if await acks.write(pkt) is not None:
+                break
 
         print("Done! Should be yellow now.")
 